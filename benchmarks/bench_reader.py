@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+"""
+Compare the rows/sec of the record by record reading with the buffered reading of DbfReader.
+
+    python benchmarks/bench_reader.py [--records 200000] [--source tests/data/dbase3.dbf]
+
+The synthetic file is made by repeating the records of the source file until --records is reached.
+"""
+import os
+import sys
+import time
+import struct
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dbf_reader import DbfReader  # noqa: E402
+from dbf_reader.reader import Casts  # noqa: E402
+
+
+def make_synthetic_file(source: str, records: int) -> str:
+    with DbfReader(source) as dbf_reader:
+        headerlen = dbf_reader.definition.headerlen
+        record_size = dbf_reader.definition.record_size
+        dbf_reader.seek(0)
+        header = bytearray(dbf_reader.read(headerlen))
+        body = dbf_reader.read(record_size * dbf_reader.records)
+    struct.pack_into('<L', header, 4, records)
+    fd, path = tempfile.mkstemp(suffix='.dbf')
+    with os.fdopen(fd, 'wb') as f:
+        f.write(header)
+        written = 0
+        while written < records:
+            chunk = body[:record_size * (records - written)]
+            f.write(chunk)
+            written += len(chunk) // record_size
+        f.write(b'\x1a')
+    return path
+
+
+def legacy_iter(dbf_reader: DbfReader):
+    # o caminho original: um read para o flag de apagado e um read para cada campo
+    while dbf_reader.actual_record < dbf_reader.records:
+        dbf_reader.actual_record += 1
+        deleted = dbf_reader.read(1)
+        if deleted != b' ':
+            dbf_reader.read(dbf_reader.definition.record_size - 1)
+            continue
+        result = {}
+        for field in dbf_reader.definition.fields:
+            if field.type != 'D':
+                result[field.name] = dbf_reader.get_field_value(field)
+                continue
+            # o Casts.to_date não aceita datas em branco, que os arquivos sintéticos têm
+            value = dbf_reader.read(field.size).decode(dbf_reader.encoding)
+            result[field.name] = None if value.strip(' \x000') == '' else Casts.to_date(field, value)
+        yield result
+
+
+def measure(path: str, label: str, iterate, **kwargs) -> float:
+    with DbfReader(path, **kwargs) as dbf_reader:
+        start = time.perf_counter()
+        rows = 0
+        for _ in iterate(dbf_reader):
+            rows += 1
+        elapsed = time.perf_counter() - start
+    print(f"{label:<24} {rows:>10} rows {elapsed:>8.3f}s {rows / elapsed:>12.0f} rows/sec")
+    return rows / elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--records', type=int, default=200000)
+    parser.add_argument('--source', default=os.path.join('tests', 'data', 'dbase3.dbf'))
+    args = parser.parse_args()
+
+    path = make_synthetic_file(args.source, args.records)
+    try:
+        legacy = measure(path, 'legacy (read per field)', legacy_iter)
+        for buffer_records in [1, 64, 1024, 8192]:
+            def iterate(dbf_reader, buffer_records=buffer_records):
+                dbf_reader.buffer_records = buffer_records
+                return iter(dbf_reader)
+            rate = measure(path, f'buffer_records={buffer_records}', iterate)
+            print(f"{'':<24} speedup {rate / legacy:.2f}x")
+        rate = measure(path, 'memory_map=True', iter, memory_map=True)
+        print(f"{'':<24} speedup {rate / legacy:.2f}x")
+    finally:
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
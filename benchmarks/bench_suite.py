@@ -0,0 +1,178 @@
+#!/usr/bin/env python
+"""
+Measure rows/sec, MB/sec and peak memory of each read mode of DbfReader over a synthetic file, and save the results as
+JSON to compare versions.
+
+    python benchmarks/bench_suite.py [--records 200000] [--fields 60] [--mix C=0.5,N=0.35,D=0.1,L=0.05] [--datasus]
+                                     [--modes rows,tuple,...] [--output results.json] [--compare old.json]
+
+The peak memory is measured by tracemalloc in a second run of each mode, so it doesn't slow down the timed run. The
+list modes keep every row, the others drop each row after reading it.
+"""
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import datetime
+import tempfile
+import subprocess
+import tracemalloc
+from typing import Any, Callable, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from dbf_reader import DbfReader  # noqa: E402
+from bench_reader import legacy_iter  # noqa: E402
+from synthetic import DEFAULT_MIX, make_fields, parse_mix, write_synthetic  # noqa: E402
+
+
+def count(iterable) -> int:
+    rows = 0
+    for _ in iterable:
+        rows += 1
+    return rows
+
+
+def read_columnar(path: str) -> int:
+    with DbfReader(path) as dbf_reader:
+        return sum([len(next(iter(batch.values()))) for batch in dbf_reader.iter_column_batches()])
+
+
+def read_with(**kwargs) -> Callable[[str], int]:
+    def read(path: str) -> int:
+        with DbfReader(path, **kwargs) as dbf_reader:
+            return count(dbf_reader)
+    return read
+
+
+def keep_with(**kwargs) -> Callable[[str], int]:
+    # as linhas ficam numa lista, como num DataFrame, o string_cache compartilha as str entre elas
+    def read(path: str) -> int:
+        with DbfReader(path, **kwargs) as dbf_reader:
+            return len(list(dbf_reader))
+    return read
+
+
+def read_legacy(path: str) -> int:
+    with DbfReader(path) as dbf_reader:
+        return count(legacy_iter(dbf_reader))
+
+
+def modes(path: str) -> Dict[str, Callable[[str], int]]:
+    """ Read function of each mode, they return the rows read """
+    with DbfReader(path) as dbf_reader:
+        fields = dbf_reader.definition.fields
+    numbers = [field.name for field in fields if field.type == 'N']
+    result = {
+        'legacy': read_legacy,
+        'rows': read_with(),
+        'buffer_records=1': read_with(buffer_records=1),
+        'memory_map': read_with(memory_map=True),
+        'tuple': read_with(row_type='tuple'),
+        'slots': read_with(row_type='slots'),
+        'string_cache': read_with(string_cache=4096),
+        'list': keep_with(),
+        'list+string_cache': keep_with(string_cache=4096),
+        'columns': read_with(columns=[field.name for field in fields[:5]]),
+    }
+    if numbers:
+        result['filters'] = read_with(filters=[(numbers[0], '>', 0)])
+    try:
+        import numpy  # noqa: F401
+        result['columnar'] = read_columnar
+    except ImportError:
+        pass
+    return result
+
+
+def measure(path: str, mode: str, read: Callable[[str], int]) -> Dict[str, Any]:
+    size = os.path.getsize(path)
+    start = time.perf_counter()
+    rows = read(path)
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    read(path)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        'mode': mode,
+        'rows': rows,
+        'seconds': elapsed,
+        'rows_per_sec': rows / elapsed,
+        'mb_per_sec': size / elapsed / 1024 / 1024,
+        'peak_memory_bytes': peak,
+    }
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(['git', 'describe', '--always', '--dirty'], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_results(results: List[Dict[str, Any]], previous: Dict[str, Dict[str, Any]]) -> None:
+    print(f"{'mode':<20} {'rows':>10} {'rows/sec':>12} {'MB/sec':>8} {'peak MB':>8} {'vs previous':>12}")
+    for result in results:
+        ratio = ''
+        if result['mode'] in previous:
+            ratio = f"{result['rows_per_sec'] / previous[result['mode']]['rows_per_sec']:.2f}x"
+        print(f"{result['mode']:<20} {result['rows']:>10} {result['rows_per_sec']:>12.0f} {result['mb_per_sec']:>8.1f} "
+              f"{result['peak_memory_bytes'] / 1024 / 1024:>8.1f} {ratio:>12}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--records', type=int, default=200000)
+    parser.add_argument('--fields', type=int, default=60)
+    parser.add_argument('--mix', type=parse_mix, default=DEFAULT_MIX)
+    parser.add_argument('--datasus', action='store_true', help="\\x00 header terminator and \\x00 filled empty numbers")
+    parser.add_argument('--empty-ratio', type=float, default=0.1)
+    parser.add_argument('--modes', type=lambda value: value.split(','), default=None, help="default: every mode")
+    parser.add_argument('--output', help="JSON file where the results are saved")
+    parser.add_argument('--compare', help="JSON file of a previous run")
+    args = parser.parse_args()
+
+    fields = make_fields(args.fields, args.mix)
+    fd, path = tempfile.mkstemp(suffix='.dbf')
+    os.close(fd)
+    try:
+        write_synthetic(path, args.records, fields, args.datasus, args.empty_ratio)
+        available = modes(path)
+        unknown = [mode for mode in args.modes or [] if mode not in available]
+        if unknown:
+            parser.error(f"unknown modes {unknown}, the modes are {list(available)}")
+        results = [measure(path, mode, available[mode]) for mode in args.modes or available]
+        file_size = os.path.getsize(path)
+    finally:
+        os.remove(path)
+
+    previous = {}
+    if args.compare:
+        with open(args.compare) as f:
+            previous = {result['mode']: result for result in json.load(f)['results']}
+    print_results(results, previous)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({
+                'revision': git_revision(),
+                'date': datetime.datetime.now().isoformat(timespec='seconds'),
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'parameters': {
+                    'records': args.records,
+                    'fields': fields,
+                    'datasus': args.datasus,
+                    'empty_ratio': args.empty_ratio,
+                    'file_size': file_size,
+                },
+                'results': results,
+            }, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
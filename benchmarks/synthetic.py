@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+"""
+Generate synthetic dBase III files for the benchmarks.
+
+    python benchmarks/synthetic.py out.dbf [--records 1000000] [--fields 60] [--mix C=0.5,N=0.35,D=0.1,L=0.05] [--datasus]
+
+With --datasus the header ends with \\x00 instead of \\r, as the recent DATASUS files, and the empty numeric values
+are filled with \\x00 instead of spaces.
+"""
+import random
+import struct
+import argparse
+import datetime
+from typing import Dict, List, Tuple
+
+DEFAULT_MIX = {'C': 0.5, 'N': 0.35, 'D': 0.1, 'L': 0.05}
+
+# registros distintos gerados, o arquivo repete estes registros até chegar na quantidade pedida
+POOL_RECORDS = 4096
+
+Field = Tuple[str, str, int, int]
+
+
+def parse_mix(mix: str) -> Dict[str, float]:
+    """ 'C=0.5,N=0.5' as {'C': 0.5, 'N': 0.5} """
+    result = {}
+    for item in mix.split(','):
+        field_type, weight = item.split('=')
+        if field_type not in DEFAULT_MIX:
+            raise ValueError(f"Unknown field type {field_type}, the types are {list(DEFAULT_MIX)}.")
+        result[field_type] = float(weight)
+    return result
+
+
+def make_fields(count: int, mix: Dict[str, float] = None, seed: int = 0) -> List[Field]:
+    """ (name, type, size, decimals) of count fields, the types drawn with the weights of mix """
+    rnd = random.Random(seed)
+    mix = DEFAULT_MIX if mix is None else mix
+    fields = []
+    for order, field_type in enumerate(rnd.choices(list(mix), weights=list(mix.values()), k=count)):
+        if field_type == 'C':
+            size, decimals = rnd.choice([1, 2, 4, 6, 7, 8, 10, 13, 20, 40]), 0
+        elif field_type == 'N':
+            size, decimals = rnd.choice([(2, 0), (4, 0), (8, 0), (10, 0), (12, 2), (15, 2)])
+        else:
+            size, decimals = {'D': 8, 'L': 1}[field_type], 0
+        fields.append((f"{field_type}_{order:03}", field_type, size, decimals))
+    return fields
+
+
+def make_value(rnd: random.Random, field: Field, empty_ratio: float, datasus: bool) -> bytes:
+    name, field_type, size, decimals = field
+    empty = rnd.random() < empty_ratio
+    if field_type == 'C':
+        # poucos valores distintos, como os códigos de município, CID e sexo do DATASUS
+        return b'' if empty else f"{rnd.randrange(10 ** min(size, 3)):0{min(size, 3)}}".encode('ascii')
+    if field_type == 'N':
+        if empty:
+            return (b'\x00' if datasus else b' ') * size
+        digits = size - decimals - (1 if decimals else 0)
+        number = rnd.randrange(10 ** min(digits, 9))
+        return (f"{number / 10 ** decimals:.{decimals}f}" if decimals else str(number)).encode('ascii').rjust(size)
+    if field_type == 'D':
+        day = datetime.date(2023, 1, 1) + datetime.timedelta(days=rnd.randrange(365))
+        return b' ' * 8 if empty else day.strftime('%Y%m%d').encode('ascii')
+    return rnd.choice([b'T', b'F', b'?'])
+
+
+def make_record(rnd: random.Random, fields: List[Field], empty_ratio: float, datasus: bool) -> bytes:
+    values = [make_value(rnd, field, empty_ratio, datasus).ljust(field[2])[:field[2]] for field in fields]
+    return b' ' + b''.join(values)
+
+
+def write_synthetic(path: str, records: int, fields: List[Field], datasus: bool = False, empty_ratio: float = 0.1,
+                    deleted_ratio: float = 0.01, seed: int = 0) -> None:
+    """ Write a dBase III file with records records of the fields, see make_fields
+
+    Args:
+        path (str): DBF path
+        records (int): records count
+        fields (list[tuple[str, str, int, int]]): (name, type, size, decimals) of each field
+        datasus (bool): header terminated by \\x00 and empty numbers filled with \\x00, default=False
+        empty_ratio (float): ratio of empty values, default=0.1
+        deleted_ratio (float): ratio of deleted records, default=0.01
+        seed (int): random seed, default=0
+    """
+    rnd = random.Random(seed)
+    record_size = 1 + sum([field[2] for field in fields])
+    headerlen = 32 + 32 * len(fields) + 1
+    header = struct.pack('<BBBBLHH20x', 0x03, 123, 1, 31, records, headerlen, record_size)
+    for name, field_type, size, decimals in fields:
+        header += struct.pack('<11sc4xBBB13x', name.encode('ascii'), field_type.encode('ascii'), size, decimals, 0)
+    header += b'\x00' if datasus else b'\r'
+    pool = [make_record(rnd, fields, empty_ratio, datasus) for _ in range(min(records, POOL_RECORDS))]
+    with open(path, 'wb') as f:
+        f.write(header)
+        written = 0
+        while written < records:
+            block = [
+                (b'*' + record[1:]) if rnd.random() < deleted_ratio else record
+                for record in rnd.choices(pool, k=min(records - written, 8192))
+            ]
+            f.write(b''.join(block))
+            written += len(block)
+        f.write(b'\x1a')
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('path')
+    parser.add_argument('--records', type=int, default=1000000)
+    parser.add_argument('--fields', type=int, default=60)
+    parser.add_argument('--mix', type=parse_mix, default=DEFAULT_MIX)
+    parser.add_argument('--datasus', action='store_true')
+    parser.add_argument('--empty-ratio', type=float, default=0.1)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    write_synthetic(args.path, args.records, make_fields(args.fields, args.mix, args.seed), args.datasus, args.empty_ratio, seed=args.seed)
+
+
+if __name__ == '__main__':
+    main()
@@ -2,3 +2,13 @@
 from .reader import *
 from .definitions import *
 from .renderers import *
+from .dbc import *
+from .memo import *
+from .parallel import *
+from .aio import *
+from .dataset import *
+from .cache import *
+from .index import *
+from .writer import *
+from .aggregate import *
+from .stream import *
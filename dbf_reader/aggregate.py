@@ -0,0 +1,322 @@
+#!/usr/bin/env python
+import os
+import math
+import struct
+import hashlib
+from collections import Counter
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Any, Dict, Iterable, List, Union
+from .decoders import field_cast, is_memo
+from .definitions import FieldDefinition, TableDefinition
+from .filters import Filter, compile_filters, raw_key
+from .parallel import DEFAULT_CHUNK_RECORDS, iter_results
+from .reader import DbfReader
+
+# registros de cada bloco lido, os valores distintos de cada campo são contados por bloco
+DEFAULT_BLOCK_RECORDS = 32768
+
+# bits do hash usados para escolher o registrador do HyperLogLog, 2 ** 12 registradores, erro padrão de 1,6%
+DEFAULT_PRECISION = 12
+
+# valores distintos guardados exatamente antes de passar para o HyperLogLog
+EXACT_DISTINCT_LIMIT = 4096
+
+
+class DistinctSketch:
+
+    """ Approximate distinct count, exact while there are at most limit distinct values, then a HyperLogLog sketch
+        of 2 ** precision registers, sketches of parts of a file can be merged
+
+    Args:
+        precision (int): bits of the hash that choose the register, from 4 to 16, default=DEFAULT_PRECISION
+        limit (int): distinct values kept in a set before switching to the sketch, default=EXACT_DISTINCT_LIMIT
+
+    Attributes:
+        values (set[bytes]): distinct values, None after switching to the sketch
+        registers (bytearray): HyperLogLog registers, None while the count is exact
+    """
+
+    def __init__(self, precision: int = DEFAULT_PRECISION, limit: int = EXACT_DISTINCT_LIMIT) -> None:
+        if not 4 <= precision <= 16:
+            raise ValueError(f"precision should be from 4 to 16, but {precision} was received.")
+        self.precision = precision
+        self.limit = limit
+        self.values = set()
+        self.registers = None
+
+    @property
+    def exact(self) -> bool:
+        return self.registers is None
+
+    def update(self, values: Iterable[bytes]) -> None:
+        if self.registers is None:
+            self.values.update(values)
+            if len(self.values) > self.limit:
+                self.registers = bytearray(1 << self.precision)
+                self._add(self.values)
+                self.values = None
+        else:
+            self._add(values)
+
+    def _add(self, values: Iterable[bytes]) -> None:
+        # o registrador é escolhido pelos primeiros bits do hash e guarda a maior posição do primeiro bit 1 do resto
+        registers = self.registers
+        precision = self.precision
+        width = 64 - precision
+        mask = (1 << width) - 1
+        for value in values:
+            hashed = int.from_bytes(hashlib.blake2b(value, digest_size=8).digest(), 'big')
+            index = hashed >> width
+            rank = width - (hashed & mask).bit_length() + 1
+            if rank > registers[index]:
+                registers[index] = rank
+
+    def merge(self, other: 'DistinctSketch') -> None:
+        if other.precision != self.precision:
+            raise ValueError("Only sketches of the same precision can be merged.")
+        if other.registers is None:
+            self.update(other.values)
+            return
+        if self.registers is None:
+            values = self.values
+            self.registers = bytearray(other.registers)
+            self.values = None
+            self._add(values)
+            return
+        self.registers = bytearray(map(max, self.registers, other.registers))
+
+    def count(self) -> int:
+        if self.registers is None:
+            return len(self.values)
+        size = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / size)
+        estimate = alpha * size * size / sum([2.0 ** -register for register in self.registers])
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * size and zeros:
+            # poucos valores, a contagem linear dos registradores vazios é mais precisa
+            estimate = size * math.log(size / zeros)
+        return round(estimate)
+
+
+class FieldProfile:
+
+    """ Counts, minimum, maximum and distinct values of a field, computed over the raw bytes: the C and D fields are
+        compared as bytes, the other fields are casted, only once for each distinct value of each block
+
+    Args:
+        field (FieldDefinition): field definition
+        encoding (str): encoding of the character fields
+        precision (int): see DistinctSketch, default=DEFAULT_PRECISION
+
+    Attributes:
+        count (int): records with a value
+        nulls (int): records without a value, empty C fields included
+        distinct (DistinctSketch): distinct values
+    """
+
+    def __init__(self, field: FieldDefinition, encoding: str, precision: int = DEFAULT_PRECISION) -> None:
+        if is_memo(field):
+            raise ValueError(f"Memo fields can't be profiled, {field} is one.")
+        self.field = field
+        self.encoding = encoding
+        self.count = 0
+        self.nulls = 0
+        self.min_key = None
+        self.max_key = None
+        self.distinct = DistinctSketch(precision)
+
+    def update(self, values: Counter) -> None:
+        """ Add the raw values of some records, with how many records have each one, None for the null values """
+        key = raw_key(self.field, self.encoding)
+        keys = [None if raw is None else key(raw) for raw in values]
+        valid = [(key, raw) for key, raw in zip(keys, values) if key is not None and key != b'']
+        total = sum(values.values())
+        nulls = 0 if len(valid) == len(keys) else sum([values[raw] for key, raw in zip(keys, values) if key is None or key == b''])
+        self.nulls += nulls
+        self.count += total - nulls
+        if valid:
+            self._update_range(min(valid)[0], max(valid)[0])
+            # os distintos são contados pelos bytes do campo, sem converter cada valor
+            self.distinct.update([raw for key, raw in valid])
+
+    def _update_range(self, low: Any, high: Any) -> None:
+        if self.min_key is None or low < self.min_key:
+            self.min_key = low
+        if self.max_key is None or high > self.max_key:
+            self.max_key = high
+
+    def merge(self, other: 'FieldProfile') -> None:
+        self.count += other.count
+        self.nulls += other.nulls
+        if other.min_key is not None:
+            self._update_range(other.min_key, other.max_key)
+        self.distinct.merge(other.distinct)
+
+    def value(self, key: Any) -> Any:
+        # os C e D são comparados como bytes, só o mínimo e o máximo são decodificados
+        if key is None or self.field.type not in ['C', 'D']:
+            return key
+        return field_cast(self.field, self.encoding, {})(key)
+
+    @property
+    def min(self) -> Any:
+        return self.value(self.min_key)
+
+    @property
+    def max(self) -> Any:
+        return self.value(self.max_key)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            'type': self.field.type,
+            'count': self.count,
+            'nulls': self.nulls,
+            'min': self.min,
+            'max': self.max,
+            'distinct': self.distinct.count(),
+            'distinct_exact': self.distinct.exact,
+        }
+
+
+class TableProfile:
+
+    """ Profile of the records of a table, see profile
+
+    Attributes:
+        rows (int): non deleted records that match the filters
+        deleted (int): deleted records
+        filtered (int): records that don't match the filters
+        fields (dict[str, FieldProfile]): profile of each field
+    """
+
+    def __init__(self, definition: TableDefinition, columns: List[str] = None, precision: int = DEFAULT_PRECISION) -> None:
+        self.rows = 0
+        self.deleted = 0
+        self.filtered = 0
+        self.fields = {field.name: FieldProfile(field, definition.encoding, precision) for field in definition.select(columns)}
+
+    def merge(self, other: 'TableProfile') -> None:
+        self.rows += other.rows
+        self.deleted += other.deleted
+        self.filtered += other.filtered
+        for name, field in self.fields.items():
+            field.merge(other.fields[name])
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            'rows': self.rows,
+            'deleted': self.deleted,
+            'filtered': self.filtered,
+            'fields': {name: field.as_dict() for name, field in self.fields.items()},
+        }
+
+
+def raw_record_format(fields: List[FieldDefinition], record_size: int) -> str:
+    # como RowDecoder.record_format, mas todos os campos como bytes, inclusive os binários
+    result = '<'
+    position = 0
+    for field in fields:
+        result += f'{field.offset - position}x' if field.offset > position else ''
+        result += f'{field.size}s'
+        position = field.offset + field.size
+    return result + (f'{record_size - position}x' if record_size > position else '')
+
+
+def profile_records(reader: DbfReader, columns: List[str] = None, filters: List[Filter] = None, stop: int = None,
+                    precision: int = DEFAULT_PRECISION, block_records: int = DEFAULT_BLOCK_RECORDS) -> TableProfile:
+    """ Profile the records of the reader from its actual record, in one pass, without decoding the records: each
+        block is unpacked into the raw bytes of the fields and only the distinct values of each field are looked at
+
+    Args:
+        reader (DbfReader): reader
+        columns (list[str]): fields profiled, default=None, all fields
+        filters (list[tuple[str, str, Any]]): see DbfReader, default=None
+        stop (int): stop before this record number (0 based), default=None, until the last record
+        precision (int): see DistinctSketch, default=DEFAULT_PRECISION
+        block_records (int): records of each block, default=DEFAULT_BLOCK_RECORDS
+
+    Returns:
+        TableProfile: the profile
+    """
+    definition = reader.definition
+    result = TableProfile(definition, columns, precision)
+    # os campos repetidos em columns são contados uma vez só e, como nas linhas dict, de dois campos com o mesmo nome
+    # só o último entra no perfil
+    fields = sorted({field.order: field for field in definition.select(columns) if result.fields[field.name].field is field}.values(),
+                    key=lambda field: field.offset)
+    profiles = [result.fields[field.name] for field in fields]
+    unpack = struct.Struct(raw_record_format(fields, definition.record_size)).unpack_from
+    record_size = definition.record_size
+    accept = compile_filters(definition, filters)
+    for buffer, start, end in reader.iter_blocks(stop, block_records):
+        offsets = range(start, end, record_size)
+        reader.actual_record += len(offsets)
+        kept = [offset for offset in offsets if buffer[offset] == 0x20]
+        result.deleted += len(offsets) - len(kept)
+        if accept is not None:
+            matched = [offset for offset in kept if accept(buffer, offset)]
+            result.filtered += len(kept) - len(matched)
+            kept = matched
+        result.rows += len(kept)
+        if kept and profiles:
+            for profile, values in zip(profiles, zip(*[unpack(buffer, offset) for offset in kept])):
+                null = profile.field.null_position
+                if null is not None:
+                    # os valores com o bit do _NullFlags ligado são nulos, quaisquer que sejam os seus bytes
+                    values = [None if buffer[offset + null[0]] & null[1] else value for offset, value in zip(kept, values)]
+                profile.update(Counter(values))
+    return result
+
+
+def profile_chunk(path: str, definition: TableDefinition, start: int, stop: int, options: Dict[str, Any]) -> TableProfile:
+    """ Profile the records from start to stop, runs in the worker process """
+    with DbfReader(path, table_definition=definition, encoding=definition.encoding) as dbf_reader:
+        dbf_reader.seek_record(start)
+        return profile_records(dbf_reader, stop=stop, **options)
+
+
+def profile(source: Union[str, DbfReader], encoding: str = 'iso-8859-1', columns: List[str] = None, filters: List[Filter] = None,
+            workers: int = 1, chunk_records: int = DEFAULT_CHUNK_RECORDS, precision: int = DEFAULT_PRECISION,
+            executor: Executor = None) -> TableProfile:
+    """ Rows, deleted and filtered records, and counts, nulls, minimum, maximum and approximate distinct values of each
+        field, see profile_records
+
+    Args:
+        source (Union[str, DbfReader]): DBF or DBC path, or a reader, read from its actual record
+        encoding (str): encoding of the character fields, default='iso-8859-1'
+        columns (list[str]): fields profiled, default=None, all fields
+        filters (list[tuple[str, str, Any]]): see DbfReader, default=None
+        workers (int): processes, the chunks of chunk_records records of an uncompressed DBF path are profiled in
+                       parallel and merged, default=1, in this process
+        chunk_records (int): records of each chunk, default=DEFAULT_CHUNK_RECORDS
+        precision (int): see DistinctSketch, default=DEFAULT_PRECISION
+        executor (Executor): executor (of processes or threads) used instead of a new ProcessPoolExecutor, default=None
+
+    Returns:
+        TableProfile: the profile
+    """
+    if (workers == 1 and executor is None) or not isinstance(source, str) or source.lower().endswith('.dbc'):
+        if isinstance(source, DbfReader):
+            return profile_records(source, columns, filters, precision=precision)
+        with DbfReader(source, encoding=encoding) as dbf_reader:
+            return profile_records(dbf_reader, columns, filters, precision=precision)
+    if chunk_records < 1:
+        raise ValueError(f"chunk_records should be at least 1, but {chunk_records} was received.")
+    with DbfReader(source, encoding=encoding) as dbf_reader:
+        definition = dbf_reader.definition
+        result = TableProfile(definition, columns, precision)
+        compile_filters(definition, filters)
+    options = {'columns': columns, 'filters': filters, 'precision': precision}
+    calls = ((profile_chunk, (source, definition, start, min(start + chunk_records, definition.records), options))
+             for start in range(0, definition.records, chunk_records))
+    workers = workers or os.cpu_count()
+    if executor is not None:
+        return merge_profiles(result, iter_results(executor, calls, workers * 2, False))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return merge_profiles(result, iter_results(pool, calls, workers * 2, False))
+
+
+def merge_profiles(result: TableProfile, profiles: Iterable[TableProfile]) -> TableProfile:
+    for part in profiles:
+        result.merge(part)
+    return result
@@ -0,0 +1,145 @@
+#!/usr/bin/env python
+import asyncio
+import inspect
+from concurrent.futures import Executor
+from functools import partial
+from io import RawIOBase
+from itertools import islice
+from typing import Any, AsyncIterator, Dict, Iterator, List, Union
+from .filters import Filter
+from .reader import DbfReader, DEFAULT_BUFFER_RECORDS
+
+
+def is_async_source(source: Any) -> bool:
+    """ True when the source read method is a coroutine function, as in aiofiles and asyncio.StreamReader """
+    return inspect.iscoroutinefunction(getattr(source, 'read', None))
+
+
+class AsyncSource(RawIOBase):
+
+    """ Blocking file object over an async byte source, each read waits for the read coroutines of the source on the
+        event loop, so it must only be read from other threads, never from the event loop thread
+
+    Args:
+        source (Any): object with an async read(size) method, like aiofiles files or asyncio.StreamReader
+        loop (asyncio.AbstractEventLoop): event loop where the source is read
+    """
+
+    def __init__(self, source: Any, loop: asyncio.AbstractEventLoop) -> None:
+        self.source = source
+        self.loop = loop
+        self.name = getattr(source, 'name', '')
+
+    def read(self, size: int = -1) -> bytes:
+        # o StreamReader devolve o que já chegou, então lê até completar size ou até o fim dos dados
+        chunks = []
+        length = 0
+        while size < 0 or length < size:
+            chunk = asyncio.run_coroutine_threadsafe(self.source.read(-1 if size < 0 else size - length), self.loop).result()
+            if not chunk:
+                break
+            chunks.append(chunk)
+            length += len(chunk)
+        return b''.join(chunks)
+
+    def readable(self) -> bool:
+        return True
+
+
+class AsyncDbfReader:
+
+    """ DBF reader for asyncio pipelines, iterate over it with async for. The header parsing, the reads, the .dbc
+        decompression and the decoding of each batch run in the executor, so the event loop is never blocked
+
+    Args:
+        source (Union[str, FileIO, Any]): path, file object opened in 'rb' mode or async byte source (aiofiles file,
+                                          asyncio.StreamReader or any object with an async read(size) method)
+        encoding (str): see DbfReader, default='iso-8859-1'
+        batch_records (int): rows returned by each batch, default=DEFAULT_BUFFER_RECORDS
+        columns (list[str]): see DbfReader, default=None
+        filters (list[tuple[str, str, Any]]): see DbfReader, default=None
+        compressed (bool): see DbfReader, async sources without a name need compressed=True, default=None
+        string_cache (Union[int, dict[str, int]]): see DbfReader, default=None
+        row_type (str): see DbfReader, default='dict'
+        executor (Executor): executor of the blocking work, default=None, the default executor of the event loop
+
+    Async sources are not closed by close(), they belong to the caller.
+
+    Attributes:
+        reader (DbfReader): reader running in the executor, None until open
+        definition (TableDefinition): table definition, None until open
+        records (int): records count, None until open
+    """
+
+    def __init__(self, source: Union[str, Any], encoding: str = 'iso-8859-1', batch_records: int = DEFAULT_BUFFER_RECORDS,
+                 columns: List[str] = None, filters: List[Filter] = None, compressed: bool = None,
+                 string_cache: Union[int, Dict[str, int]] = None, row_type: str = 'dict', executor: Executor = None) -> None:
+        if batch_records < 1:
+            raise ValueError(f"batch_records should be at least 1, but {batch_records} was received.")
+        self.source = source
+        self.batch_records = batch_records
+        self.executor = executor
+        self.options = {
+            'encoding': encoding,
+            'buffer_records': batch_records,
+            'columns': columns,
+            'filters': filters,
+            'compressed': compressed,
+            'string_cache': string_cache,
+            'row_type': row_type,
+        }
+        self.reader = None
+        self.definition = None
+        self.records = None
+        self._rows = None
+
+    async def open(self) -> 'AsyncDbfReader':
+        """ Read the header in the executor, only once """
+        if self.reader is None:
+            loop = asyncio.get_running_loop()
+            source = AsyncSource(self.source, loop) if is_async_source(self.source) else self.source
+            self.reader = await loop.run_in_executor(self.executor, partial(DbfReader, source, **self.options))
+            self.definition = self.reader.definition
+            self.records = self.reader.records
+        return self
+
+    async def read_batch(self, records: int = None) -> List[Any]:
+        """ Read and decode, in the executor, the next rows
+
+        Args:
+            records (int): maximum rows returned, default=None, batch_records
+
+        Returns:
+            list: up to records rows, an empty list when there are no more rows
+        """
+        await self.open()
+        if self._rows is None:
+            self._rows = iter(self.reader)
+        rows: Iterator = islice(self._rows, self.batch_records if records is None else records)
+        return await asyncio.get_running_loop().run_in_executor(self.executor, list, rows)
+
+    async def iter_batches(self, records: int = None) -> AsyncIterator[List[Any]]:
+        """ Iterate over batches of up to records rows, see read_batch """
+        while True:
+            batch = await self.read_batch(records)
+            if not batch:
+                return
+            yield batch
+
+    async def _iter_rows(self) -> AsyncIterator[Any]:
+        async for batch in self.iter_batches():
+            for row in batch:
+                yield row
+
+    def __aiter__(self) -> AsyncIterator[Any]:
+        return self._iter_rows()
+
+    async def close(self) -> None:
+        if self.reader is not None:
+            await asyncio.get_running_loop().run_in_executor(self.executor, self.reader.close)
+
+    async def __aenter__(self) -> 'AsyncDbfReader':
+        return await self.open()
+
+    async def __aexit__(self, *args) -> None:
+        await self.close()
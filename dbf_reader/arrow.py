@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+from decimal import Decimal
+from typing import TYPE_CHECKING, Dict, Iterator, List
+from .columnar import DEFAULT_BATCH_SIZE, np
+from .definitions import FieldDefinition, TableDefinition
+from .filters import Filter
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover
+    pa = None
+    pq = None
+
+if TYPE_CHECKING:  # pragma: no cover
+    from .reader import DbfReader
+
+
+def require_pyarrow() -> None:
+    if pa is None or np is None:
+        raise ImportError("pyarrow and numpy are required for Arrow and Parquet export, install them with: pip install dbf_reader[arrow]")
+
+
+def arrow_field_type(field: FieldDefinition) -> 'pa.DataType':
+    """ Arrow type of the field, the same rules of DbfDescriptionPostgresDDL.pg_field_type, but N fields with
+        decimals are float64, as they are decoded, and N fields without decimals too large for a bigint are decimal128
+    """
+    require_pyarrow()
+    if field.type == "N":
+        if field.decimals > 0:
+            return pa.float64()
+        if field.size <= 4:
+            return pa.int16()
+        elif field.size <= 9:
+            return pa.int32()
+        elif field.size <= 18:
+            return pa.int64()
+        return pa.decimal128(field.size, 0)
+    types = {'D': pa.date32(), 'L': pa.bool_(), 'C': pa.string(), 'F': pa.float64(), 'I': pa.int32(), '+': pa.int32(),
+             'O': pa.float64(), '@': pa.timestamp('ms'), 'T': pa.timestamp('ms'), 'Y': pa.float64()}
+    if field.type in types:
+        return types[field.type]
+    if field.type == 'B' and field.size == 8:
+        return pa.float64()
+    raise ValueError(f"Field type '{field.type}' has no Arrow type.")
+
+
+def arrow_schema(definition: TableDefinition, columns: List[str] = None) -> 'pa.Schema':
+    """ Arrow schema of the table, each field keeps its DBF type, size and decimals as metadata
+
+    Args:
+        definition (TableDefinition): table definition
+        columns (list[str]): field names, default=None, all fields
+
+    Returns:
+        pa.Schema: one nullable field for each distinct DBF field name
+    """
+    require_pyarrow()
+    # assim como nos dicts das linhas, quando dois campos têm o mesmo nome vale o último
+    fields = {field.name: field for field in definition.select(columns)}
+    return pa.schema([
+        pa.field(field.name, arrow_field_type(field), nullable=True,
+                 metadata={'dbf_type': field.type, 'dbf_size': str(field.size), 'dbf_decimals': str(field.decimals)})
+        for field in fields.values()
+    ])
+
+
+def arrow_array(values: 'np.ndarray', type: 'pa.DataType') -> 'pa.Array':
+    if values.dtype == object:
+        # números com mais dígitos do que cabem em um int64
+        values = [value if value is None or isinstance(value, float) else Decimal(value) for value in values]
+        return pa.array(values, type=type)
+    if isinstance(values, np.ma.MaskedArray):
+        integer = pa.types.is_integer(type) or pa.types.is_decimal(type)
+        return pa.array(values.data, mask=np.ma.getmaskarray(values), type=pa.int64() if integer else type).cast(type)
+    return pa.array(values, type=type, from_pandas=True)
+
+
+def record_batch(columns: Dict[str, 'np.ndarray'], schema: 'pa.Schema') -> 'pa.RecordBatch':
+    return pa.record_batch([arrow_array(columns[field.name], field.type) for field in schema], schema=schema)
+
+
+def iter_record_batches(reader: 'DbfReader', batch_size: int = DEFAULT_BATCH_SIZE, columns: List[str] = None,
+                        filters: List[Filter] = None) -> Iterator['pa.RecordBatch']:
+    """ Iterate over the records of the reader as Arrow record batches, see DbfReader.iter_column_batches
+
+    Args:
+        reader (DbfReader): reader, the iteration starts at its actual record
+        batch_size (int): records read for each batch, default=DEFAULT_BATCH_SIZE
+        columns (list[str]): see DbfReader, default=None, the columns of the reader
+        filters (list[tuple[str, str, Any]]): see DbfReader, default=None, the filters of the reader
+
+    Returns:
+        Iterator[pa.RecordBatch]: record batches with the schema from arrow_schema
+    """
+    require_pyarrow()
+    columns = reader.columns if columns is None else columns
+    schema = arrow_schema(reader.definition, columns)
+    for batch in reader.iter_column_batches(batch_size, columns, filters):
+        yield record_batch(batch, schema)
+
+
+def to_parquet(reader: 'DbfReader', where: str, batch_size: int = DEFAULT_BATCH_SIZE, columns: List[str] = None,
+               filters: List[Filter] = None, compression: str = 'snappy') -> int:
+    """ Write the records of the reader to a Parquet file, one row group for each batch, so only one batch is kept in
+        memory no matter the size of the DBF
+
+    Args:
+        reader (DbfReader): reader, the iteration starts at its actual record
+        where (str): Parquet path or file object
+        batch_size (int): records of each row group, before removing deleted and filtered records,
+                          default=DEFAULT_BATCH_SIZE
+        columns (list[str]): see DbfReader, default=None, the columns of the reader
+        filters (list[tuple[str, str, Any]]): see DbfReader, default=None, the filters of the reader
+        compression (str): Parquet compression, default='snappy'
+
+    Returns:
+        int: rows written
+    """
+    require_pyarrow()
+    columns = reader.columns if columns is None else columns
+    rows = 0
+    with pq.ParquetWriter(where, arrow_schema(reader.definition, columns), compression=compression) as writer:
+        for batch in iter_record_batches(reader, batch_size, columns, filters):
+            if batch.num_rows:
+                writer.write_batch(batch)
+                rows += batch.num_rows
+    return rows
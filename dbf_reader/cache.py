@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+import os
+import json
+import tempfile
+from typing import Any, Dict, Iterable
+from .definitions import TableDefinition
+from .reader import DbfReader
+
+# versão do formato do arquivo de cache, um cache de outra versão é ignorado
+CACHE_VERSION = 2
+
+
+class DefinitionCache:
+
+    """ On disk JSON cache of the table definitions, keyed by the absolute path of each file and checked against its
+        size and modification time, so catalog scans and the DbfDescription* renderers don't need to open the files
+        again while they are not changed
+
+    Args:
+        path (str): JSON file of the cache, created on save when it doesn't exist
+        encoding (str): encoding of the character fields, part of the key, default='iso-8859-1'
+
+    Attributes:
+        entries (dict[str, dict]): size, modification time and definition of each file
+        hits (int): definitions returned from the cache
+        misses (int): definitions read from the files
+    """
+
+    def __init__(self, path: str, encoding: str = 'iso-8859-1') -> None:
+        self.path = path
+        self.encoding = encoding
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+        self.changed = False
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') == CACHE_VERSION:
+                self.entries = data['entries']
+
+    @staticmethod
+    def identity(path: str) -> Dict[str, Any]:
+        stat = os.stat(path)
+        return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+    def get(self, path: str) -> TableDefinition:
+        """ Definition of the file, read from it only when it is not cached or the file was changed
+
+        Args:
+            path (str): DBF or DBC path
+
+        Returns:
+            TableDefinition: definition without a reader, it can be given to DbfReader(..., table_definition=definition)
+        """
+        key = os.path.abspath(path)
+        identity = self.identity(path)
+        entry = self.entries.get(key)
+        if entry is not None and entry['identity'] == identity and entry['definition']['encoding'] == self.encoding:
+            self.hits += 1
+            return TableDefinition.from_dict(entry['definition'])
+        self.misses += 1
+        with DbfReader(path, encoding=self.encoding) as dbf_reader:
+            definition = dbf_reader.definition
+        self.entries[key] = {'identity': identity, 'definition': definition.to_dict()}
+        self.changed = True
+        return TableDefinition.from_dict(self.entries[key]['definition'])
+
+    def definitions(self, paths: Iterable[str]) -> Dict[str, TableDefinition]:
+        """ Definition of each file, see get """
+        return {path: self.get(path) for path in paths}
+
+    def prune(self) -> int:
+        """ Remove the entries of the files that don't exist anymore
+
+        Returns:
+            int: entries removed
+        """
+        missing = [key for key in self.entries if not os.path.exists(key)]
+        for key in missing:
+            del self.entries[key]
+        self.changed = self.changed or bool(missing)
+        return len(missing)
+
+    def save(self) -> None:
+        """ Write the cache, when it was changed, to a temporary file that replaces the cache file at once, so other
+            jobs never read a half written cache
+        """
+        if not self.changed:
+            return
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, temporary = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump({'version': CACHE_VERSION, 'entries': self.entries}, f)
+            os.replace(temporary, self.path)
+        except BaseException:
+            os.remove(temporary)
+            raise
+        self.changed = False
+
+    def __enter__(self) -> 'DefinitionCache':
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.save()
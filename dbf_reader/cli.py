@@ -0,0 +1,244 @@
+#!/usr/bin/env python
+"""
+Inspect, convert and benchmark DBF and DATASUS .dbc files.
+
+    dbf_reader describe [--format text|markdown|postgres] FILE...
+    dbf_reader head [-n 10] [--format jsonl|csv] FILE...
+    dbf_reader count FILE...
+    dbf_reader profile FILE...
+    dbf_reader convert --to csv|jsonl|parquet|copy [--output-dir DIR] FILE...
+    dbf_reader bench [--row-type dict] FILE...
+
+Every command accepts --encoding, --columns A,B and --filter FIELD OP VALUE (repeatable, the values of in, not in
+and between are separated by commas), and processes the files over a pool of -j processes, the results are printed
+in the order of the files.
+"""
+import os
+import io
+import sys
+import csv
+import json
+import time
+import argparse
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime
+from typing import Any, Callable, Dict, Iterable, List, Tuple
+from .definitions import FieldDefinition, TableDefinition
+from .decoders import ROW_TYPES
+from .filters import Filter, OPERATORS, compile_filters
+from .aggregate import profile_records
+from .parallel import iter_results
+from .reader import DbfReader
+from .renderers import DbfDescriptionMarkdown, DbfDescriptionPostgresDDL, DbfDescriptionText
+
+CONVERT_FORMATS = ('csv', 'jsonl', 'parquet', 'copy')
+
+NUMBER_TYPES = ('N', 'F', 'I', '+', 'O', 'B', 'Y')
+
+TIMESTAMP_TYPES = ('@', 'T')
+
+
+def json_default(value: Any) -> Any:
+    # datas e timestamps em ISO 8601, bytes dos campos B e G em hexadecimal
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, bytes):
+        return value.hex()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def csv_value(value: Any) -> Any:
+    if value is None:
+        return ''
+    if isinstance(value, (date, bytes)):
+        return json_default(value)
+    return value
+
+
+def filter_value(field: FieldDefinition, op: str, text: str) -> Any:
+    """ Value of a --filter given as text, converted to the type compared with the field, see filters.value_key """
+    values = text.split(',') if op in ['in', 'not in', 'between'] else [text]
+    if field.type in NUMBER_TYPES:
+        values = [float(value) for value in values]
+    elif field.type in TIMESTAMP_TYPES:
+        values = [datetime.fromisoformat(value) for value in values]
+    elif field.type == 'L':
+        values = [value.upper() in ['T', 'TRUE', 'Y', 'S', '1'] for value in values]
+    if op == 'between':
+        return tuple(values)
+    return values if op in ['in', 'not in'] else values[0]
+
+
+def parse_filters(definition: TableDefinition, filters: List[List[str]]) -> List[Filter]:
+    result = []
+    for name, op, text in filters or []:
+        if op not in OPERATORS:
+            raise ValueError(f"Operator '{op}' not supported, use one of {OPERATORS}.")
+        result.append((name, op, filter_value(definition.select([name])[0], op, text)))
+    return result
+
+
+def open_reader(path: str, options: Dict[str, Any], **kwargs) -> DbfReader:
+    # os valores dos filtros dependem do tipo de cada campo, então só são convertidos depois que o header é lido
+    dbf_reader = DbfReader(path, encoding=options['encoding'], columns=options['columns'], **kwargs)
+    try:
+        dbf_reader.filters = parse_filters(dbf_reader.definition, options['filter'])
+        compile_filters(dbf_reader.definition, dbf_reader.filters)
+        return dbf_reader
+    except Exception:
+        dbf_reader.close()
+        raise
+
+
+def describe(path: str, options: Dict[str, Any]) -> str:
+    with DbfReader(path, encoding=options['encoding']) as dbf_reader:
+        definition = dbf_reader.definition
+    if options['format'] == 'postgres':
+        tablename = os.path.splitext(os.path.basename(path))[0].lower()
+        return str(DbfDescriptionPostgresDDL(definition, options['schema'], tablename))
+    return str((DbfDescriptionMarkdown if options['format'] == 'markdown' else DbfDescriptionText)(definition))
+
+
+def row_type(output_format: str) -> str:
+    # no CSV os valores vão pela posição, como o cabeçalho, uma linha dict perde os campos de nome repetido
+    return 'tuple' if output_format == 'csv' else 'dict'
+
+
+def write_rows(rows: Iterable[Any], names: List[str], output: io.TextIOBase, output_format: str) -> None:
+    """ Write dict rows as JSON lines, or tuple rows as CSV under the header names """
+    if output_format == 'csv':
+        writer = csv.writer(output)
+        writer.writerow(names)
+        for row in rows:
+            writer.writerow([csv_value(value) for value in row])
+    else:
+        for row in rows:
+            output.write(json.dumps(row, default=json_default, ensure_ascii=False) + '\n')
+
+
+def head(path: str, options: Dict[str, Any]) -> str:
+    output = io.StringIO()
+    with open_reader(path, options, row_type=row_type(options['format'])) as dbf_reader:
+        names = [field.name for field in dbf_reader.definition.select(dbf_reader.columns)]
+        write_rows(itertools.islice(dbf_reader, options['lines']), names, output, options['format'])
+    return output.getvalue().rstrip('\n')
+
+
+def count(path: str, options: Dict[str, Any]) -> str:
+    # sem colunas nenhum campo é lido, só o flag de apagado e os filtros são avaliados
+    with open_reader(path, options) as dbf_reader:
+        result = profile_records(dbf_reader, [], dbf_reader.filters)
+    return f"{path}\t{result.rows}\t{result.deleted}\t{result.filtered}"
+
+
+def profile(path: str, options: Dict[str, Any]) -> str:
+    with open_reader(path, options) as dbf_reader:
+        result = profile_records(dbf_reader, dbf_reader.columns, dbf_reader.filters)
+    return json.dumps({'path': path, **result.as_dict()}, default=json_default, ensure_ascii=False)
+
+
+def output_path(path: str, options: Dict[str, Any]) -> str:
+    directory = os.path.dirname(path) if options['output_dir'] is None else options['output_dir']
+    return os.path.join(directory, f"{os.path.splitext(os.path.basename(path))[0]}.{options['to']}")
+
+
+def convert(path: str, options: Dict[str, Any]) -> str:
+    where = output_path(path, options)
+    with open_reader(path, options, row_type=row_type(options['to'])) as dbf_reader:
+        if options['to'] == 'parquet':
+            from .arrow import to_parquet
+            rows = to_parquet(dbf_reader, where)
+        elif options['to'] == 'copy':
+            from .postgres import write_copy
+            with open(where, 'wb') as f:
+                write_copy(dbf_reader, f)
+            rows = dbf_reader.stats.rows
+        else:
+            names = [field.name for field in dbf_reader.definition.select(dbf_reader.columns)]
+            with open(where, 'w', encoding='utf-8', newline='') as f:
+                write_rows(dbf_reader, names, f, options['to'])
+            rows = dbf_reader.stats.rows
+    return f"{path}\t{where}\t{rows}"
+
+
+def bench(path: str, options: Dict[str, Any]) -> str:
+    started = time.perf_counter()
+    with open_reader(path, options, row_type=options['row_type']) as dbf_reader:
+        for _ in dbf_reader:
+            pass
+        stats = dbf_reader.stats
+    elapsed = time.perf_counter() - started
+    return (f"{path}\t{stats.rows} rows\t{elapsed:.3f} s\t{stats.rows / elapsed:.0f} rows/s\t"
+            f"{stats.bytes_read / elapsed / 1024 / 1024:.1f} MB/s")
+
+
+COMMANDS: Dict[str, Callable[[str, Dict[str, Any]], str]] = {
+    'describe': describe,
+    'head': head,
+    'count': count,
+    'profile': profile,
+    'convert': convert,
+    'bench': bench,
+}
+
+
+def run(path: str, options: Dict[str, Any]) -> Tuple[str, str, str]:
+    """ Run the command over one file, in the worker process, returns (path, output, error) """
+    try:
+        return path, COMMANDS[options['command']](path, options), None
+    except (ValueError, IOError, ImportError, LookupError) as error:
+        return path, None, str(error)
+
+
+def parser() -> argparse.ArgumentParser:
+    result = argparse.ArgumentParser(prog='dbf_reader', description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('files', nargs='+', help="DBF or DBC files")
+    common.add_argument('-e', '--encoding', default='iso-8859-1')
+    common.add_argument('-j', '--jobs', type=int, default=1, help="files processed at the same time, default=1")
+    common.add_argument('--columns', type=lambda value: value.split(','), default=None, help="A,B,C")
+    common.add_argument('--filter', nargs=3, action='append', metavar=('FIELD', 'OP', 'VALUE'), default=None)
+    commands = result.add_subparsers(dest='command', required=True)
+    command = commands.add_parser('describe', parents=[common], help="header and fields of each file")
+    command.add_argument('--format', choices=['text', 'markdown', 'postgres'], default='text')
+    command.add_argument('--schema', default='public', help="schema of the postgres DDL, default=public")
+    command = commands.add_parser('head', parents=[common], help="first records of each file")
+    command.add_argument('-n', '--lines', type=int, default=10)
+    command.add_argument('--format', choices=['jsonl', 'csv'], default='jsonl')
+    commands.add_parser('count', parents=[common], help="path, rows, deleted and filtered records of each file")
+    commands.add_parser('profile', parents=[common], help="counts, nulls, min, max and distinct values of each field, as JSON")
+    command = commands.add_parser('convert', parents=[common], help="write each file as CSV, JSONL, Parquet or COPY")
+    command.add_argument('--to', choices=CONVERT_FORMATS, required=True)
+    command.add_argument('--output-dir', default=None, help="default: the directory of each file")
+    command = commands.add_parser('bench', parents=[common], help="rows/s and MB/s of reading each file")
+    command.add_argument('--row-type', choices=ROW_TYPES, default='dict')
+    return result
+
+
+def main(argv: List[str] = None) -> int:
+    args = parser().parse_args(argv)
+    if args.jobs < 1:
+        raise SystemExit(f"dbf_reader: -j should be at least 1, but {args.jobs} was received.")
+    options = vars(args)
+    calls = [(run, (path, options)) for path in args.files]
+    status = 0
+    executor = ProcessPoolExecutor(args.jobs) if args.jobs > 1 and len(args.files) > 1 else None
+    results = iter_results(executor, calls, args.jobs * 2) if executor else (function(*arguments) for function, arguments in calls)
+    try:
+        for path, output, error in results:
+            if error is not None:
+                print(f"dbf_reader: {path}: {error}", file=sys.stderr)
+                status = 1
+                continue
+            if args.command == 'head' and len(args.files) > 1:
+                print(f"==> {path} <==")
+            print(output, flush=True)
+    finally:
+        if executor:
+            executor.shutdown()
+    return status
+
+
+if __name__ == '__main__':  # pragma: no cover
+    sys.exit(main())
@@ -0,0 +1,257 @@
+#!/usr/bin/env python
+from functools import lru_cache
+from typing import TYPE_CHECKING, Callable, Dict, Iterator, List, Union
+from .decoders import CURRENCY_SCALE, JULIAN_ORDINAL, binary_format, is_memo
+from .definitions import FieldDefinition, TableDefinition
+from .filters import Filter, compile_filters
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
+if TYPE_CHECKING:  # pragma: no cover
+    from .reader import DbfReader
+
+DEFAULT_BATCH_SIZE = 65536
+
+# dígitos de um número que cabem em um int64 sem estouro
+MAX_INT64_DIGITS = 18
+
+# dia juliano de 01/01/1970
+JULIAN_EPOCH = JULIAN_ORDINAL + 719163
+
+MILLISECONDS_PER_DAY = 86400000
+
+
+def require_numpy() -> None:
+    if np is None:
+        raise ImportError("numpy is required for columnar reading, install it with: pip install dbf_reader[numpy]")
+
+
+def records_view(buffer: bytes, start: int, end: int, record_size: int) -> 'np.ndarray':
+    """ Records from start to end of the buffer as an array (records, record_size) of uint8, without copies """
+    return np.frombuffer(buffer, dtype=np.uint8, count=end - start, offset=start).reshape(-1, record_size)
+
+
+@lru_cache(maxsize=None)
+def single_byte_table(encoding: str) -> Union['np.ndarray', None]:
+    """ Code point of each byte and whether it is whitespace or \\x00, None when the encoding is not a single byte one """
+    try:
+        chars = bytes(range(256)).decode(encoding)
+    except UnicodeDecodeError:
+        return None
+    if len(chars) != 256:
+        return None
+    return np.array([ord(char) for char in chars], dtype=np.uint32), np.array([char.isspace() or char == '\x00' for char in chars], dtype=bool)
+
+
+def decode_str(field: FieldDefinition, chars: 'np.ndarray', encoding: str, strings: str) -> 'np.ndarray':
+    table = single_byte_table(encoding) if strings == 'U' else None
+    if table is None:
+        values = np.ascontiguousarray(chars).view(f'S{max(field.size, 1)}').ravel()
+        # o numpy descarta os \x00 do final, mas os espaços antes deles só saem numa nova passada
+        stripped = np.char.rstrip(values)
+        while (stripped != values).any():
+            values, stripped = stripped, np.char.rstrip(stripped)
+        return values if strings == 'S' else np.char.decode(values, encoding)
+    # nas codificações de um byte por caractere, cada byte é convertido direto no seu code point, o array tem a largura
+    # do maior valor e os espaços e \x00 à direita viram \x00, que o numpy já descarta no final de cada valor
+    code_points, whitespace = table
+    text = ~whitespace[chars]
+    length = chars.shape[1] - np.argmax(text[:, ::-1], axis=1)
+    length[~text.any(axis=1)] = 0
+    width = max(int(length.max()) if length.size else 0, 1)
+    values = code_points[chars[:, :width]] if chars.shape[1] else np.zeros((len(chars), 1), dtype=np.uint32)
+    values[np.arange(width) >= length[:, None]] = 0
+    return values.view(f'<U{width}').ravel()
+
+
+@lru_cache(maxsize=None)
+def digits_table(allowed: bytes) -> 'np.ndarray':
+    table = np.full(256, -2, dtype=np.int64)
+    table[list(allowed)] = -1
+    table[0x30:0x3a] = np.arange(10)
+    return table
+
+
+def digits_of(field: FieldDefinition, chars: 'np.ndarray', allowed: bytes) -> 'np.ndarray':
+    """ Value of each digit, -1 for the other allowed characters """
+    values = digits_table(allowed)[chars]
+    invalid = values == -2
+    if invalid.any():
+        row = int(np.argmax(invalid.any(axis=1)))
+        raise ValueError(f"Invalid value {bytes(chars[row])!r} for field {field}.")
+    return values
+
+
+def decode_number(field: FieldDefinition, chars: 'np.ndarray', encoding: str, strings: str) -> 'np.ndarray':
+    # acumula os dígitos da esquerda para a direita, uma coluna de bytes por vez para todos os registros,
+    # ignorando espaços, \x00 e o ponto decimal, e contando quantos dígitos vieram depois do ponto
+    digits = digits_of(field, chars, b' \x00.-+')
+    isdigit = digits >= 0
+    count = isdigit.sum(axis=1)
+    floating = field.decimals > 0 or field.type == 'F'
+    if count.size and count.max() > MAX_INT64_DIGITS:
+        cast = float if floating else int
+        values = [bytes(row).replace(b'\x00', b'').strip() for row in chars]
+        return np.array([cast(value) if value else None for value in values], dtype=object)
+    mantissa = np.zeros(len(chars), dtype=np.int64)
+    after_dot = np.zeros(len(chars), dtype=np.int64)
+    dot = np.zeros(len(chars), dtype=bool)
+    for position in range(chars.shape[1]):
+        mantissa = np.where(isdigit[:, position], mantissa * 10 + digits[:, position], mantissa)
+        dot |= chars[:, position] == ord('.')
+        after_dot += dot & isdigit[:, position]
+    mantissa = np.where((chars == ord('-')).any(axis=1), -mantissa, mantissa)
+    null = count == 0
+    if floating:
+        values = mantissa / np.power(10.0, after_dot)
+        values[null] = np.nan
+        return values
+    if after_dot.any():
+        raise ValueError(f"Field {field} has no decimals, but a value has decimal places.")
+    return np.ma.MaskedArray(mantissa, mask=null)
+
+
+def decode_date(field: FieldDefinition, chars: 'np.ndarray', encoding: str, strings: str) -> 'np.ndarray':
+    digits = digits_of(field, chars, b' \x00')
+    null = (digits <= 0).all(axis=1)
+    if (digits[~null] < 0).any() or chars.shape[1] != 8:
+        raise ValueError(f"Invalid date for field {field}.")
+    digits = np.where(null[:, None], 0, digits)
+    year = digits[:, 0:4] @ np.array([1000, 100, 10, 1])
+    month = np.where(null, 1, digits[:, 4:6] @ np.array([10, 1]))
+    day = np.where(null, 1, digits[:, 6:8] @ np.array([10, 1]))
+    if ((month < 1) | (month > 12) | (day < 1) | (day > 31)).any():
+        raise ValueError(f"Invalid date for field {field}.")
+    months = ((year - 1970) * 12 + month - 1).astype('datetime64[M]')
+    values = months.astype('datetime64[D]') + (day - 1)
+    if (values.astype('datetime64[M]') != months).any():
+        raise ValueError(f"Invalid date for field {field}.")
+    values[null] = np.datetime64('NaT')
+    return values
+
+
+def decode_bool(field: FieldDefinition, chars: 'np.ndarray', encoding: str, strings: str) -> 'np.ndarray':
+    chars = chars[:, 0] if chars.shape[1] else np.zeros(len(chars), dtype=np.uint8)
+    return np.ma.MaskedArray(chars == ord('T'), mask=(chars != ord('T')) & (chars != ord('F')))
+
+
+def decode_binary(field: FieldDefinition, chars: 'np.ndarray', encoding: str, strings: str) -> 'np.ndarray':
+    # os bytes de cada registro já são o número, basta ver a coluna com o dtype little endian do campo
+    return np.ascontiguousarray(chars).view({'i': '<i4', 'd': '<f8'}[binary_format(field)]).ravel()
+
+
+def decode_timestamp(field: FieldDefinition, chars: 'np.ndarray', encoding: str, strings: str) -> 'np.ndarray':
+    day, milliseconds = np.ascontiguousarray(chars).view('<u4').reshape(-1, 2).astype(np.int64).T
+    null = (day == 0) | (chars == 0x20).all(axis=1)
+    values = ((day - JULIAN_EPOCH) * MILLISECONDS_PER_DAY + milliseconds).astype('datetime64[ms]')
+    values[null] = np.datetime64('NaT')
+    return values
+
+
+def decode_currency(field: FieldDefinition, chars: 'np.ndarray', encoding: str, strings: str) -> 'np.ndarray':
+    return np.ascontiguousarray(chars).view('<i8').ravel() / CURRENCY_SCALE
+
+
+def apply_nulls(values: 'np.ndarray', null: 'np.ndarray') -> 'np.ndarray':
+    # os campos com o bit do _NullFlags ligado ficam vazios, como os valores vazios de cada tipo de array, os inteiros
+    # de campos que aceitam nulo são sempre masked, para que todos os lotes tenham o mesmo tipo de array
+    if isinstance(values, np.ma.MaskedArray) or values.dtype.kind in 'iu':
+        return np.ma.MaskedArray(np.ma.getdata(values), mask=np.ma.getmaskarray(values) | null)
+    if not null.any():
+        return values
+    values = values.copy()
+    if values.dtype.kind == 'f':
+        values[null] = np.nan
+    elif values.dtype.kind == 'M':
+        values[null] = np.datetime64('NaT')
+    elif values.dtype.kind == 'O':
+        values[null] = None
+    else:
+        values[null] = ''
+    return values
+
+
+COLUMN_DECODERS = {
+    'N': decode_number,
+    'D': decode_date,
+    'L': decode_bool,
+    'C': decode_str,
+    'F': decode_number,
+    'I': decode_binary,
+    '+': decode_binary,
+    'O': decode_binary,
+    'B': decode_binary,
+    '@': decode_timestamp,
+    'T': decode_timestamp,
+    'Y': decode_currency,
+}
+
+
+def decode_columns(fields: List[FieldDefinition], records: 'np.ndarray', encoding: str, strings: str = 'U') -> Dict[str, 'np.ndarray']:
+    """ Decode each field of the records at once
+
+    Args:
+        fields (list[FieldDefinition]): fields to decode
+        records (np.ndarray): records as an array (records, record_size) of uint8
+        encoding (str): encoding of the character fields
+        strings (str): 'U' to return C fields as str arrays, 'S' to return them as bytes arrays, default='U'
+
+    Returns:
+        dict[str, np.ndarray]: C fields as U (or S) arrays, N fields with decimals as float64 (NaN when empty),
+                               N fields without decimals as masked int64, D fields as datetime64[D] (NaT when empty)
+                               and L fields as masked bool, F fields as float64, I and + fields as int32, O fields
+                               (and 8 bytes B fields) as float64, @ and T fields as datetime64[ms] (NaT when empty)
+                               and Y fields as float64, the values whose _NullFlags bit is on are empty (masked for
+                               the I fields), the memo fields are not available
+    """
+    require_numpy()
+    memo = [field.name for field in fields if is_memo(field)]
+    if memo:
+        raise ValueError(f"Memo fields {memo} are not available in columnar reading, leave them out of the columns.")
+    result = {}
+    for field in fields:
+        values = COLUMN_DECODERS[field.type](field, records[:, field.offset:field.offset + field.size], encoding, strings)
+        null = field.null_position
+        result[field.name] = values if null is None else apply_nulls(values, (records[:, null[0]] & null[1]) != 0)
+    return result
+
+
+def keep_mask(records: 'np.ndarray', buffer: bytes, start: int, accept: Union[Callable[[bytes, int], bool], None]) -> 'np.ndarray':
+    keep = records[:, 0] == 0x20
+    if accept is not None:
+        record_size = records.shape[1]
+        keep &= np.array([accept(buffer, start + i * record_size) for i in range(len(records))], dtype=bool)
+    return keep
+
+
+def iter_column_batches(reader: 'DbfReader', batch_size: int = DEFAULT_BATCH_SIZE, columns: List[str] = None, filters: List[Filter] = None,
+                        strings: str = 'U') -> Iterator[Dict[str, 'np.ndarray']]:
+    """ Iterate over batches of up to batch_size records from the actual record of the reader, decoded by column,
+        see decode_columns. Deleted records and records that don't match the filters are not in the batches.
+    """
+    require_numpy()
+    definition: TableDefinition = reader.definition
+    fields = definition.select(columns)
+    accept = compile_filters(definition, filters)
+    for buffer, start, end in reader.iter_blocks(block_records=batch_size):
+        records = records_view(buffer, start, end, definition.record_size)
+        reader.actual_record += len(records)
+        yield decode_columns(fields, records[keep_mask(records, buffer, start, accept)], definition.encoding, strings)
+
+
+def read_columns(reader: 'DbfReader', columns: List[str] = None, filters: List[Filter] = None, strings: str = 'U',
+                 batch_size: int = DEFAULT_BATCH_SIZE) -> Dict[str, 'np.ndarray']:
+    """ Read every record from the actual record of the reader, decoded by column, see iter_column_batches """
+    require_numpy()
+    definition: TableDefinition = reader.definition
+    batches = [batch for batch in iter_column_batches(reader, batch_size, columns, filters, strings)]
+    if not batches:
+        empty = np.zeros((0, definition.record_size), dtype=np.uint8)
+        batches = [decode_columns(definition.select(columns), empty, definition.encoding, strings)]
+    return {
+        name: (np.ma.concatenate if isinstance(values, np.ma.MaskedArray) else np.concatenate)([batch[name] for batch in batches])
+        for name, values in batches[0].items()
+    }
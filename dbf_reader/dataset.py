@@ -0,0 +1,312 @@
+#!/usr/bin/env python
+import os
+import copy
+import glob
+import queue
+import itertools
+import multiprocessing
+from collections import deque
+from concurrent.futures import Executor, Future, FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Any, Dict, Iterable, Iterator, List, Tuple, Union
+from .definitions import FieldDefinition, TableDefinition
+from .cache import DefinitionCache
+from .filters import Filter, compile_filters
+from .parallel import DEFAULT_CHUNK_RECORDS, Row
+from .reader import DbfReader, DEFAULT_BUFFER_RECORDS
+
+SCHEMA_MODES = ('strict', 'union')
+
+# lotes de um .dbc esperando na fila, o worker para de descomprimir quando ela está cheia
+STREAM_QUEUE_BATCHES = 2
+
+# intervalo, em segundos, em que quem consome a fila de um .dbc verifica se o worker terminou sem o fim da fila
+STREAM_POLL_SECONDS = 0.1
+
+# a parte de cada worker: o future e, para os .dbc, a fila com os lotes
+Pending = Tuple[Future, Any]
+
+
+def is_dbc(path: str) -> bool:
+    return path.lower().endswith('.dbc')
+
+
+def dataset_rows(rows: Iterable[Row], dbf_reader: DbfReader, path: str, names: List[str], source_column: Union[str, None]) -> Iterator[Row]:
+    # as colunas do dataset que faltam no arquivo são None, a coluna da origem é o nome do arquivo
+    fields = dbf_reader.definition.select(dbf_reader.columns)
+    if list(dict.fromkeys([field.name for field in fields])) != names:
+        rows = ({name: row.get(name) for name in names} for row in rows)
+    return iter(rows) if source_column is None else with_source(rows, source_column, os.path.basename(path))
+
+
+def with_source(rows: Iterable[Row], source_column: str, source: str) -> Iterator[Row]:
+    for row in rows:
+        row[source_column] = source
+        yield row
+
+
+def read_part(path: str, start: Union[int, None], stop: Union[int, None], options: Dict[str, Any], names: List[str],
+              source_column: Union[str, None]) -> List[Row]:
+    """ Read the non deleted records from start to stop of one file of the dataset, runs in the worker process
+
+    Args:
+        path (str): DBF or DBC path
+        start (int): first record number (0 based), None for the whole file
+        stop (int): stop before this record number, None for the whole file
+        options (dict): DbfReader arguments
+        names (list[str]): dataset columns, the ones missing in this file are None
+        source_column (str): name of the column with the file name, None for no source column
+
+    Returns:
+        list[dict]: the records, with the dataset columns
+    """
+    with DbfReader(path, **options) as dbf_reader:
+        rows = iter(dbf_reader) if start is None else dbf_reader.read_records(start, stop)
+        return [row for row in dataset_rows(rows, dbf_reader, path, names, source_column)]
+
+
+def stream_part(path: str, options: Dict[str, Any], names: List[str], source_column: Union[str, None], chunk_records: int,
+                batches: Any) -> None:
+    """ Read a whole .dbc, that can't be read from the middle, decompressing it as it is read, and put its records in
+        the queue in batches of chunk_records, then None, runs in the worker process
+
+    Args:
+        path (str): DBC path
+        options (dict): DbfReader arguments
+        names (list[str]): dataset columns, the ones missing in this file are None
+        source_column (str): name of the column with the file name, None for no source column
+        chunk_records (int): records of each batch
+        batches (queue.Queue): bounded queue shared with the parent process, the put waits while it is full
+    """
+    try:
+        with DbfReader(path, compressed=True, **options) as dbf_reader:
+            rows = dataset_rows(dbf_reader, dbf_reader, path, names, source_column)
+            for batch in iter(lambda: list(itertools.islice(rows, chunk_records)), []):
+                batches.put(batch)
+    finally:
+        # o None sai mesmo com erro, que o parent levanta pelo future
+        batches.put(None)
+
+
+def next_batch(future: Future, batches: Any) -> Union[List[Row], None]:
+    """ Next batch of a stream_part, None at the end, the error of the worker is raised here """
+    while True:
+        try:
+            batch = batches.get(timeout=STREAM_POLL_SECONDS)
+        except queue.Empty:
+            # um processo que morreu não põe o None na fila
+            if not future.done():
+                continue
+            future.result()
+            return None
+        if batch is None:
+            future.result()
+        return batch
+
+
+def expand_paths(paths: Union[str, List[str]]) -> List[str]:
+    """ Paths matched by a glob pattern, sorted, or the given list of paths """
+    result = sorted(glob.glob(paths)) if isinstance(paths, str) else list(paths)
+    if not result:
+        raise ValueError(f"No files found for {paths!r}.")
+    return result
+
+
+def unify_fields(definitions: Dict[str, TableDefinition], schema: str) -> List[FieldDefinition]:
+    """ Fields of the dataset
+
+    Args:
+        definitions (dict[str, TableDefinition]): definition of each file
+        schema (str): 'strict', every file must have the same fields, with the same types, sizes and decimals, or
+                      'union', every field of every file, a field present in more than one file must have the same type
+                      and decimals, the size is the largest one
+
+    Returns:
+        list[FieldDefinition]: fields in the order they first appear
+    """
+    if schema not in SCHEMA_MODES:
+        raise ValueError(f"Unknown schema '{schema}', the schemas are {list(SCHEMA_MODES)}.")
+    (first, definition), *others = definitions.items()
+    expected = [(field.name, field.type, field.size, field.decimals) for field in definition.fields]
+    # assim como nas linhas, quando dois campos de um arquivo têm o mesmo nome vale o último
+    fields = {field.name: field for field in definition.fields}
+    for path, definition in others:
+        if schema == 'strict':
+            received = [(field.name, field.type, field.size, field.decimals) for field in definition.fields]
+            if received != expected:
+                raise ValueError(f"The fields of {path} are {received}, but the fields of {first} are {expected}.")
+            continue
+        for field in {field.name: field for field in definition.fields}.values():
+            fields[field.name] = union_field(fields.get(field.name), field, path)
+    return list(fields.values())
+
+
+def union_field(field: Union[FieldDefinition, None], other: FieldDefinition, path: str) -> FieldDefinition:
+    if field is None:
+        return other
+    if (field.type, field.decimals) != (other.type, other.decimals):
+        raise ValueError(f"Field {other.name} of {path} is {other.type}({other.size}, {other.decimals}), "
+                         f"but it was {field.type}({field.size}, {field.decimals}) in the previous files.")
+    if other.size > field.size:
+        # uma cópia, para não alterar a definição do arquivo
+        field = copy.copy(field)
+        field.size = other.size
+    return field
+
+
+class DbfDataset:
+
+    """ Many DBF or DBC files with the same layout, like the DATASUS files of each state and month, read as a single
+        stream of rows. The files are read in a pool of processes, the DBF files in chunks of chunk_records records.
+        Each DBC file, that can't be read from the middle, is decompressed by one worker as it is read, with no
+        temporary file, and its records are sent in batches of chunk_records through a bounded queue
+
+    Args:
+        paths (Union[str, list[str]]): glob pattern, like 'RDSP23*.dbc', or list of paths
+        encoding (str): encoding of the character fields, default='iso-8859-1'
+        schema (str): 'strict' or 'union', see unify_fields, default='strict'
+        columns (list[str]): names of the fields returned, default=None, all fields of the dataset
+        filters (list[tuple[str, str, Any]]): see DbfReader, the filtered fields must exist in every file, default=None
+        source_column (str): name of an extra column with the file name of each row, default=None, no source column
+        workers (int): number of processes, default=None, os.cpu_count()
+        chunk_records (int): records of each chunk of the DBF files, default=DEFAULT_CHUNK_RECORDS
+        ordered (bool): return the rows in the order of the files, otherwise as soon as they are ready, default=True
+        buffer_records (int): see DbfReader, default=DEFAULT_BUFFER_RECORDS
+        executor (Executor): executor used instead of a new ProcessPoolExecutor, default=None
+        cache (DefinitionCache): cache of the definitions, the files are not opened while they are cached,
+                                 default=None
+
+    Attributes:
+        paths (list[str]): files of the dataset
+        definitions (dict[str, TableDefinition]): definition of each file
+        fields (list[FieldDefinition]): fields of the dataset
+        names (list[str]): columns of each row, without the source column
+        records (int): records count of all files, deleted records included
+    """
+
+    def __init__(self, paths: Union[str, List[str]], encoding: str = 'iso-8859-1', schema: str = 'strict', columns: List[str] = None,
+                 filters: List[Filter] = None, source_column: str = None, workers: int = None,
+                 chunk_records: int = DEFAULT_CHUNK_RECORDS, ordered: bool = True, buffer_records: int = DEFAULT_BUFFER_RECORDS,
+                 executor: Executor = None, cache: DefinitionCache = None) -> None:
+        if chunk_records < 1:
+            raise ValueError(f"chunk_records should be at least 1, but {chunk_records} was received.")
+        if cache is not None and cache.encoding != encoding:
+            raise ValueError(f"The cache encoding is {cache.encoding}, but the dataset encoding is {encoding}.")
+        self.paths = expand_paths(paths)
+        self.encoding = encoding
+        self.filters = filters
+        self.source_column = source_column
+        self.workers = workers or os.cpu_count()
+        self.chunk_records = chunk_records
+        self.ordered = ordered
+        self.buffer_records = buffer_records
+        self.executor = executor
+        self.definitions = {}
+        for path in self.paths:
+            if cache is not None:
+                self.definitions[path] = cache.get(path)
+                compile_filters(self.definitions[path], filters)
+                continue
+            with DbfReader(path, encoding=encoding, filters=filters) as dbf_reader:
+                self.definitions[path] = dbf_reader.definition
+        self.fields = unify_fields(self.definitions, schema)
+        by_name = {field.name: field for field in self.fields}
+        unknown = [column for column in columns or [] if column not in by_name]
+        if unknown:
+            raise ValueError(f"Unknown columns {unknown}, the dataset fields are {list(by_name)}.")
+        self.names = list(by_name) if columns is None else list(dict.fromkeys(columns))
+        if source_column in self.names:
+            raise ValueError(f"The source column {source_column} is already a field of the dataset.")
+        self.records = sum([definition.records for definition in self.definitions.values()])
+
+    def options(self, path: str) -> Dict[str, Any]:
+        """ DbfReader arguments for the file, only the dataset columns present in it """
+        names = {field.name for field in self.definitions[path].fields}
+        return {
+            'encoding': self.encoding,
+            'columns': [name for name in self.names if name in names],
+            'filters': self.filters,
+            'buffer_records': self.buffer_records,
+        }
+
+    def parts(self) -> List[Tuple[str, Union[int, None], Union[int, None]]]:
+        """ (path, start, stop) of each part read by a worker, start and stop are None for the DBC files, that are
+            streamed as a whole
+        """
+        result = []
+        for path, definition in self.definitions.items():
+            if is_dbc(path):
+                result.append((path, None, None))
+                continue
+            for start in range(0, definition.records, self.chunk_records):
+                result.append((path, start, min(start + self.chunk_records, definition.records)))
+        return result
+
+    def iter_batches(self) -> Iterator[List[Row]]:
+        """ Iterate over the rows of each part, at most two parts per worker are pending at any time
+
+        Returns:
+            Iterator[list[dict]]: the rows of each part, with the dataset columns and the source column
+        """
+        if self.executor is not None:
+            yield from self._iter_batches(self.executor)
+            return
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            yield from self._iter_batches(executor)
+
+    def _iter_batches(self, executor: Executor) -> Iterator[List[Row]]:
+        parts = self.parts()
+        if not any([start is None for _, start, _ in parts]):
+            yield from self._iter_pending(executor, parts, None)
+            return
+        # as filas dos .dbc passam entre processos, ao fechar o manager um worker parado no put termina com erro
+        with multiprocessing.Manager() as manager:
+            yield from self._iter_pending(executor, parts, manager)
+
+    def _submit(self, executor: Executor, part: Tuple[str, Union[int, None], Union[int, None]], manager: Any) -> Pending:
+        path, start, stop = part
+        if start is not None:
+            return executor.submit(read_part, path, start, stop, self.options(path), self.names, self.source_column), None
+        batches = manager.Queue(STREAM_QUEUE_BATCHES)
+        return executor.submit(stream_part, path, self.options(path), self.names, self.source_column, self.chunk_records, batches), batches
+
+    def _iter_pending(self, executor: Executor, parts: List[Tuple[str, Union[int, None], Union[int, None]]],
+                      manager: Any) -> Iterator[List[Row]]:
+        # como iter_results, com no máximo dois workers por parte pendentes, mas um .dbc devolve vários lotes
+        parts = iter(parts)
+        pending = deque()
+        while True:
+            for part in parts:
+                pending.append(self._submit(executor, part, manager))
+                if len(pending) >= self.workers * 2:
+                    break
+            if not pending:
+                return
+            item = self._next_pending(pending)
+            future, batches = item
+            if batches is None:
+                pending.remove(item)
+                yield future.result()
+                continue
+            batch = next_batch(future, batches)
+            if batch is None:
+                pending.remove(item)
+                continue
+            yield batch
+
+    def _next_pending(self, pending: 'deque[Pending]') -> Pending:
+        # fora de ordem, uma parte pronta ou o .dbc mais antigo, que já começou porque as partes antes dele terminam
+        # sozinhas, esperar só as partes de DBF travaria quando todos os workers estão parados com a fila cheia
+        if self.ordered:
+            return pending[0]
+        done = [item for item in pending if item[1] is None and item[0].done()]
+        if done:
+            return done[0]
+        streams = [item for item in pending if item[1] is not None]
+        if streams:
+            return streams[0]
+        wait([future for future, _ in pending], return_when=FIRST_COMPLETED)
+        return next(item for item in pending if item[0].done())
+
+    def __iter__(self) -> Iterator[Row]:
+        for batch in self.iter_batches():
+            yield from batch
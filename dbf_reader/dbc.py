@@ -0,0 +1,214 @@
+#!/usr/bin/env python
+import struct
+from io import RawIOBase, FileIO
+from typing import Callable, Iterator, List, Tuple, Union
+
+
+# Os arquivos .dbc do DATASUS são o header do DBF sem compressão, seguido por um CRC32 de 4 bytes e pelos registros
+# comprimidos com o PKWare Data Compression Library (DCL) "implode". A descompressão abaixo é uma tradução do blast.c
+# (https://github.com/madler/zlib/blob/master/contrib/blast/blast.c), feita de forma incremental.
+
+MAXBITS = 13
+MAXWIN = 4096
+END_OF_STREAM = 519
+
+# tamanhos, em bits, dos códigos de Huffman fixos, no formato compacto do blast.c: (repetições - 1) << 4 | tamanho
+LITERAL_LENGTHS = [
+    11, 124, 8, 7, 28, 7, 188, 13, 76, 4, 10, 8, 12, 10, 12, 10, 8, 23, 8,
+    9, 7, 6, 7, 8, 7, 6, 55, 8, 23, 24, 12, 11, 7, 9, 11, 12, 6, 7, 22, 5,
+    7, 24, 6, 11, 9, 6, 7, 22, 7, 11, 38, 7, 9, 8, 25, 11, 8, 11, 9, 12,
+    8, 12, 5, 38, 5, 38, 5, 11, 7, 5, 6, 21, 6, 10, 53, 8, 7, 24, 10, 27,
+    44, 253, 253, 253, 252, 252, 252, 13, 12, 45, 12, 45, 12, 61, 12, 45,
+    44, 173,
+]
+LENGTH_LENGTHS = [2, 35, 36, 53, 38, 23]
+DISTANCE_LENGTHS = [2, 20, 53, 230, 247, 151, 248]
+LENGTH_BASE = [3, 2, 4, 5, 6, 7, 8, 9, 10, 12, 16, 24, 40, 72, 136, 264]
+LENGTH_EXTRA = [0, 0, 0, 0, 0, 0, 0, 0, 1, 2, 3, 4, 5, 6, 7, 8]
+
+
+def huffman_codes(compact_lengths: List[int]) -> List[Tuple[int, int, int]]:
+    """ Canonical Huffman codes from the compact bit lengths of blast.c
+
+    Returns:
+        list[tuple[int, int, int]]: (symbol, code, bit length) of each symbol with a code
+    """
+    lengths = []
+    for compact in compact_lengths:
+        lengths += [compact & 15] * ((compact >> 4) + 1)
+    codes = []
+    code = 0
+    for length in range(1, MAXBITS + 1):
+        for symbol, symbol_length in enumerate(lengths):
+            if symbol_length == length:
+                codes.append((symbol, code, length))
+                code += 1
+        code <<= 1
+    return codes
+
+
+def huffman_table(compact_lengths: List[int]) -> List[Tuple[int, int]]:
+    """ Lookup table indexed by the next MAXBITS bits of the stream, least significant bit first
+
+    The codes are stored inverted and most significant bit first, each table entry is the (symbol, bit length)
+    of the code that starts the index.
+    """
+    table = [(-1, MAXBITS + 1)] * (1 << MAXBITS)
+    for symbol, code, length in huffman_codes(compact_lengths):
+        stream = 0
+        for position in range(length):
+            stream |= (1 - ((code >> (length - 1 - position)) & 1)) << position
+        for high in range(1 << (MAXBITS - length)):
+            table[stream | (high << length)] = (symbol, length)
+    return table
+
+
+LITERAL_TABLE = huffman_table(LITERAL_LENGTHS)
+LENGTH_TABLE = huffman_table(LENGTH_LENGTHS)
+DISTANCE_TABLE = huffman_table(DISTANCE_LENGTHS)
+
+
+class PKWareExploder:
+
+    """ Incremental decompressor of a PKWare DCL imploded stream
+
+    Args:
+        read (Callable[[int], bytes]): function that returns up to n bytes of the compressed stream, b'' at the end
+        input_size (int): how many compressed bytes are requested on each read, default=65536
+        output_size (int): decompressed bytes kept before yielding them, default=65536
+
+    Iterate over it to get the decompressed data in chunks, only the last MAXWIN bytes are kept between chunks.
+    """
+
+    def __init__(self, read: Callable[[int], bytes], input_size: int = 65536, output_size: int = 65536) -> None:
+        self._read = read
+        self.input_size = input_size
+        self.output_size = output_size
+        self._input = b''
+        self._position = 0
+        self._bitbuf = 0
+        self._bitcnt = 0
+
+    def _fill(self, count: int) -> None:
+        while self._bitcnt < count:
+            if self._position >= len(self._input):
+                self._input = self._read(self.input_size)
+                self._position = 0
+                if not self._input:
+                    return
+            self._bitbuf |= self._input[self._position] << self._bitcnt
+            self._position += 1
+            self._bitcnt += 8
+
+    def bits(self, count: int) -> int:
+        self._fill(count)
+        if self._bitcnt < count:
+            raise ValueError("The compressed stream ended before the end code.")
+        value = self._bitbuf & ((1 << count) - 1)
+        self._bitbuf >>= count
+        self._bitcnt -= count
+        return value
+
+    def decode(self, table: List[Tuple[int, int]]) -> int:
+        self._fill(MAXBITS)
+        symbol, length = table[self._bitbuf & ((1 << MAXBITS) - 1)]
+        if length > self._bitcnt:
+            raise ValueError("The compressed stream has an invalid code or ended before the end code.")
+        self._bitbuf >>= length
+        self._bitcnt -= length
+        return symbol
+
+    def __iter__(self) -> Iterator[bytes]:
+        coded_literals = self.bits(8)
+        dictionary = self.bits(8)
+        if coded_literals > 1:
+            raise ValueError(f"Invalid literal flag {coded_literals} in the compressed stream.")
+        if dictionary < 4 or dictionary > 6:
+            raise ValueError(f"Invalid dictionary size {dictionary} in the compressed stream.")
+
+        output = bytearray()
+        written = 0
+        while True:
+            if len(output) >= self.output_size + MAXWIN:
+                yield bytes(output[:-MAXWIN])
+                written += len(output) - MAXWIN
+                del output[:-MAXWIN]
+            if not self.bits(1):
+                output.append(self.decode(LITERAL_TABLE) if coded_literals else self.bits(8))
+                continue
+            symbol = self.decode(LENGTH_TABLE)
+            length = LENGTH_BASE[symbol] + self.bits(LENGTH_EXTRA[symbol])
+            if length == END_OF_STREAM:
+                break
+            extra = 2 if length == 2 else dictionary
+            distance = (self.decode(DISTANCE_TABLE) << extra) + self.bits(extra) + 1
+            self.copy(output, written, distance, length)
+        if output:
+            yield bytes(output)
+
+    @staticmethod
+    def copy(output: bytearray, written: int, distance: int, length: int) -> None:
+        if distance > len(output):
+            raise ValueError(f"Distance {distance} is too far back, only {written + len(output)} bytes were decompressed.")
+        start = len(output) - distance
+        if distance >= length:
+            output += output[start:start + length]
+        else:
+            pattern = output[start:]
+            output += (pattern * (length // distance + 1))[:length]
+
+
+class DbcStream(RawIOBase):
+
+    """ Readable, not seekable, stream of the DBF inside a DATASUS .dbc file, the records are decompressed on demand,
+        no temporary file is written and only a few chunks are kept in memory
+
+    Args:
+        file_object (Union[str, FileIO]): path or file object of the .dbc file opened in 'rb' mode
+        chunk_size (int): size of the compressed reads and of the decompressed chunks, default=65536
+
+    Attributes:
+        name (str): name of the .dbc file, when available
+    """
+
+    def __init__(self, file_object: Union[str, FileIO], chunk_size: int = 65536) -> None:
+        self.file_object = open(file_object, 'rb') if isinstance(file_object, str) else file_object
+        self.name = getattr(self.file_object, 'name', None)
+        self._position = 0
+        self._buffer = b''
+        self._chunks = self._decompress(chunk_size)
+
+    def _decompress(self, chunk_size: int) -> Iterator[bytes]:
+        # o header é copiado como está, os 4 bytes seguintes são o CRC e o restante são os registros comprimidos
+        start = self.file_object.read(10)
+        if len(start) < 10:
+            raise ValueError("The .dbc file is too short to have a DBF header.")
+        headerlen, = struct.unpack('<H', start[8:10])
+        yield start + self.file_object.read(headerlen - 10)
+        self.file_object.read(4)
+        yield from PKWareExploder(self.file_object.read, chunk_size, chunk_size)
+
+    def read(self, size: int = -1) -> bytes:
+        while size < 0 or len(self._buffer) < size:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                break
+            self._buffer += chunk
+        size = len(self._buffer) if size < 0 else size
+        result, self._buffer = self._buffer[:size], self._buffer[size:]
+        self._position += len(result)
+        return result
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return False
+
+    def tell(self) -> int:
+        return self._position
+
+    def close(self) -> None:
+        if not self.closed:
+            self.file_object.close()
+        super().close()
@@ -0,0 +1,384 @@
+#!/usr/bin/env python
+import struct
+import keyword
+from collections import namedtuple
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterator, List, Tuple, Union
+from datetime import date, datetime, timedelta
+from .stats import timed
+
+if TYPE_CHECKING:  # pragma: no cover
+    from .definitions import FieldDefinition
+    from .memo import MemoFile
+
+# tipos de linha que o RowDecoder sabe gerar
+ROW_TYPES = ('dict', 'tuple', 'namedtuple', 'slots')
+
+# datas distintas guardadas em cache, os arquivos do DATASUS repetem poucas datas em milhões de registros
+DATE_CACHE_SIZE = 4096
+
+# campos cujo valor é o número de um bloco do arquivo de memo (.dbt ou .fpt), o B de 8 bytes do Visual FoxPro é um double
+MEMO_TYPES = ('M', 'B', 'G')
+
+# campos binários desempacotados direto pelo struct do registro, sem cast
+BINARY_FORMATS = {'I': 'i', '+': 'i', 'O': 'd', 'B': 'd'}
+
+# dia juliano de 01/01/0001, o dia 1 do date.fromordinal
+JULIAN_ORDINAL = 1721425
+
+INT32 = struct.Struct('<i')
+DOUBLE = struct.Struct('<d')
+TIMESTAMP = struct.Struct('<LL')
+CURRENCY = struct.Struct('<q')
+
+# casas decimais implícitas do Y (currency) do Visual FoxPro
+CURRENCY_SCALE = 10000
+
+
+def is_memo(field: 'FieldDefinition') -> bool:
+    return field.type in MEMO_TYPES and not (field.type == 'B' and field.size == 8)
+
+
+def binary_format(field: 'FieldDefinition') -> Union[str, None]:
+    """ struct format of the fields stored as binary numbers, None for the fields stored as text """
+    if field.type == 'B' and is_memo(field):
+        return None
+    return BINARY_FORMATS.get(field.type)
+
+
+def number_cast(field: 'FieldDefinition', encoding: str, number: type = None) -> Callable[[bytes], Union[float, int, None]]:
+    number = (float if field.decimals > 0 else int) if number is None else number
+
+    def cast(value: bytes) -> Union[float, int, None]:
+        # int() e float() aceitam os bytes ASCII do campo e ignoram os espaços, só os valores vazios ou com \x00
+        # passam pelo caminho lento
+        try:
+            return number(value)
+        except ValueError:
+            value = value.replace(b'\x00', b'').strip()
+            if value == b'':
+                return None
+            return number(value)
+    return cast
+
+
+def float_cast(field: 'FieldDefinition', encoding: str) -> Callable[[bytes], Union[float, None]]:
+    # o F guarda o número como texto, assim como o N, mas é sempre um float
+    return number_cast(field, encoding, float)
+
+
+def int_cast(field: 'FieldDefinition', encoding: str) -> Callable[[bytes], int]:
+    def cast(value: bytes) -> int:
+        return INT32.unpack(value)[0]
+    return cast
+
+
+def double_cast(field: 'FieldDefinition', encoding: str) -> Callable[[bytes], float]:
+    def cast(value: bytes) -> float:
+        return DOUBLE.unpack(value)[0]
+    return cast
+
+
+def timestamp_cast(field: 'FieldDefinition', encoding: str) -> Callable[[bytes], Union[datetime, None]]:
+    def cast(value: bytes) -> Union[datetime, None]:
+        # dia juliano e milissegundos desde a meia-noite, o dia 0 (ou brancos) é um valor vazio
+        day, milliseconds = TIMESTAMP.unpack(value)
+        if day == 0 or value == b' ' * 8:
+            return None
+        return datetime.fromordinal(day - JULIAN_ORDINAL) + timedelta(milliseconds=milliseconds)
+    return cast
+
+
+def currency_cast(field: 'FieldDefinition', encoding: str) -> Callable[[bytes], float]:
+    def cast(value: bytes) -> float:
+        return CURRENCY.unpack(value)[0] / CURRENCY_SCALE
+    return cast
+
+
+def memo_cast(field: 'FieldDefinition', encoding: str, memo: 'MemoFile') -> Callable[[bytes], Union[str, bytes, None]]:
+    """ Cast of the M, B and G fields, the field has the number of the first block of the value in the memo file,
+        as 10 ASCII digits or, in Visual FoxPro, as a 4 bytes integer. M fields are str, B and G fields are bytes
+    """
+    if memo is None:
+        raise ValueError(f"Field {field} is a memo field, but there is no memo file (.dbt or .fpt), give it with memo_file "
+                         "or leave the field out of the columns.")
+    text = field.type == 'M'
+
+    def cast(value: bytes) -> Union[str, bytes, None]:
+        block = INT32.unpack(value)[0] if len(value) == 4 else int(value.strip(b' \x00') or b'0')
+        if block <= 0:
+            return None
+        data = memo.read_memo(block)
+        return data.decode(encoding) if text else data
+    return cast
+
+
+@lru_cache(maxsize=DATE_CACHE_SIZE)
+def parse_date(value: bytes) -> Union[date, None]:
+    """ Date from the YYYYMMDD bytes of a D field, None when it is blank or zeroed """
+    if value.strip(b' \x000') == b'':
+        return None
+    return date(int(value[:4]), int(value[4:6]), int(value[6:8]))
+
+
+def date_cast(field: 'FieldDefinition', encoding: str) -> Callable[[bytes], Union[date, None]]:
+    return parse_date
+
+
+def bool_cast(field: 'FieldDefinition', encoding: str) -> Callable[[bytes], Union[bool, None]]:
+    def cast(value: bytes) -> Union[bool, None]:
+        if value == b'T':
+            return True
+        if value == b'F':
+            return False
+        return None
+    return cast
+
+
+def strip_text(text: str) -> str:
+    """ Text without the whitespace and the \\x00 at its end, in any order """
+    while True:
+        stripped = text.rstrip().rstrip('\x00')
+        if stripped == text:
+            return text
+        text = stripped
+
+
+def str_cast(field: 'FieldDefinition', encoding: str) -> Callable[[bytes], Union[str, None]]:
+    def cast(value: bytes) -> Union[str, None]:
+        text = value.decode(encoding).rstrip()
+        # alguns arquivos completam os campos com \x00 em vez de espaços, o caminho colunar já os descarta
+        return strip_text(text) if text[-1:] == '\x00' else text
+    return cast
+
+
+CAST_FACTORIES = {
+    'N': number_cast,
+    'D': date_cast,
+    'L': bool_cast,
+    'C': str_cast,
+    'F': float_cast,
+    'I': int_cast,
+    '+': int_cast,
+    'O': double_cast,
+    'B': double_cast,
+    '@': timestamp_cast,
+    'T': timestamp_cast,
+    'Y': currency_cast,
+}
+
+
+def string_caches(fields: List['FieldDefinition'], string_cache: Union[int, Dict[str, int], None]) -> Dict[str, int]:
+    """ Size of the string cache of each C field
+
+    Args:
+        fields (list[FieldDefinition]): table fields
+        string_cache (Union[int, dict[str, int]]): most recent distinct values kept for every C field, or for each
+                                                   C field named in the dict, None for no cache
+
+    Returns:
+        dict[str, int]: cache size by field name
+    """
+    if string_cache is None:
+        return {}
+    names = [field.name for field in fields if field.type == 'C']
+    if isinstance(string_cache, int):
+        string_cache = {name: string_cache for name in names}
+    for name, size in string_cache.items():
+        if name not in names:
+            raise ValueError(f"string_cache is only available for C fields, but '{name}' was received, the C fields are {names}.")
+        if size < 1:
+            raise ValueError(f"The string_cache size should be at least 1, but {size} was received for '{name}'.")
+    return dict(string_cache)
+
+
+def cached_cast(cast: Callable[[bytes], str], size: int) -> Callable[[bytes], str]:
+    """ cast with a dict of up to size decoded values keyed by the field bytes, emptied when it is full, the cache
+        is the cache attribute of the returned function
+    """
+    cache = {}
+    get = cache.get
+
+    def cached(value: bytes) -> str:
+        # os bytes do campo são a chave, num acerto não há decode e todas as linhas compartilham a mesma str, sem a
+        # ordem de uso do lru_cache, que custa mais que o decode quando os valores distintos passam do tamanho
+        result = get(value)
+        if result is None:
+            if len(cache) >= size:
+                cache.clear()
+            result = cache[value] = cast(value)
+        return result
+    cached.cache = cache
+    return cached
+
+
+def field_cast(field: 'FieldDefinition', encoding: str, string_cache: Dict[str, int], cast_seconds: Dict[str, float] = None,
+               memo: 'MemoFile' = None) -> Callable[[bytes], Any]:
+    cast = memo_cast(field, encoding, memo) if is_memo(field) else CAST_FACTORIES[field.type](field, encoding)
+    if field.type == 'C' and field.name in string_cache:
+        cast = cached_cast(cast, string_cache[field.name])
+    if cast_seconds is not None:
+        cast_seconds.setdefault(field.type, 0.0)
+
+        def add(seconds: float, field_type: str = field.type) -> None:
+            cast_seconds[field_type] += seconds
+        cast = timed(cast, add)
+    return cast
+
+
+def attribute_names(names: Tuple[str]) -> Tuple[str]:
+    """ Field names usable as attributes, the names that are not identifiers, are keywords, start with _ or repeat
+        an earlier name become _ followed by the field position, as namedtuple(..., rename=True) does
+    """
+    result = []
+    for index, name in enumerate(names):
+        if not name.isidentifier() or keyword.iskeyword(name) or name.startswith('_') or name in result:
+            name = f'_{index}'
+        result.append(name)
+    return tuple(result)
+
+
+class SlotsRow:
+
+    """ Base of the row classes generated by RowDecoder for row_type='slots', the values are kept in __slots__,
+        without a __dict__ for each row
+    """
+
+    __slots__ = ()
+    _fields: Tuple[str] = ()
+
+    def __iter__(self) -> Iterator[Any]:
+        return (getattr(self, name) for name in self._fields)
+
+    def __len__(self) -> int:
+        return len(self._fields)
+
+    def __eq__(self, other: Any) -> bool:
+        return type(self) is type(other) and tuple(self) == tuple(other)
+
+    def __repr__(self) -> str:
+        values = ", ".join([f"{name}={value!r}" for name, value in zip(self._fields, self)])
+        return f"{type(self).__name__}({values})"
+
+    def _asdict(self) -> Dict[str, Any]:
+        return dict(zip(self._fields, self))
+
+
+def slots_class(names: Tuple[str]) -> type:
+    """ Subclass of SlotsRow with one slot for each name, see attribute_names """
+    attributes = attribute_names(names)
+    arguments = "".join([f", v{i}" for i in range(len(attributes))])
+    assignments = "".join([f"        _s.{name} = v{i}\n" for i, name in enumerate(attributes)]) or "        pass\n"
+    source = f"class Row(SlotsRow):\n    __slots__ = _fields = {attributes!r}\n\n    def __init__(_s{arguments}):\n{assignments}"
+    namespace = {'SlotsRow': SlotsRow}
+    exec(source, namespace)
+    return namespace['Row']
+
+
+class RowDecoder:
+
+    """ Row decoder compiled once from a list of fields, decode a whole record with one struct unpack and
+        one call of the cast already chosen for each field
+
+    Args:
+        fields (list[FieldDefinition]): fields to decode, in the order they will be returned
+        record_size (int): size of each DBF line
+        encoding (str): encoding of the character fields
+        string_cache (dict[str, int]): cache size of the C fields whose decoded values are shared between records,
+                                       see string_caches and cached_cast, default=None, no cache
+        cast_seconds (dict[str, float]): when given, the time spent in the casts is added to it by field type, only for
+                                         instrumentation, each cast call is timed, default=None
+        memo (MemoFile): memo file of the M, B and G fields, default=None
+
+    Attributes:
+        fields (tuple[FieldDefinition]): fields decoded
+        names (tuple[str]): name of each decoded field
+        null_flags (FieldDefinition): _NullFlags field unpacked with the fields, when some of them accept nulls, the
+                                      fields whose bit is on are None
+        struct (struct.Struct): format of the whole record, skipping the deleted flag
+        casts (tuple[Callable]): cast of each field, receive the field bytes, None for the binary fields (I, +, O and
+                                 the 8 bytes B) that the struct already unpacks
+        decode (Callable): function(buffer, offset=0) that returns the record starting at offset as a dict
+        values (Callable): function(buffer, offset=0) that returns the record starting at offset as a tuple
+        row_classes (dict[str, type]): namedtuple and SlotsRow classes already generated, by row type
+    """
+
+    def __init__(self, fields: List['FieldDefinition'], record_size: int, encoding: str, string_cache: Dict[str, int] = None,
+                 cast_seconds: Dict[str, float] = None, memo: 'MemoFile' = None) -> None:
+        self.fields = tuple(fields)
+        self.names = tuple(field.name for field in self.fields)
+        nullable = [field for field in self.fields if field.null_position is not None]
+        self.null_flags = nullable[0].table.null_flags if nullable else None
+        self.struct = struct.Struct(RowDecoder.record_format(self.fields + ((self.null_flags,) if nullable else ()), record_size))
+        self.casts = tuple(
+            None if binary_format(field) else field_cast(field, encoding, string_cache or {}, cast_seconds, memo)
+            for field in self.fields
+        )
+        self.decode = self.compile('{', '}', lambda name, value: f'{name!r}: {value}')
+        self.values = self.compile('(', ',)', lambda name, value: value)
+        self.row_classes = {}
+        self._rows = {'dict': self.decode, 'tuple': self.values}
+
+    def row(self, row_type: str) -> Callable[[bytes, int], Any]:
+        """ Function(buffer, offset=0) that returns the record starting at offset as a row of the row type
+
+        Args:
+            row_type (str): 'dict', 'tuple', 'namedtuple', a namedtuple class generated for these fields, or 'slots',
+                            a SlotsRow class generated for these fields, see attribute_names
+
+        Returns:
+            Callable: compiled only once for each row type
+        """
+        if row_type not in ROW_TYPES:
+            raise ValueError(f"Unknown row_type '{row_type}', the row types are {list(ROW_TYPES)}.")
+        if row_type not in self._rows:
+            if row_type == 'namedtuple':
+                # tuple.__new__ direto, sem passar pelo __new__ em python gerado pelo namedtuple
+                row_class = namedtuple('Row', self.names, rename=True)
+                self._rows[row_type] = self.compile('new(Row, (', ',))', lambda name, value: value, {'new': tuple.__new__, 'Row': row_class})
+            else:
+                row_class = slots_class(self.names)
+                self._rows[row_type] = self.compile('Row(', ')', lambda name, value: value, {'Row': row_class})
+            self.row_classes[row_type] = row_class
+        return self._rows[row_type]
+
+    @staticmethod
+    def record_format(fields: Tuple['FieldDefinition'], record_size: int) -> str:
+        # pula o flag de apagado e cada byte que não pertence a um dos campos, o struct precisa dos campos na
+        # ordem em que estão no registro, independente da ordem em que foram pedidos
+        result = '<'
+        position = 0
+        for field in sorted(fields, key=lambda f: f.offset):
+            if field.offset > position:
+                result += f'{field.offset - position}x'
+            result += binary_format(field) or f'{field.size}s'
+            position = field.offset + field.size
+        result += f'{record_size - position}x' if record_size > position else ''
+        return result
+
+    def value_source(self, index: int) -> str:
+        source = f'v{index}' if self.casts[index] is None else f'c{index}(v{index})'
+        if hasattr(self.casts[index], 'cache'):
+            # um acerto do string_cache é só o get do dict, sem a chamada de uma função python, a str vazia, que é
+            # falsa, também passa pelo cast, que a devolve do cache
+            source = f'(g{index}(v{index}) or {source})'
+        null = self.fields[index].null_position
+        if null is None:
+            return source
+        return f'(None if n[{null[0] - self.null_flags.offset}] & {null[1]} else {source})'
+
+    def compile(self, open_with: str, close_with: str, item: Callable[[str, str], str], globals: Dict[str, Any] = None) -> Callable[[bytes, int], Any]:
+        # gera uma função com um unpack e uma chamada por campo, sem laços nem buscas em dicionários
+        # o _NullFlags, quando há campos que aceitam nulo, é desempacotado em n junto com os campos
+        fields = self.fields + ((self.null_flags,) if self.null_flags is not None else ())
+        indexes = sorted(range(len(fields)), key=lambda i: fields[i].offset)
+        names = [f'v{i}' if i < len(self.fields) else 'n' for i in indexes]
+        unpack = f"    {''.join([f'{name}, ' for name in names])}= unpack_from(buffer, offset)\n" if indexes else ''
+        items = ", ".join([item(name, self.value_source(i)) for i, name in enumerate(self.names)])
+        source = f"def decode(buffer, offset=0):\n{unpack}    return {open_with}{items}{close_with if items else close_with.lstrip(',')}\n"
+        namespace = {f'c{i}': cast for i, cast in enumerate(self.casts)}
+        namespace.update({f'g{i}': cast.cache.get for i, cast in enumerate(self.casts) if hasattr(cast, 'cache')})
+        namespace['unpack_from'] = self.struct.unpack_from
+        namespace.update(globals or {})
+        exec(source, namespace)
+        return namespace['decode']
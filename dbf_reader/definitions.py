@@ -3,6 +3,51 @@ import struct
 import datetime
 import logging
 from io import RawIOBase
+from typing import Any, Dict, List, Tuple, Union
+from .decoders import RowDecoder
+
+FIELD_TYPES = ['N', 'D', 'L', 'C', 'F', 'I', '+', 'O', '@', 'T', 'Y', 'M', 'B', 'G']
+
+# F     Float           número guardado como texto, como o N
+# I     Long            4 bytes, inteiro little endian com sinal
+# +     Autoincrement   igual ao Long
+# O     Double          8 bytes, double little endian
+# @     Timestamp       8 bytes, dois longs, o dia juliano (dias desde 01/01/4713 AC) e os milissegundos desde a meia-noite
+# T     DateTime        o timestamp do Visual FoxPro, igual ao @
+# Y     Currency        8 bytes, inteiro little endian com sinal, com 4 casas decimais implícitas
+# M     Memo            10 dígitos (ou 4 bytes no Visual FoxPro) com o número do bloco do texto no .dbt ou .fpt
+# B     Binary          como o memo, mas bytes, no Visual FoxPro é um double de 8 bytes
+# G     OLE             como o B
+# tamanhos válidos de cada campo binário, os outros tamanhos indicam um arquivo corrompido ou de outro formato
+BINARY_SIZES = {
+    'I': (4,),
+    '+': (4,),
+    'O': (8,),
+    '@': (8,),
+    'T': (8,),
+    'Y': (8,),
+    'M': (4, 10),
+    'B': (4, 8, 10),
+    'G': (4, 10),
+}
+
+# campo de sistema do Visual FoxPro com um bit para cada campo que aceita nulo, o bit ligado indica um valor nulo
+NULL_FLAGS_TYPE = '0'
+
+# flags de cada campo no Visual FoxPro
+SYSTEM_FIELD = 0x01
+NULLABLE_FIELD = 0x02
+
+# versões do Visual FoxPro, o header tem 263 bytes depois do terminador com o caminho do banco de dados (.dbc)
+VISUAL_FOXPRO_FORMATS = (0x30, 0x31, 0x32)
+BACKLINK_SIZE = 263
+
+HEADER_TERMINATORS = (b'\r', b'\x00')
+
+
+def is_dbase7(dbf_format: int) -> bool:
+    # os bits 0-2 da versão são 4 no dBase 7, que tem outro formato de header e outro formato para os campos binários
+    return dbf_format & 0x07 == 4
 
 
 class TableDefinition:
@@ -23,11 +68,23 @@ class TableDefinition:
             record_size (int): size of each DBF line
             fields (list[Field]): field list
             terminator (byte): HEADER terminator character
+            records (int): records count
+            last_update (datetime.date): date of the last update, None when it is invalid
+            file_size (int): expected file size
+            filename (str): name of the file object of the reader, None when it has no name
+            null_flags (FieldDefinition): _NullFlags system field of the Visual FoxPro tables with nullable fields, it
+                                          is not one of the fields, None when the table doesn't have it
+
+        The reader is not pickled, so a definition can be sent to other processes and reused there
+        with DbfReader(..., table_definition=definition).
     """
 
     def __init__(self, reader: RawIOBase = None, encoding: str = 'iso-8859-1') -> None:
         self.reader = reader
         self.encoding = encoding
+        self.filename = None
+        self.null_flags = None
+        self._decoders = {}
         if self.reader is not None:
             self.read_definition()
 
@@ -44,35 +101,56 @@ class TableDefinition:
         # lê os últimos 22 bytes, estes deveriam ser trailing o ser apenas e ter apenas \x00
         HEADER_BLOCK_SIZE = 32
         file_header = self.reader.read(HEADER_BLOCK_SIZE)
+        if len(file_header) < HEADER_BLOCK_SIZE:
+            raise ValueError(f"The file has only {len(file_header)} bytes, it is too short to have a DBF header of {HEADER_BLOCK_SIZE} bytes.")
         self.dbf_format, year, month, day, records, self.headerlen, trailing = struct.unpack('<bbbbLH22s', file_header)
 
         expected_trailing = b'\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00'
         if trailing != expected_trailing:
             logging.info(f"File has polluted trailing, expected {expected_trailing} but received {trailing}.")
 
-        # a definição de cada campo tem 32 caracteres ignorando os bytes que já foram lidos (32)
-        # e avançando para o caractere seguinte (32 + 1 = 33)
-        # para saber a quantidade de campos é só dividir os bytes restantes no header
-        # pelo tamanho da definição de um campo (32 bytes)
-        self.numfields = int((self.headerlen - len(file_header) - 1) / HEADER_BLOCK_SIZE)
+        # o dBase 7 tem 48 bytes por campo e guarda os campos I, +, O e @ em big endian com o bit de sinal invertido
+        if is_dbase7(self.dbf_format):
+            raise ValueError(f"dBase 7 tables (version 0x{self.dbf_format & 0xFF:02x}, 48 bytes field descriptors) are not supported.")
+
+        # o header inteiro é lido de uma vez, as definições dos campos, de 32 bytes, vão até o terminador (\r), depois
+        # dele pode haver mais bytes, como os 263 do Visual FoxPro, e os registros sempre começam em headerlen
+        descriptors = self.reader.read(self.headerlen - len(file_header))
+        if len(descriptors) < self.headerlen - len(file_header):
+            raise ValueError(f"The file ended before the end of the header, that has {self.headerlen} bytes.")
 
         # agora é só ler a definição de cada campo, começa em 1 pois o primeiro caractere do DBF indica se a linha foi ou apagada
         self.record_size = 1
         self.fields = []
-        for fieldno in range(self.numfields):
-            field = FieldDefinition(self, fieldno + 1, self.reader.read(HEADER_BLOCK_SIZE))
+        self.null_flags = None
+        position = 0
+        while descriptors[position:position + 1] not in HEADER_TERMINATORS and position + HEADER_BLOCK_SIZE <= len(descriptors):
+            field = FieldDefinition(self, len(self.fields) + 1, descriptors[position:position + HEADER_BLOCK_SIZE])
+            field.offset = self.record_size
             self.record_size += field.size
-            self.fields.append(field)
+            if field.type == NULL_FLAGS_TYPE:
+                # o _NullFlags ocupa espaço no registro, mas não é um campo da tabela
+                self.null_flags = field
+            else:
+                self.fields.append(field)
+            position += HEADER_BLOCK_SIZE
+        self.numfields = len(self.fields)
+        self.assign_null_bits()
 
-        self.reader.records = records
-        self.reader.last_update = datetime.date(year+1900, month, day) if month > 0 and day > 0 else None
-        self.reader.file_size = self.headerlen + (self.record_size * self.reader.records) + 1
+        self.records = records
+        self.last_update = datetime.date(year+1900, month, day) if month > 0 and day > 0 else None
+        self.file_size = self.headerlen + (self.record_size * self.records) + 1
+        self.reader.records = self.records
+        self.reader.last_update = self.last_update
+        self.reader.file_size = self.file_size
+        name = getattr(getattr(self.reader, 'file_object', None), 'name', None)
+        self.filename = None if name is None else str(name)
 
         # em algum momento o arquivo DBF passou a ser gerado com erro ao invés de ter uma quebra de linha usando \r,
         # passou a ter uma quebra de linha usando \x00 não foi necessariamente em todos os tipos de arquivos,
         # dado que não identifiquei em PFuuaamm, mas identifiquei em STuuaamm, ao menos a partir de 2021.07
-        self.terminator = self.reader.read(1)
-        if self.terminator != '\r':
+        self.terminator = descriptors[position:position + 1]
+        if self.terminator != b'\r':
             logging.info(f"The header terminator should be \\r nas came {self.terminator}.")
 
         logging.debug(
@@ -88,6 +166,94 @@ class TableDefinition:
         if self.terminator != b'\r' and self.terminator != b'\x00':
             raise ValueError(f"The HEADER terminator should be \\r, \\x00 is tolerated, however the character found was {self.terminator}.")
 
+    def assign_null_bits(self) -> None:
+        # os bits do _NullFlags são dados, na ordem dos campos, aos campos que aceitam nulo
+        bit = 0
+        for field in self.fields:
+            field.null_bit = None
+            if self.null_flags is not None and field.flags & NULLABLE_FIELD:
+                field.null_bit = bit
+                bit += 1
+
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        state['reader'] = None
+        state['_decoders'] = {}
+        return state
+
+    def to_dict(self) -> Dict[str, Any]:
+        """ Everything read from the header, as a dict that can be saved as JSON and loaded with from_dict """
+        return {
+            'encoding': self.encoding,
+            'filename': self.filename,
+            'dbf_format': self.dbf_format,
+            'headerlen': self.headerlen,
+            'numfields': self.numfields,
+            'record_size': self.record_size,
+            'terminator': self.terminator.decode('latin-1'),
+            'records': self.records,
+            'last_update': None if self.last_update is None else self.last_update.isoformat(),
+            'file_size': self.file_size,
+            'fields': [field.to_dict() for field in self.fields],
+            'null_flags': None if self.null_flags is None else self.null_flags.to_dict(),
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'TableDefinition':
+        """ Definition saved with to_dict, without a reader, it can be given to DbfReader(..., table_definition=definition)
+            and to the renderers
+        """
+        definition = cls(None, data['encoding'])
+        definition.filename = data['filename']
+        definition.dbf_format = data['dbf_format']
+        definition.headerlen = data['headerlen']
+        definition.numfields = data['numfields']
+        definition.record_size = data['record_size']
+        definition.terminator = data['terminator'].encode('latin-1')
+        definition.records = data['records']
+        definition.last_update = None if data['last_update'] is None else datetime.date.fromisoformat(data['last_update'])
+        definition.file_size = data['file_size']
+        definition.fields = [FieldDefinition.from_dict(definition, field) for field in data['fields']]
+        definition.null_flags = None if data['null_flags'] is None else FieldDefinition.from_dict(definition, data['null_flags'])
+        return definition
+
+    def select(self, columns: List[str] = None) -> List['FieldDefinition']:
+        """ Fields with the given names, in the given order
+
+        Args:
+            columns (list[str]): field names, default=None, all fields
+
+        Returns:
+            list[FieldDefinition]: selected fields
+        """
+        if columns is None:
+            return self.fields
+        by_name = {field.name: field for field in self.fields}
+        unknown = [column for column in columns if column not in by_name]
+        if unknown:
+            raise ValueError(f"Unknown columns {unknown}, the table fields are {list(by_name)}.")
+        # cada campo é desempacotado uma vez só, um nome repetido leria o campo seguinte
+        repeated = [column for column in dict.fromkeys(columns) if columns.count(column) > 1]
+        if repeated:
+            raise ValueError(f"Repeated columns {repeated}, each column can be selected only once.")
+        return [by_name[column] for column in columns]
+
+    def compile(self, fields: List['FieldDefinition'] = None, string_cache: Dict[str, int] = None) -> RowDecoder:
+        """ Compile, only once for each list of fields, the decoder of the records of this table
+
+        Args:
+            fields (list[FieldDefinition]): fields to decode, default=None, all fields
+            string_cache (dict[str, int]): see RowDecoder, default=None
+
+        Returns:
+            RowDecoder: decoder of the records
+        """
+        fields = self.fields if fields is None else fields
+        key = (tuple(field.order for field in fields), tuple(sorted((string_cache or {}).items())))
+        if key not in self._decoders:
+            self._decoders[key] = RowDecoder(fields, self.record_size, self.encoding, string_cache)
+        return self._decoders[key]
+
 
 class FieldDefinition:
 
@@ -103,11 +269,15 @@ class FieldDefinition:
         order (int): order of this field in the table
         name (str): field name
         type (char): field datatype:
-            N=Union[int, float, None], D=Union[datetime.date, None], L=Union[bool, None], C=Union[str, None)
-            not supported: F=Float, B=Binary, M=Memo, @=Timestamp, I=Long, +=Autoincrement, O=Double, G=OLE
+            N=Union[int, float, None], D=Union[datetime.date, None], L=Union[bool, None], C=Union[str, None),
+            F=Union[float, None], I=int, +=int, O=float, @=Union[datetime.datetime, None], M=Union[str, None],
+            B=Union[bytes, None] (float when its size is 8), G=Union[bytes, None], see FIELD_TYPES
         size (int): field size
         decimals (int): number of decimal places when it is a decimal field type
-        flags (int): other undocumented or unsupported flags
+        flags (int): other undocumented or unsupported flags, in Visual FoxPro 0x01 is a system field, 0x02 a field
+                     that accepts nulls and 0x04 a binary field
+        offset (int): position of the first byte of this field inside the record, the deleted flag is at 0
+        null_bit (int): bit of this field in the _NullFlags field of the table, None when it doesn't accept nulls
     """
 
     def __init__(self, table: TableDefinition, order: int, byte_buffer: bytes) -> None:
@@ -124,16 +294,42 @@ class FieldDefinition:
         self.size = int(size)
         self.flags = int(flags)
         self.decimals = int(decimals)
-        if self.type not in ["N", "D", "L", "C"]:
-            # F 	Float 	Number stored as a string, right justified, and padded with blanks to the width of the field.
-            # B 	Binary, a string 	10 digits representing a .DBT block number. The number is stored as a string, right justified and padded with blanks.
-            # M 	Memo, a string 	10 digits (bytes) representing a .DBT block number. The number is stored as a string, right justified and padded with blanks.
-            # @ 	Timestamp 	8 bytes - two longs, first for date, second for time.  The date is the number of days since  01/01/4713 BC. Time is hours * 3600000L + minutes * 60000L + Seconds * 1000L
-            # I 	Long 	4 bytes. Leftmost bit used to indicate sign, 0 negative.
-            # + 	Autoincrement 	Same as a Long
-            # O 	Double 	8 bytes - no conversions, stored as a double.
-            # G 	OLE 	10 digits (bytes) representing a .DBT block number. The number is stored as a string, right justified and padded with blanks.
+        self.offset = None
+        self.null_bit = None
+        if self.type not in FIELD_TYPES and self.type != NULL_FLAGS_TYPE:
             raise ValueError(f"Field type '{self.type}' not supported")
+        if self.type in BINARY_SIZES and self.size not in BINARY_SIZES[self.type]:
+            raise ValueError(f"Field {self.name} of type '{self.type}' should have size {' or '.join(map(str, BINARY_SIZES[self.type]))}, but it has {self.size}.")
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'order': self.order,
+            'name': self.name,
+            'type': self.type,
+            'size': self.size,
+            'decimals': self.decimals,
+            'flags': self.flags,
+            'offset': self.offset,
+            'null_bit': self.null_bit,
+        }
+
+    @classmethod
+    def from_dict(cls, table: TableDefinition, data: Dict[str, Any]) -> 'FieldDefinition':
+        # o tipo já foi validado quando o header foi lido, então não há bytes para decodificar
+        field = cls.__new__(cls)
+        field.table = table
+        for name in ['order', 'name', 'type', 'size', 'decimals', 'flags', 'offset', 'null_bit']:
+            setattr(field, name, data[name])
+        return field
+
+    @property
+    def null_position(self) -> Union[Tuple[int, int], None]:
+        """ (position in the record of the _NullFlags byte with the bit of this field, mask of the bit), None when the
+            field doesn't accept nulls
+        """
+        if self.null_bit is None or self.table.null_flags is None:
+            return None
+        return self.table.null_flags.offset + self.null_bit // 8, 1 << (self.null_bit % 8)
 
     def __str__(self) -> str:
         return f"#{self.order} {self.name} {self.type}({self.size},{self.decimals})"
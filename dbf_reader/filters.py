@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+import numbers
+import operator
+from datetime import date, datetime
+from typing import TYPE_CHECKING, Any, Callable, List, Tuple, Union
+from .decoders import CAST_FACTORIES, is_memo
+
+if TYPE_CHECKING:  # pragma: no cover
+    from .definitions import TableDefinition, FieldDefinition
+
+
+Filter = Tuple[str, str, Any]
+Predicate = Callable[[bytes, int], bool]
+
+COMPARISONS = {
+    '==': operator.eq,
+    '!=': operator.ne,
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+}
+OPERATORS = list(COMPARISONS) + ['in', 'not in', 'between', 'startswith']
+
+# valores aceitos em cada tipo de campo, os demais tipos são números
+VALUE_TYPES = {
+    'C': ((str, bytes), "a str"),
+    'D': ((date, str), "a date or a 'YYYYMMDD' str"),
+    'L': ((bool,), "a bool"),
+    '@': ((datetime,), "a datetime"),
+    'T': ((datetime,), "a datetime"),
+}
+NUMBER_VALUE = ((numbers.Real,), "a number")
+
+
+def raw_key(field: 'FieldDefinition', encoding: str) -> Callable[[bytes], Any]:
+    """ Function that turns the field bytes into something comparable with the values returned by value_key,
+        the C and D fields are compared as bytes, N and L are casted because their bytes are not order preserving
+
+    Args:
+        field (FieldDefinition): field definition
+        encoding (str): encoding of the character fields
+
+    Returns:
+        Callable[[bytes], Any]: None when the field is empty
+    """
+    if is_memo(field):
+        raise ValueError(f"Filters are not supported on memo fields, {field} is one.")
+    if field.type == 'C':
+        # os mesmos espaços de bytes.rstrip e também os \x00, como no valor devolvido pelo str_cast
+        return lambda raw: raw.rstrip(b' \t\n\r\x0b\x0c\x00')
+    if field.type == 'D':
+        return lambda raw: raw if raw.strip(b' \x000') != b'' else None
+    return CAST_FACTORIES[field.type](field, encoding)
+
+
+def check_value(field: 'FieldDefinition', value: Any) -> None:
+    """ Raise ValueError when the value can't be compared with the field, before any record is read, a str compared
+        with a number would fail in the middle of the iteration and a number compared with a str would never match
+    """
+    types, expected = VALUE_TYPES.get(field.type, NUMBER_VALUE)
+    valid = isinstance(value, types) and (field.type == 'L' or not isinstance(value, bool))
+    if valid and field.type == 'D' and isinstance(value, str):
+        valid = len(value) == 8 and value.isdigit()
+    if not valid:
+        raise ValueError(f"The filter value {value!r} of field {field} should be {expected}.")
+
+
+def value_key(field: 'FieldDefinition', encoding: str, value: Any) -> Any:
+    """ Turn a python value into the same representation that raw_key returns for the field
+
+    Args:
+        field (FieldDefinition): field definition
+        encoding (str): encoding of the character fields
+        value (Any): str for C, date or 'YYYYMMDD' for D, number for N and bool for L, see check_value
+
+    Returns:
+        Any: value comparable with raw_key
+    """
+    check_value(field, value)
+    if field.type == 'C' and isinstance(value, str):
+        return value.encode(encoding)
+    if field.type == 'D' and isinstance(value, date):
+        return f"{value.year:04}{value.month:02}{value.day:02}".encode(encoding)
+    if field.type == 'D' and isinstance(value, str):
+        return value.encode(encoding)
+    return value
+
+
+def compile_test(field: 'FieldDefinition', encoding: str, op: str, value: Any) -> Callable[[Any], bool]:
+    # um campo vazio (None) só atende != e 'not in', assim como aconteceria comparando o valor já convertido
+    if op in COMPARISONS:
+        compare, expected = COMPARISONS[op], value_key(field, encoding, value)
+        return lambda key: compare(key, expected) if key is not None else op == '!='
+    if op in ['in', 'not in', 'between'] and (isinstance(value, (str, bytes)) or not hasattr(value, '__iter__')):
+        raise ValueError(f"The value of '{op}' should be a list of values, but {value!r} was received.")
+    if op in ['in', 'not in']:
+        expected = frozenset([value_key(field, encoding, v) for v in value])
+        return (lambda key: key in expected) if op == 'in' else (lambda key: key not in expected)
+    if op == 'between':
+        value = tuple(value)
+        if len(value) != 2:
+            raise ValueError(f"The value of 'between' should be a (low, high) pair, but {value!r} was received.")
+        low, high = [value_key(field, encoding, v) for v in value]
+        return lambda key: key is not None and low <= key <= high
+    if field.type != 'C':
+        raise ValueError(f"Operator '{op}' is only supported on C fields, {field} is not.")
+    prefixes = tuple([value_key(field, encoding, v) for v in (value if isinstance(value, (list, tuple)) else [value])])
+    return lambda key: key.startswith(prefixes)
+
+
+def compile_filters(definition: 'TableDefinition', filters: List[Filter] = None) -> Union[Predicate, None]:
+    """ Compile a list of filters into a predicate evaluated over the raw record bytes, before any decoding
+
+    Args:
+        definition (TableDefinition): table definition
+        filters (list[tuple[str, str, Any]]): (field name, operator, value), every filter should match, the operators are
+                                            ==, !=, <, <=, >, >=, in, not in, between (value is a (low, high) pair)
+                                            and startswith (value is a str or a tuple of str, C fields only)
+
+    Returns:
+        Callable[[bytes, int], bool]: function(buffer, offset) that tells if the record starting at offset matches,
+                                      None when there are no filters
+    """
+    if not filters:
+        return None
+    tests = []
+    for name, op, value in filters:
+        if op not in OPERATORS:
+            raise ValueError(f"Operator '{op}' not supported, use one of {OPERATORS}.")
+        field = definition.select([name])[0]
+        key = raw_key(field, definition.encoding)
+        test = compile_test(field, definition.encoding, op, value)
+        tests.append((field.offset, field.offset + field.size, key, test, field.null_position))
+
+    def predicate(buffer: bytes, offset: int) -> bool:
+        # um campo com o bit do _NullFlags ligado é vazio (None), como os campos em branco
+        for start, end, key, test, null in tests:
+            if not test(None if null is not None and buffer[offset + null[0]] & null[1] else key(buffer[offset + start:offset + end])):
+                return False
+        return True
+    return predicate
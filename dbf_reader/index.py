@@ -0,0 +1,332 @@
+#!/usr/bin/env python
+import os
+import heapq
+import json
+import mmap
+import struct
+import tempfile
+from datetime import date
+from typing import Any, Callable, Dict, Iterator, List, Tuple, Union
+from .decoders import CAST_FACTORIES
+from .definitions import FieldDefinition
+from .reader import DbfReader
+
+INDEX_SUFFIX = '.idx'
+
+# versão do formato do índice, um índice de outra versão precisa ser criado de novo
+INDEX_VERSION = 2
+
+RECORD_NUMBER = struct.Struct('>L')
+
+# tipos que podem ser indexados, os N sem decimais viram dígitos exatos e os outros números (N, F, I, +, O) um double
+# ordenável
+INDEX_TYPES = ('C', 'N', 'D', 'L', 'F', 'I', '+', 'O')
+
+# entradas de todos os campos mantidas em memória, depois disso elas são gravadas ordenadas num arquivo temporário
+DEFAULT_RUN_ENTRIES = 1000000
+
+# bytes lidos de cada run em cada passo do merge
+MERGE_READ_SIZE = 65536
+
+# dígitos dos números negativos, complementados para que os maiores valores absolutos fiquem antes
+COMPLEMENT = str.maketrans('0123456789', '9876543210')
+
+
+def sortable_integer(number: int, size: int) -> Union[bytes, None]:
+    """ size + 1 bytes of the integer, exact at any size, ordered as bytes in the same order as the numbers: a sign
+        byte and the digits, complemented to 9 in the negative numbers, None when the number has more than size digits
+    """
+    digits = str(abs(number)).rjust(size, '0')
+    if len(digits) > size:
+        return None
+    if number < 0:
+        return b'-' + digits.translate(COMPLEMENT).encode('ascii')
+    return b'0' + digits.encode('ascii')
+
+
+def sortable_number(number: Union[int, float]) -> bytes:
+    """ 8 bytes of the number as a double, ordered as bytes in the same order as the numbers """
+    bits, = struct.unpack('>Q', struct.pack('>d', float(number) + 0.0))
+    return struct.pack('>Q', bits ^ 0xFFFFFFFFFFFFFFFF if bits >> 63 else bits | (1 << 63))
+
+
+def is_integral(field: FieldDefinition) -> bool:
+    # o N sem decimais é lido como int, de qualquer tamanho, um double perderia os valores acima de 2 ** 53
+    return field.type == 'N' and field.decimals == 0
+
+
+def key_size(field: FieldDefinition) -> int:
+    if is_integral(field):
+        return field.size + 1
+    return {'C': field.size, 'L': 1}.get(field.type, 8)
+
+
+def raw_index_key(field: FieldDefinition, encoding: str) -> Callable[[bytes], Union[bytes, None]]:
+    """ Function that turns the field bytes into the fixed size key saved in the index, None for the values that are
+        not indexed: empty N, D and L fields
+    """
+    if field.type == 'C':
+        return lambda raw: raw.rstrip(b' \x00').ljust(field.size, b' ')
+    if field.type == 'D':
+        return lambda raw: raw if raw.strip(b' \x000') != b'' else None
+    cast = CAST_FACTORIES[field.type](field, encoding)
+    if field.type == 'L':
+        return lambda raw: {True: b'T', False: b'F', None: None}[cast(raw)]
+    if is_integral(field):
+        return lambda raw: None if cast(raw) is None else sortable_integer(cast(raw), field.size)
+    return lambda raw: None if cast(raw) is None else sortable_number(cast(raw))
+
+
+def value_index_key(field: FieldDefinition, encoding: str, value: Any) -> Union[bytes, None]:
+    """ Key of a python value: str for C, date or 'YYYYMMDD' for D, number for N and bool for L, None when no
+        record can have it
+    """
+    if field.type == 'C':
+        value = value.encode(encoding).rstrip(b' ')
+        return value.ljust(field.size, b' ') if len(value) <= field.size else None
+    if field.type == 'D':
+        return (f"{value.year:04}{value.month:02}{value.day:02}" if isinstance(value, date) else value).encode(encoding)
+    if field.type == 'L':
+        return b'T' if value else b'F'
+    if is_integral(field):
+        if isinstance(value, float) and not value.is_integer():
+            return None
+        return sortable_integer(int(value), field.size)
+    return sortable_number(value)
+
+
+class SortedRuns:
+
+    """ External merge sort of fixed size entries: they are kept in memory until spill writes them, sorted, as a run
+        of a temporary file, and the runs are merged when the entries are read back
+
+    Args:
+        entry_size (int): size of each entry
+
+    Attributes:
+        count (int): entries appended
+        runs (list[tuple[int, int]]): position and entries count of each run in the temporary file
+    """
+
+    def __init__(self, entry_size: int) -> None:
+        self.entry_size = entry_size
+        self.entries = []
+        self.count = 0
+        self.file = None
+        self.runs = []
+
+    def append(self, entry: bytes) -> None:
+        self.entries.append(entry)
+        self.count += 1
+
+    def spill(self) -> None:
+        """ Write the entries in memory, sorted, as a new run """
+        if not self.entries:
+            return
+        if self.file is None:
+            self.file = tempfile.TemporaryFile()
+        self.entries.sort()
+        self.runs.append((self.file.tell(), len(self.entries)))
+        self.file.write(b''.join(self.entries))
+        self.entries = []
+
+    def _read_run(self, position: int, count: int) -> Iterator[bytes]:
+        # as runs dividem o mesmo arquivo, cada leitura volta para a posição da sua run
+        size = self.entry_size
+        end = position + count * size
+        page = max(1, MERGE_READ_SIZE // size) * size
+        while position < end:
+            self.file.seek(position)
+            data = self.file.read(min(page, end - position))
+            position += len(data)
+            for offset in range(0, len(data), size):
+                yield data[offset:offset + size]
+
+    def __iter__(self) -> Iterator[bytes]:
+        if not self.runs:
+            self.entries.sort()
+            return iter(self.entries)
+        self.spill()
+        return heapq.merge(*[self._read_run(position, count) for position, count in self.runs])
+
+    def close(self) -> None:
+        self.entries = []
+        if self.file is not None:
+            self.file.close()
+
+
+def build_index(path: str, fields: List[str], index_path: str = None, encoding: str = 'iso-8859-1',
+                run_entries: int = DEFAULT_RUN_ENTRIES) -> 'DbfIndex':
+    """ Read the DBF once and save, for each field, its keys sorted with the number of the record of each key
+
+    Args:
+        path (str): path of an uncompressed DBF file
+        fields (list[str]): indexed field names
+        index_path (str): index file, default=None, path + INDEX_SUFFIX
+        encoding (str): encoding of the character fields, default='iso-8859-1'
+        run_entries (int): keys kept in memory, the larger files are sorted in runs of temporary files that are
+                           merged while the index is written, default=DEFAULT_RUN_ENTRIES
+
+    Returns:
+        DbfIndex: the index, open
+    """
+    if run_entries < 1:
+        raise ValueError(f"run_entries should be at least 1, but {run_entries} was received.")
+    index_path = path + INDEX_SUFFIX if index_path is None else index_path
+    stat = os.stat(path)
+    entries = []
+    try:
+        records, selected = read_index_entries(path, fields, encoding, run_entries, entries)
+        write_index(index_path, stat, encoding, records, selected, entries)
+    finally:
+        for runs in entries:
+            runs.close()
+    return DbfIndex(path, index_path, encoding)
+
+
+def read_index_entries(path: str, fields: List[str], encoding: str, run_entries: int,
+                       entries: List[SortedRuns]) -> Tuple[int, List[FieldDefinition]]:
+    # cada entrada é a chave seguida do número do registro, ordenar os bytes ordena pela chave e depois pelo registro
+    with DbfReader(path, encoding=encoding, columns=fields) as dbf_reader:
+        if not dbf_reader.seekable():
+            raise ValueError("Indexes are only available for uncompressed DBF files.")
+        selected = dbf_reader.definition.select(fields)
+        unsupported = [field.name for field in selected if field.type not in INDEX_TYPES]
+        if unsupported:
+            raise ValueError(f"Fields {unsupported} can't be indexed, the indexed types are {list(INDEX_TYPES)}.")
+        keys = [raw_index_key(field, encoding) for field in selected]
+        entries.extend([SortedRuns(key_size(field) + RECORD_NUMBER.size) for field in selected])
+        record_size = dbf_reader.definition.record_size
+        buffered = 0
+        for buffer, start, end in dbf_reader.iter_blocks():
+            for offset in range(start, end, record_size):
+                number = dbf_reader.actual_record
+                dbf_reader.actual_record += 1
+                if buffer[offset] != 0x20:
+                    continue
+                for field, key, runs in zip(selected, keys, entries):
+                    value = key(buffer[offset + field.offset:offset + field.offset + field.size])
+                    if value is not None:
+                        runs.append(value + RECORD_NUMBER.pack(number))
+                        buffered += 1
+                if buffered >= run_entries:
+                    for runs in entries:
+                        runs.spill()
+                    buffered = 0
+        return dbf_reader.records, selected
+
+
+def write_index(index_path: str, stat: os.stat_result, encoding: str, records: int, selected: List[FieldDefinition],
+                entries: List[SortedRuns]) -> None:
+    header = {'version': INDEX_VERSION, 'identity': {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}, 'encoding': encoding,
+              'records': records, 'fields': {}}
+    position = 0
+    for field, runs in zip(selected, entries):
+        header['fields'][field.name] = {'type': field.type, 'key_size': key_size(field), 'count': runs.count, 'offset': position}
+        position += runs.count * runs.entry_size
+    with open(index_path, 'wb') as f:
+        f.write(json.dumps(header).encode('utf-8') + b'\n')
+        for runs in entries:
+            f.writelines(runs)
+
+
+class DbfIndex:
+
+    """ Sidecar index of an uncompressed DBF, created by build_index, the keys of each field are sorted, so a lookup is
+        a binary search over the index file followed by one seek for each matching record
+
+    Args:
+        path (str): path of the DBF file
+        index_path (str): index file, default=None, path + INDEX_SUFFIX
+        encoding (str): encoding of the character fields, default='iso-8859-1'
+
+    Attributes:
+        fields (dict[str, dict]): type, key size, keys count and position of each indexed field
+        reader (DbfReader): reader used to read the matching records
+    """
+
+    def __init__(self, path: str, index_path: str = None, encoding: str = 'iso-8859-1') -> None:
+        self.path = path
+        self.index_path = path + INDEX_SUFFIX if index_path is None else index_path
+        with open(self.index_path, 'rb') as f:
+            header = json.loads(f.readline().decode('utf-8'))
+            self.data_offset = f.tell()
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if os.fstat(f.fileno()).st_size else b''
+        if header.get('version') != INDEX_VERSION or header['encoding'] != encoding:
+            raise ValueError(f"The index {self.index_path} was created by another version or for another encoding, build it again.")
+        self.identity = header['identity']
+        self.records = header['records']
+        self.fields = header['fields']
+        self.reader = DbfReader(path, encoding=encoding)
+        self.by_name = {field.name: field for field in self.reader.definition.fields}
+
+    def is_stale(self) -> bool:
+        """ True when the size or the modification time of the DBF changed after the index was created """
+        stat = os.stat(self.path)
+        return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns} != self.identity
+
+    def _entries(self, name: str) -> Tuple[int, int, int]:
+        if name not in self.fields:
+            raise ValueError(f"Field {name} is not indexed, the indexed fields are {list(self.fields)}.")
+        if self.is_stale():
+            raise ValueError(f"The index {self.index_path} is stale, the DBF was changed after it was created, build it again.")
+        field = self.fields[name]
+        return self.data_offset + field['offset'], field['key_size'], field['count']
+
+    def record_numbers(self, name: str, value: Any) -> List[int]:
+        """ Numbers (0 based) of the records where the field is equal to value, in the file order
+
+        Args:
+            name (str): indexed field name
+            value (Any): str for C, date or 'YYYYMMDD' for D, number for N and bool for L
+
+        Returns:
+            list[int]: record numbers
+        """
+        start, size, count = self._entries(name)
+        key = value_index_key(self.by_name[name], self.reader.encoding, value)
+        if key is None:
+            return []
+        entry_size = size + RECORD_NUMBER.size
+        # primeira entrada com chave >= key, como bisect_left
+        low, high = 0, count
+        while low < high:
+            middle = (low + high) // 2
+            position = start + middle * entry_size
+            if self.data[position:position + size] < key:
+                low = middle + 1
+            else:
+                high = middle
+        result = []
+        position = start + low * entry_size
+        while low < count and self.data[position:position + size] == key:
+            result.append(RECORD_NUMBER.unpack_from(self.data, position + size)[0])
+            low += 1
+            position += entry_size
+        return result
+
+    def lookup(self, name: str, value: Any, columns: List[str] = None) -> Iterator[Dict[str, Union[str, float, int, date, bool]]]:
+        """ Records where the field is equal to value, each one read with a seek to its position
+
+        Args:
+            name (str): indexed field name
+            value (Any): see record_numbers
+            columns (list[str]): names of the fields returned, default=None, all fields
+
+        Returns:
+            Iterator[dict]: each record as a dict
+        """
+        for number in self.record_numbers(name, value):
+            self.reader.seek_record(number)
+            yield from self.reader.iter_rows(columns, None, number + 1)
+
+    def close(self) -> None:
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+        self.reader.close()
+
+    def __enter__(self) -> 'DbfIndex':
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+import os
+import struct
+from collections import OrderedDict
+from io import FileIO
+from typing import Union
+
+MEMO_EXTENSIONS = ('.fpt', '.dbt')
+
+DEFAULT_PAGE_SIZE = 65536
+
+# páginas guardadas em cache, no máximo DEFAULT_CACHE_PAGES * DEFAULT_PAGE_SIZE bytes (4 MiB) por arquivo de memo
+DEFAULT_CACHE_PAGES = 64
+
+# início de cada valor nos .dbt do dBase IV, seguido pelo tamanho do valor somado a estes 8 bytes
+DBASE4_BLOCK_MARK = b'\xff\xff\x08\x00'
+
+# fim de cada valor nos .dbt do dBase III
+DBASE3_TERMINATOR = b'\x1a'
+
+
+def find_memo_file(path: str) -> Union[str, None]:
+    """ Memo file next to the DBF, with the same name and the extension .fpt or .dbt, in lower or upper case """
+    base = os.path.splitext(path)[0]
+    for extension in MEMO_EXTENSIONS:
+        for candidate in [base + extension, base + extension.upper()]:
+            if os.path.isfile(candidate):
+                return candidate
+    return None
+
+
+class MemoFile:
+
+    """ Memo file (.dbt of dBase or .fpt of FoxPro) of the M, B and G fields, read in pages kept in a LRU cache of
+        bounded size, so the values of consecutive records usually cost no seek nor read call
+
+    Args:
+        file_object (Union[str, FileIO]): path or file object opened in 'rb' mode, it should be seekable
+        fox_pro (bool): True for .fpt files, default=None, True when the file name ends with .fpt
+        page_size (int): bytes read at once, default=DEFAULT_PAGE_SIZE
+        cache_pages (int): pages kept in the cache, default=DEFAULT_CACHE_PAGES
+
+    Attributes:
+        block_size (int): size of each block, the fields have the number of the first block of each value
+        hits (int): pages found in the cache
+        misses (int): pages read from the file
+    """
+
+    def __init__(self, file_object: Union[str, FileIO], fox_pro: bool = None, page_size: int = DEFAULT_PAGE_SIZE,
+                 cache_pages: int = DEFAULT_CACHE_PAGES) -> None:
+        if page_size < 1 or cache_pages < 1:
+            raise ValueError(f"page_size and cache_pages should be at least 1, but {page_size} and {cache_pages} were received.")
+        self.file_object = open(file_object, 'rb') if isinstance(file_object, str) else file_object
+        if fox_pro is None:
+            fox_pro = str(getattr(self.file_object, 'name', '')).lower().endswith('.fpt')
+        self.fox_pro = fox_pro
+        self.page_size = page_size
+        self.cache_pages = cache_pages
+        self.pages = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        header = self.read(0, 32)
+        if len(header) < 32:
+            raise ValueError("The memo file is too short, it has no header.")
+        if fox_pro:
+            self.block_size = struct.unpack('>H', header[6:8])[0]
+        else:
+            # o dBase III não guarda o tamanho do bloco, que é sempre 512
+            self.block_size = struct.unpack('<H', header[20:22])[0] or 512
+
+    def page(self, number: int) -> bytes:
+        if number in self.pages:
+            self.hits += 1
+            self.pages.move_to_end(number)
+            return self.pages[number]
+        self.misses += 1
+        self.file_object.seek(number * self.page_size)
+        page = self.file_object.read(self.page_size)
+        self.pages[number] = page
+        if len(self.pages) > self.cache_pages:
+            self.pages.popitem(last=False)
+        return page
+
+    def read(self, offset: int, size: int) -> bytes:
+        """ Up to size bytes from offset, less when the file ends before """
+        chunks = []
+        while size > 0:
+            number, start = divmod(offset, self.page_size)
+            chunk = self.page(number)[start:start + size]
+            if not chunk:
+                break
+            chunks.append(chunk)
+            offset += len(chunk)
+            size -= len(chunk)
+        return b''.join(chunks)
+
+    def read_memo(self, block: int) -> bytes:
+        """ Value starting at the block, without the block header nor the terminator """
+        offset = block * self.block_size
+        if self.fox_pro:
+            # tipo (0 = imagem, 1 = texto) e tamanho do valor, big endian
+            _, size = struct.unpack('>LL', self.read(offset, 8))
+            return self.read(offset + 8, size)
+        head = self.read(offset, 8)
+        if head[:4] == DBASE4_BLOCK_MARK:
+            return self.read(offset + 8, struct.unpack('<L', head[4:8])[0] - 8)
+        chunks = []
+        while True:
+            chunk = self.read(offset, self.page_size - offset % self.page_size)
+            end = chunk.find(DBASE3_TERMINATOR)
+            if end >= 0 or not chunk:
+                chunks.append(chunk if end < 0 else chunk[:end])
+                return b''.join(chunks)
+            chunks.append(chunk)
+            offset += len(chunk)
+
+    def close(self) -> None:
+        self.pages.clear()
+        self.file_object.close()
+
+    def __enter__(self) -> 'MemoFile':
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
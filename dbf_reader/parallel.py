@@ -0,0 +1,141 @@
+#!/usr/bin/env python
+import os
+from collections import deque
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, FIRST_COMPLETED, wait
+from datetime import date
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Tuple, Union
+from .definitions import TableDefinition
+from .filters import Filter
+from .reader import DbfReader, DEFAULT_BUFFER_RECORDS
+
+DEFAULT_CHUNK_RECORDS = 100000
+
+Row = Union[Dict[str, Union[str, float, int, date, bool]], Tuple]
+
+
+def read_chunk(path: str, definition: TableDefinition, start: int, stop: int, options: Dict[str, Any]) -> List[Row]:
+    """ Read the non deleted records from start to stop (0 based, stop not included), runs in the worker process
+
+    Args:
+        path (str): DBF path
+        definition (TableDefinition): definition already read by the parent process
+        start (int): first record number
+        stop (int): stop before this record number
+        options (dict): other DbfReader arguments
+
+    Returns:
+        list[dict]: the records of the chunk
+    """
+    with DbfReader(path, table_definition=definition, **options) as dbf_reader:
+        return [row for row in dbf_reader.read_records(start, stop)]
+
+
+def iter_results(executor: Executor, calls: Iterable[Tuple[Callable, tuple]], pending_limit: int, ordered: bool = True) -> Iterator[Any]:
+    """ Submit each (function, arguments) call to the executor, with at most pending_limit calls pending at any time
+
+    Args:
+        executor (Executor): executor
+        calls (Iterable[tuple[Callable, tuple]]): calls, taken only when there is room for them
+        pending_limit (int): maximum pending calls
+        ordered (bool): return the results in the order of the calls, otherwise as soon as they are ready, default=True
+
+    Returns:
+        Iterator[Any]: the result of each call
+    """
+    calls = iter(calls)
+    pending = deque()
+    while True:
+        for function, arguments in calls:
+            pending.append(executor.submit(function, *arguments))
+            if len(pending) >= pending_limit:
+                break
+        if not pending:
+            return
+        yield next_result(pending, ordered)
+
+
+def next_result(pending: 'deque[Future]', ordered: bool) -> Any:
+    if ordered:
+        return pending.popleft().result()
+    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+    future = next(iter(done))
+    pending.remove(future)
+    return future.result()
+
+
+class ParallelDbfReader:
+
+    """ Read a DBF in a pool of processes, the record space is split in chunks of chunk_records records and each
+        worker opens the file itself, reusing the definition parsed here
+
+    Args:
+        path (str): path of an uncompressed DBF file
+        encoding (str): encoding of the character fields, default='iso-8859-1'
+        workers (int): number of processes, default=None, os.cpu_count()
+        chunk_records (int): records of each chunk, default=DEFAULT_CHUNK_RECORDS
+        ordered (bool): return the chunks in the file order, otherwise as soon as they are ready, default=True
+        columns (list[str]): see DbfReader, default=None
+        filters (list[tuple[str, str, Any]]): see DbfReader, default=None
+        buffer_records (int): see DbfReader, default=DEFAULT_BUFFER_RECORDS
+        memory_map (bool): see DbfReader, default=False
+        string_cache (Union[int, dict[str, int]]): see DbfReader, each process has its own caches, default=None
+        row_type (str): 'dict' or 'tuple', the classes generated for 'namedtuple' and 'slots' can't be pickled back from
+                        the workers, default='dict'
+        executor (Executor): executor used instead of a new ProcessPoolExecutor, default=None
+
+    Attributes:
+        definition (TableDefinition): table definition
+        records (int): records count
+    """
+
+    def __init__(self, path: str, encoding: str = 'iso-8859-1', workers: int = None, chunk_records: int = DEFAULT_CHUNK_RECORDS,
+                 ordered: bool = True, columns: List[str] = None, filters: List[Filter] = None,
+                 buffer_records: int = DEFAULT_BUFFER_RECORDS, memory_map: bool = False, string_cache: Union[int, Dict[str, int]] = None,
+                 row_type: str = 'dict', executor: Executor = None) -> None:
+        if not isinstance(path, str) or path.lower().endswith('.dbc'):
+            raise ValueError("ParallelDbfReader needs the path of an uncompressed DBF file.")
+        if chunk_records < 1:
+            raise ValueError(f"chunk_records should be at least 1, but {chunk_records} was received.")
+        if row_type not in ('dict', 'tuple'):
+            raise ValueError(f"ParallelDbfReader only returns 'dict' or 'tuple' rows, but '{row_type}' was received.")
+        self.path = path
+        self.workers = workers or os.cpu_count()
+        self.chunk_records = chunk_records
+        self.ordered = ordered
+        self.executor = executor
+        self.options = {
+            'encoding': encoding,
+            'columns': columns,
+            'filters': filters,
+            'buffer_records': buffer_records,
+            'memory_map': memory_map,
+            'string_cache': string_cache,
+            'row_type': row_type,
+        }
+        with DbfReader(path, encoding=encoding, columns=columns, filters=filters, string_cache=string_cache) as dbf_reader:
+            self.definition = dbf_reader.definition
+            self.records = dbf_reader.records
+
+    def chunks(self) -> List[Tuple[int, int]]:
+        """ (start, stop) of each chunk """
+        return [(start, min(start + self.chunk_records, self.records)) for start in range(0, self.records, self.chunk_records)]
+
+    def iter_batches(self) -> Iterator[List[Row]]:
+        """ Iterate over the records of each chunk, at most two chunks per worker are pending at any time
+
+        Returns:
+            Iterator[list[dict]]: the records of each chunk
+        """
+        if self.executor is not None:
+            yield from self._iter_batches(self.executor)
+            return
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            yield from self._iter_batches(executor)
+
+    def _iter_batches(self, executor: Executor) -> Iterator[List[Row]]:
+        calls = ((read_chunk, (self.path, self.definition, start, stop, self.options)) for start, stop in self.chunks())
+        return iter_results(executor, calls, self.workers * 2, self.ordered)
+
+    def __iter__(self) -> Iterator[Row]:
+        for batch in self.iter_batches():
+            yield from batch
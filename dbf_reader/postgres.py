@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+from datetime import date
+from io import RawIOBase
+from typing import Any, BinaryIO, Iterator, List, Tuple
+from .filters import Filter
+from .reader import DbfReader
+from .renderers import DbfDescriptionPostgresDDL
+
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+
+# formato text do COPY: barra invertida, tab e quebras de linha são escapados, \x00 não é aceito pelo PostgreSQL
+COPY_ESCAPES = str.maketrans({'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r', '\x00': ''})
+
+
+def copy_value(value: Any) -> str:
+    """ Value in the PostgreSQL COPY text format """
+    if value is None:
+        return '\\N'
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    if isinstance(value, str):
+        return value.translate(COPY_ESCAPES)
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, bytes):
+        # bytea em hexadecimal, a barra é escapada pelo formato do COPY
+        return '\\\\x' + value.hex()
+    return str(value)
+
+
+def copy_line(values: Tuple) -> str:
+    return '\t'.join([copy_value(value) for value in values]) + '\n'
+
+
+def copy_sql(reader: DbfReader, schema: str, tablename: str, columns: List[str] = None) -> str:
+    """ COPY ... FROM STDIN statement for the fields of the reader, the column names are the ones of
+        DbfDescriptionPostgresDDL
+    """
+    columns = reader.columns if columns is None else columns
+    names = ", ".join([field.name.lower() for field in reader.definition.select(columns)])
+    return f"COPY {schema}.{tablename} ({names}) FROM STDIN WITH (FORMAT text, ENCODING 'UTF8')"
+
+
+class PostgresCopyStream(RawIOBase):
+
+    """ Readable stream of the records of a reader in the PostgreSQL COPY text format, encoded as UTF-8, the lines
+        are produced as they are read, so it can be given to psycopg2 copy_expert or saved to a file
+
+    Args:
+        reader (DbfReader): reader, the iteration starts at its actual record
+        columns (list[str]): see DbfReader, default=None, the columns of the reader
+        filters (list[tuple[str, str, Any]]): see DbfReader, default=None, the filters of the reader
+        chunk_size (int): size, in bytes, of the chunks returned by iter_chunks, default=DEFAULT_CHUNK_SIZE
+    """
+
+    def __init__(self, reader: DbfReader, columns: List[str] = None, filters: List[Filter] = None, chunk_size: int = DEFAULT_CHUNK_SIZE) -> None:
+        columns = reader.columns if columns is None else columns
+        filters = reader.filters if filters is None else filters
+        self.chunk_size = chunk_size
+        self._lines = (copy_line(values).encode('utf-8') for values in reader.iter_values(columns, filters))
+        self._buffer = b''
+
+    def read(self, size: int = -1) -> bytes:
+        lines = [self._buffer]
+        length = len(self._buffer)
+        while size < 0 or length < size:
+            line = next(self._lines, None)
+            if line is None:
+                break
+            lines.append(line)
+            length += len(line)
+        data = b''.join(lines)
+        size = len(data) if size < 0 else size
+        self._buffer = data[size:]
+        return data[:size]
+
+    def iter_chunks(self) -> Iterator[bytes]:
+        while True:
+            chunk = self.read(self.chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+    def readable(self) -> bool:
+        return True
+
+
+def write_copy(reader: DbfReader, file_object: BinaryIO, columns: List[str] = None, filters: List[Filter] = None,
+               chunk_size: int = DEFAULT_CHUNK_SIZE) -> None:
+    """ Write the records of the reader to a binary file object in the COPY text format, ready for
+        COPY ... FROM STDIN or psql \\copy
+    """
+    for chunk in PostgresCopyStream(reader, columns, filters, chunk_size).iter_chunks():
+        file_object.write(chunk)
+
+
+def load(reader: DbfReader, connection: Any, schema: str, tablename: str, columns: List[str] = None, filters: List[Filter] = None,
+         chunk_size: int = DEFAULT_CHUNK_SIZE, create: bool = True) -> str:
+    """ Load the records of the reader into a PostgreSQL table using COPY, the records are streamed in chunks of
+        chunk_size bytes, the transaction is not committed
+
+    Args:
+        reader (DbfReader): reader, the iteration starts at its actual record
+        connection (Any): psycopg2 or psycopg (3) connection
+        schema (str): schema name
+        tablename (str): table name
+        columns (list[str]): see DbfReader, default=None, the columns of the reader
+        filters (list[tuple[str, str, Any]]): see DbfReader, default=None, the filters of the reader
+        chunk_size (int): size, in bytes, of each chunk sent to the connection, default=DEFAULT_CHUNK_SIZE
+        create (bool): create the schema and the table with DbfDescriptionPostgresDDL when they don't exist,
+                       default=True
+
+    Returns:
+        str: COPY statement executed
+    """
+    sql = copy_sql(reader, schema, tablename, columns)
+    stream = PostgresCopyStream(reader, columns, filters, chunk_size)
+    cursor = connection.cursor()
+    try:
+        if create:
+            cursor.execute(str(DbfDescriptionPostgresDDL(reader.definition, schema, tablename)))
+        if hasattr(cursor, 'copy'):
+            with cursor.copy(sql) as copy:
+                for chunk in stream.iter_chunks():
+                    copy.write(chunk)
+        else:
+            cursor.copy_expert(sql, stream, size=chunk_size)
+    finally:
+        cursor.close()
+    return sql
@@ -1,9 +1,18 @@
 #!/usr/bin/env python
-from typing import Union, Dict, List
+from typing import Union, Callable, Dict, List, Iterator, Tuple
+import mmap
+import time
 import codecs
 from datetime import date
 from io import RawIOBase, FileIO, SEEK_SET
 from .definitions import TableDefinition, FieldDefinition
+from .decoders import ROW_TYPES, RowDecoder, is_memo, string_caches
+from .filters import Filter, compile_filters
+from .dbc import DbcStream
+from .memo import MemoFile, find_memo_file
+from .stats import ReaderStats, timed
+from .stream import ReadAheadStream
+from . import columnar
 
 
 class Casts:
@@ -35,47 +44,362 @@ class Casts:
     }
 
 
+DEFAULT_BUFFER_RECORDS = 1024
+
+DEFAULT_PROGRESS_INTERVAL = 100000
+
+
 class DbfReader(RawIOBase):
 
-    def __init__(self, file_object: Union[str, FileIO], encoding: str = 'iso-8859-1', table_definition: TableDefinition = None) -> None:
+    """ DBF reader, iterate over it to get each non deleted record as a dict
+
+    Args:
+        file_object (Union[str, FileIO]): path or file object opened in 'rb' mode
+        encoding (str): encoding of the character fields, default='iso-8859-1'
+        table_definition (TableDefinition): definition already read from this same file, the header is skipped instead
+                                            of being parsed again, default=None
+        buffer_records (int): how many records are read from the file object in each read call while iterating,
+                              1 reads record by record, default=DEFAULT_BUFFER_RECORDS
+        columns (list[str]): names of the fields returned while iterating, the other fields are neither decoded nor
+                             casted, default=None, all fields
+        filters (list[tuple[str, str, Any]]): (field name, operator, value) evaluated over the raw record bytes,
+                                              records that don't match every filter are skipped before being decoded,
+                                              see filters.compile_filters, default=None
+        compressed (bool): True when it is a DATASUS .dbc file (DBF compressed with PKWare DCL implode), decompressed
+                           while reading, default=None, True when the file name ends with .dbc
+        memory_map (bool): map the file in memory and decode the records straight from the mapping, without read calls
+                           nor copies of the records, only for uncompressed files on disk, default=False
+        string_cache (Union[int, dict[str, int]]): keep up to this many distinct values of each C field in a dict,
+                                                   emptied when it is full, or only for the fields in the dict, repeated
+                                                   values are neither decoded again nor allocated again, all records
+                                                   share the same str, default=None, no cache
+        row_type (str): type of the rows returned while iterating: 'dict', 'tuple', 'namedtuple' or 'slots' (a class
+                        with __slots__ generated for the fields), see RowDecoder.row, default='dict'
+        timings (bool): also measure, in stats, the time spent decoding the records and casting each field type, every
+                        record and every cast is timed, so it is slower, default=False
+        progress (Callable[[ReaderStats], None]): called with the stats while iterating, every progress_interval records
+                                                  and when the last record is reached, default=None
+        progress_interval (int): records between the progress calls, default=DEFAULT_PROGRESS_INTERVAL
+        memo_file (Union[str, FileIO, MemoFile]): memo file (.dbt or .fpt) of the M, B and G fields, default=None, the
+                                                  file with the same name of the DBF and the .fpt or .dbt extension,
+                                                  when there is one
+        read_ahead (int): read the file object in a background thread, up to this many bytes ahead of the decoding,
+                          for non seekable sources (pipes, HTTP or FTP responses, gzip files) the network waits overlap
+                          with the decoding, see ReadAheadStream, the file object becomes not seekable, default=None,
+                          read only when the records are needed
+
+    Attributes:
+        stats (ReaderStats): bytes read, rows returned, deleted and filtered records and the time spent reading
+        memo (MemoFile): memo file, None when the table has no memo fields or the memo file was not found
+    """
+
+    def __init__(self, file_object: Union[str, FileIO], encoding: str = 'iso-8859-1', table_definition: TableDefinition = None,
+                 buffer_records: int = DEFAULT_BUFFER_RECORDS, columns: List[str] = None, filters: List[Filter] = None,
+                 compressed: bool = None, memory_map: bool = False, string_cache: Union[int, Dict[str, int]] = None,
+                 row_type: str = 'dict', timings: bool = False, progress: Callable[[ReaderStats], None] = None,
+                 progress_interval: int = None, memo_file: Union[str, FileIO, MemoFile] = None, read_ahead: int = None) -> None:
         # Check file object mode is read and binary
         _file_object = open(file_object, 'rb') if isinstance(file_object, str) else file_object
 
-        if hasattr(_file_object, 'mode') and _file_object.mode != 'rb':
+        # o mode do GzipFile é um int, só os modes str são verificados
+        mode = getattr(_file_object, 'mode', None)
+        if isinstance(mode, str) and ('r' not in mode or 'b' not in mode):
             raise IOError("File object need to be in binary readble mode ('rb')")
 
+        if read_ahead is not None:
+            _file_object = ReadAheadStream(_file_object, read_ahead)
+        if compressed is None:
+            compressed = str(getattr(_file_object, 'name', '')).lower().endswith('.dbc')
+        if compressed:
+            _file_object = DbcStream(_file_object)
+
         # Check encoding exists
         codecs.lookup(encoding)
 
+        if buffer_records < 1:
+            raise ValueError(f"buffer_records should be at least 1, but {buffer_records} was received.")
+
         self.file_object = _file_object
         self.encoding = encoding
+        self.buffer_records = buffer_records
+        self.memory_map = None
         self.actual_record = 0
         self.file_size = None
         self.records = None
         self.last_update = None
         if table_definition is None:
             self.definition = TableDefinition(self, self.encoding)
-        # else:
-        #     self.definition = table_definition
-        #     self.file_object.read(self.definition.headerlen)
-
-    def __iter__(self) -> Dict[str, Union[str, float, int, date, bool]]:
-        while self.actual_record < self.records:
-            self.actual_record += 1
-            deleted = self.read(1)
-            if deleted != b' ':
-                self.read(self.definition.record_size-1)
-                continue
-            result = {}
-            for field in self.definition.fields:
-                result[field.name] = self.get_field_value(field)
-            yield result
+        else:
+            self.definition = table_definition
+            self.records = table_definition.records
+            self.last_update = table_definition.last_update
+            self.file_size = table_definition.file_size
+            self.file_object.read(self.definition.headerlen)
+        self.columns = columns
+        self.filters = filters
+        self.definition.select(columns)
+        compile_filters(self.definition, filters)
+        self.string_cache = string_caches(self.definition.fields, string_cache)
+        if row_type not in ROW_TYPES:
+            raise ValueError(f"Unknown row_type '{row_type}', the row types are {list(ROW_TYPES)}.")
+        self.row_type = row_type
+        self.stats = ReaderStats(self.records)
+        self.timings = timings
+        self.progress = progress
+        self.progress_interval = DEFAULT_PROGRESS_INTERVAL if progress_interval is None else progress_interval
+        if self.progress_interval < 1:
+            raise ValueError(f"progress_interval should be at least 1, but {self.progress_interval} was received.")
+        self._next_progress = self.progress_interval
+        self._reported = None
+        self._decoders = {}
+        # último bloco lido do arquivo: (buffer, número do primeiro registro, registros)
+        self._pending = None
+        self.memo = self.open_memo(memo_file)
+        if memory_map:
+            self.memory_map = self.map_file()
+
+    def __iter__(self) -> Iterator[Dict[str, Union[str, float, int, date, bool]]]:
+        return self.iter_rows(self.columns, self.filters)
+
+    def iter_rows(self, columns: List[str] = None, filters: List[Filter] = None, stop: int = None,
+                  row_type: str = None) -> Iterator[Dict[str, Union[str, float, int, date, bool]]]:
+        """ Iterate over the non deleted records from the actual record
+
+        Args:
+            columns (list[str]): names of the fields returned, the other fields are neither decoded nor casted,
+                                 default=None, all fields
+            filters (list[tuple[str, str, Any]]): (field name, operator, value), records that don't match every filter
+                                                  are skipped before being decoded, default=None
+            stop (int): stop before this record number (0 based), default=None, until the last record
+            row_type (str): 'dict', 'tuple', 'namedtuple' or 'slots', default=None, the row type of this reader
+
+        Returns:
+            Iterator[dict]: each record as a dict, or as a row of the row type
+        """
+        decoder = self.decoder(columns)
+        return self._iter_decoded(decoder.row(self.row_type if row_type is None else row_type), filters, stop)
+
+    def iter_values(self, columns: List[str] = None, filters: List[Filter] = None, stop: int = None) -> Iterator[Tuple]:
+        """ Iterate over the non deleted records from the actual record, each record as a tuple with the values in
+            the order of the columns, see iter_rows
+        """
+        return self._iter_decoded(self.decoder(columns).values, filters, stop)
+
+    def decoder(self, columns: List[str] = None) -> RowDecoder:
+        """ Decoder of the columns, the one compiled for the table definition or, with timings or memo fields, one of
+            this reader that times the casts or reads the memo file
+        """
+        fields = self.definition.select(columns)
+        memo = any([is_memo(field) for field in fields])
+        if not self.timings and not memo:
+            return self.definition.compile(fields, self.string_cache)
+        key = tuple(field.order for field in fields)
+        if key not in self._decoders:
+            self._decoders[key] = RowDecoder(fields, self.definition.record_size, self.encoding, self.string_cache,
+                                             self.stats.cast_seconds if self.timings else None, self.memo)
+        return self._decoders[key]
+
+    def _iter_decoded(self, decode, filters: List[Filter], stop: int) -> Iterator:
+        # decodifica cada registro com o decoder compilado para a tabela, ao invés de fazer uma chamada de read e
+        # uma busca no CAST_MAP para cada campo, os contadores são locais e só vão para o stats no fim de cada bloco
+        record_size = self.definition.record_size
+        accept = compile_filters(self.definition, filters)
+        if self.timings:
+            decode = timed(decode, self._add_decode_seconds)
+        rows = deleted = filtered = 0
+        try:
+            for buffer, start, end in self.iter_blocks(stop):
+                for offset in range(start, end, record_size):
+                    self.actual_record += 1
+                    if buffer[offset] != 0x20:
+                        deleted += 1
+                    elif accept is not None and not accept(buffer, offset):
+                        filtered += 1
+                    else:
+                        rows += 1
+                        yield decode(buffer, offset)
+                self._count(rows, deleted, filtered)
+                rows = deleted = filtered = 0
+        finally:
+            self._count(rows, deleted, filtered)
+
+    def _add_decode_seconds(self, seconds: float) -> None:
+        self.stats.decode_seconds += seconds
+
+    def _count(self, rows: int, deleted: int, filtered: int) -> None:
+        stats = self.stats
+        stats.rows += rows
+        stats.deleted += deleted
+        stats.filtered += filtered
+        stats.actual_record = self.actual_record
+        if self.progress is None or self.actual_record == self._reported:
+            return
+        if self.actual_record >= self._next_progress or self.actual_record >= self.records:
+            self._next_progress = (self.actual_record // self.progress_interval + 1) * self.progress_interval
+            self._reported = self.actual_record
+            self.progress(stats)
+
+    def iter_blocks(self, stop: int = None, block_records: int = None) -> Iterator[Tuple[bytes, int, int]]:
+        """ Iterate over blocks of up to buffer_records whole records from the actual record, the records are read
+            from the file object in one read call for each block, or are taken from the memory map
+
+        The caller should increment actual_record for each record it consumes before asking for the next block.
+
+        Args:
+            stop (int): stop before this record number (0 based), default=None, until the last record
+            block_records (int): records of each block, default=None, buffer_records
+
+        Returns:
+            Iterator[tuple[bytes, int, int]]: (buffer, offset of the first record, offset after the last record)
+        """
+        record_size = self.definition.record_size
+        block_records = self.buffer_records if block_records is None else block_records
+        stop = self.records if stop is None else min(stop, self.records)
+        while self.actual_record < stop:
+            count = min(block_records, stop - self.actual_record)
+            if self.memory_map is not None:
+                start = self.definition.headerlen + self.actual_record * record_size
+                buffer = self.memory_map
+                count = min(count, (len(buffer) - start) // record_size)
+                self.stats.bytes_read += max(count, 0) * record_size
+            else:
+                buffer, start, count = self._read_block(count)
+            if count <= 0:
+                return
+            yield buffer, start, start + count * record_size
+
+    def _read_block(self, count: int) -> Tuple[bytes, int, int]:
+        # o arquivo já está depois do último bloco lido, então os registros dele que não foram consumidos, por quem
+        # parou de iterar no meio do bloco, saem do próprio bloco ao invés de uma nova leitura
+        record_size = self.definition.record_size
+        if self._pending is not None:
+            buffer, first, available = self._pending
+            consumed = self.actual_record - first
+            if 0 <= consumed < available:
+                return buffer, consumed * record_size, min(count, available - consumed)
+        self._pending = None
+        started = time.perf_counter()
+        buffer = self.read(record_size * count)
+        self.stats.read_seconds += time.perf_counter() - started
+        count = len(buffer) // record_size
+        self.stats.bytes_read += count * record_size
+        self._pending = (buffer, self.actual_record, count)
+        return buffer, 0, count
+
+    # COLUMNAR
+    def iter_column_batches(self, batch_size: int = columnar.DEFAULT_BATCH_SIZE, columns: List[str] = None, filters: List[Filter] = None,
+                            strings: str = 'U') -> Iterator[Dict[str, 'columnar.np.ndarray']]:
+        """ Iterate over batches of up to batch_size records, each batch is a dict of NumPy arrays, one per field,
+            decoded at once for the whole batch, needs numpy
+
+        Args:
+            batch_size (int): records read for each batch, deleted and filtered records are dropped after the read
+            columns (list[str]): see iter_rows, default=None, the columns of this reader
+            filters (list[tuple[str, str, Any]]): see iter_rows, default=None, the filters of this reader
+            strings (str): 'U' to return C fields as str arrays, 'S' to return them as bytes arrays, default='U'
+
+        Returns:
+            Iterator[dict[str, np.ndarray]]: C fields as U (or S) arrays, N fields with decimals as float64 (NaN when
+                                             empty), N fields without decimals as masked int64, D fields as
+                                             datetime64[D] (NaT when empty) and L fields as masked bool
+        """
+        columns = self.columns if columns is None else columns
+        filters = self.filters if filters is None else filters
+        return columnar.iter_column_batches(self, batch_size, columns, filters, strings)
+
+    def read_columns(self, columns: List[str] = None, filters: List[Filter] = None, strings: str = 'U') -> Dict[str, 'columnar.np.ndarray']:
+        """ Read every record from the actual record as a dict of NumPy arrays, one per field, see iter_column_batches """
+        columns = self.columns if columns is None else columns
+        filters = self.filters if filters is None else filters
+        return columnar.read_columns(self, columns, filters, strings)
+
+    # RANDOM ACCESS
+    def seek_record(self, number: int) -> None:
+        """ Move to the record number (0 based), the next iteration starts on it
+
+        Args:
+            number (int): record number, from 0 to records (after the last one)
+        """
+        if not 0 <= number <= self.records:
+            raise IndexError(f"Record {number} out of range, the file has {self.records} records.")
+        if self.memory_map is None:
+            if not self.seekable():
+                raise IOError("The file object is not seekable, use skip() to move forward.")
+            self.seek(self.definition.headerlen + number * self.definition.record_size)
+        self.actual_record = number
+
+    def skip(self, count: int) -> None:
+        """ Skip the next count records without decoding them, the records are read and discarded when the file
+            object is not seekable
+
+        Args:
+            count (int): how many records to skip
+        """
+        if count < 0:
+            raise ValueError(f"Only forward skips are possible, but {count} was received.")
+        stop = min(self.actual_record + count, self.records)
+        if self.memory_map is not None or self.seekable():
+            return self.seek_record(stop)
+        for buffer, start, end in self.iter_blocks(stop):
+            self.actual_record += (end - start) // self.definition.record_size
+
+    def read_records(self, start: int, stop: int = None) -> Iterator[Dict[str, Union[str, float, int, date, bool]]]:
+        """ Iterate over the non deleted records from start to stop (0 based, stop not included), using the columns
+            and filters of this reader
+
+        Args:
+            start (int): first record number
+            stop (int): stop before this record number, default=None, until the last record
+
+        Returns:
+            Iterator[dict]: each record as a dict, or as a row of the row type of this reader
+        """
+        self.seek_record(start)
+        return self.iter_rows(self.columns, self.filters, stop)
+
+    def __getitem__(self, number: int) -> Union[Dict[str, Union[str, float, int, date, bool]], None]:
+        """ Record number (0 based, negative counts from the end), None when it is deleted or doesn't match the
+            filters, the next iteration starts after it
+        """
+        if not isinstance(number, int):
+            raise TypeError(f"Record numbers must be integers, not {type(number).__name__}.")
+        if number < 0:
+            number += self.records
+        if not 0 <= number < self.records:
+            raise IndexError(f"Record {number} out of range, the file has {self.records} records.")
+        return next(self.read_records(number, number + 1), None)
+
+    def open_memo(self, memo_file: Union[str, FileIO, MemoFile] = None) -> Union[MemoFile, None]:
+        if memo_file is None:
+            if not any([is_memo(field) for field in self.definition.fields]):
+                return None
+            name = getattr(self.file_object, 'name', None)
+            memo_file = None if not isinstance(name, str) else find_memo_file(name)
+            if memo_file is None:
+                # sem o memo os outros campos continuam legíveis, o erro só vem se um campo de memo for decodificado
+                return None
+        return memo_file if isinstance(memo_file, MemoFile) else MemoFile(memo_file)
+
+    def map_file(self) -> mmap.mmap:
+        if isinstance(self.file_object, DbcStream):
+            raise ValueError("memory_map is not available for compressed (.dbc) files.")
+        try:
+            fileno = self.file_object.fileno()
+        except (AttributeError, OSError):
+            raise ValueError("memory_map is only available for files on disk.")
+        return mmap.mmap(fileno, 0, access=mmap.ACCESS_READ)
 
     def get_field_value(self, field) -> Union[str, float, int, date, bool]:
         return Casts.CAST_MAP[field.type](field, self.read(field.size).decode(self.encoding))
 
     # INPUT/OUTPUT
     def close(self) -> None:
+        if getattr(self, 'memo', None) is not None:
+            self.memo.close()
+            self.memo = None
+        if getattr(self, 'memory_map', None) is not None:
+            self.memory_map.close()
+            self.memory_map = None
         if hasattr(self, 'file_object') and self.file_object is not None:
             return self.file_object.close()
 
@@ -90,6 +414,7 @@ class DbfReader(RawIOBase):
         return self.file_object.isatty()
 
     def seek(self, offset, whence=SEEK_SET) -> int:
+        self._pending = None
         return self.file_object.seek(offset, whence)
 
     def seekable(self) -> bool:
@@ -101,14 +426,29 @@ class DbfReader(RawIOBase):
     def __del__(self) -> None:
         if hasattr(self, 'file_object') and self.file_object is not None:
             self.close()
-            return self.file_object.__del__()
+            # origens como sockets e respostas HTTP podem não ter __del__
+            if hasattr(self.file_object, '__del__'):
+                return self.file_object.__del__()
 
     # INPUT
     def readable(self) -> bool:
         return self.file_object.readable()
 
     def read(self, size: int) -> bytes:
-        return self.file_object.read(size)
+        data = self.file_object.read(size)
+        if size is None or size < 0 or len(data) >= size or not data:
+            return data
+        # sockets, pipes e respostas HTTP podem devolver menos do que foi pedido antes do fim, os registros não podem
+        # ficar pela metade
+        chunks = [data]
+        size -= len(data)
+        while size > 0:
+            data = self.file_object.read(size)
+            if not data:
+                break
+            chunks.append(data)
+            size -= len(data)
+        return b''.join(chunks)
 
     def readline(self, *args) -> bytes:
         raise NotImplementedError()
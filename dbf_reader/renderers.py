@@ -1,6 +1,22 @@
 #!/usr/bin/env python
 from .definitions import TableDefinition, FieldDefinition
 
+# tipos de tamanho fixo, o N e o C dependem do tamanho do campo
+PG_TYPES = {
+    'D': "date",
+    'L': "boolean",
+    'F': "double precision",
+    'I': "integer",
+    '+': "integer",
+    'O': "double precision",
+    '@': "timestamp",
+    'T': "timestamp",
+    'Y': "numeric(19,4)",
+    'M': "text",
+    'B': "bytea",
+    'G': "bytea",
+}
+
 
 class DbfDescriptionText:
     def __init__(self, definition: TableDefinition) -> None:
@@ -10,7 +26,7 @@ class DbfDescriptionText:
         result = ''
         result += f"""
 FILE DEFINITION
-filename: {self.definition.reader.file_object.name if hasattr(self.definition.reader.file_object, '') else 'not a file' }
+filename: {self.definition.filename if self.definition.filename is not None else 'not a file'}
 header's length:   {self.definition.headerlen}
 number of fields:  {self.definition.numfields}
 line size:         {self.definition.record_size}
@@ -28,7 +44,7 @@ class DbfDescriptionMarkdown:
 
     def __str__(self) -> str:
         result = f"""
-### File {self.definition.reader.file_object.name} description
+### File {self.definition.filename} description
 
 | info              | value   |
 | ----------------- | ------- |
@@ -47,12 +63,14 @@ class DbfDescriptionMarkdown:
 
 
 class DbfDescriptionPostgresDDL:
-    def __init__(self, definition: TableDefinition) -> None:
+    def __init__(self, definition: TableDefinition, schema: str = 'schemaname', tablename: str = 'tablename') -> None:
         self.definition = definition
+        self.schema = schema
+        self.tablename = tablename
 
     def __str__(self) -> str:
-        schema = 'schemaname'
-        tablename = 'tablename'
+        schema = self.schema
+        tablename = self.tablename
         fields = ",\n".join([DbfDescriptionPostgresDDL.pg_field_definition(field) for field in self.definition.fields])
         return f"CREATE SCHEMA IF NOT EXISTS {schema};\n\nCREATE TABLE IF NOT EXISTS {schema}.{tablename} (\n{fields}\n);"
 
@@ -70,12 +88,11 @@ class DbfDescriptionPostgresDDL:
                     return "bigint"
                 else:
                     raise ValueError(f"Field {field.name} is too large ({field.size}).")
-        elif field.type == 'D':
-            return "date"
-        elif field.type == 'L':
-            return "boolean"
         elif field.type == 'C':
             return f"character varying({field.size})"
+        elif field.type == 'B' and field.size == 8:
+            return "double precision"
+        return PG_TYPES.get(field.type)
 
     @staticmethod
     def pg_field_definition(field: FieldDefinition) -> str:
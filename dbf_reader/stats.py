@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+import time
+from typing import Any, Callable, Dict, Union
+
+
+class ReaderStats:
+
+    """ Counters of a DbfReader, updated after each block of records, read them from the progress callback or after
+        the iteration
+
+    Args:
+        records (int): records count of the file
+
+    Attributes:
+        records (int): records count of the file
+        actual_record (int): records consumed, the same as DbfReader.actual_record
+        bytes_read (int): bytes of records read from the file object, or taken from the memory map
+        rows (int): records returned
+        deleted (int): records skipped because they are deleted
+        filtered (int): records skipped because they don't match the filters
+        read_seconds (float): time spent in the read calls of the file object, .dbc decompression included
+        decode_seconds (float): time spent decoding the records, only with timings=True
+        cast_seconds (dict[str, float]): time spent in the casts of each field type, part of decode_seconds, only
+                                         with timings=True
+        started (float): time.perf_counter() when the stats were created or reset
+    """
+
+    def __init__(self, records: int) -> None:
+        self.records = records
+        self.reset()
+
+    def reset(self) -> None:
+        self.actual_record = 0
+        self.bytes_read = 0
+        self.rows = 0
+        self.deleted = 0
+        self.filtered = 0
+        self.read_seconds = 0.0
+        self.decode_seconds = 0.0
+        self.cast_seconds = {}
+        self.started = time.perf_counter()
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    @property
+    def fraction(self) -> float:
+        """ Part of the records already consumed, from 0 to 1 """
+        return self.actual_record / self.records if self.records else 1.0
+
+    @property
+    def rows_per_second(self) -> float:
+        elapsed = self.elapsed
+        return self.rows / elapsed if elapsed > 0 else 0.0
+
+    @property
+    def eta(self) -> Union[float, None]:
+        """ Seconds to consume the remaining records at the rate so far, None before the first record """
+        if self.actual_record == 0:
+            return None
+        return self.elapsed / self.actual_record * (self.records - self.actual_record)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            'records': self.records,
+            'actual_record': self.actual_record,
+            'bytes_read': self.bytes_read,
+            'rows': self.rows,
+            'deleted': self.deleted,
+            'filtered': self.filtered,
+            'read_seconds': self.read_seconds,
+            'decode_seconds': self.decode_seconds,
+            'cast_seconds': dict(self.cast_seconds),
+            'elapsed': self.elapsed,
+            'fraction': self.fraction,
+            'rows_per_second': self.rows_per_second,
+            'eta': self.eta,
+        }
+
+
+def timed(function: Callable, add: Callable[[float], None]) -> Callable:
+    """ Function that calls function and gives the seconds spent to add """
+    clock = time.perf_counter
+
+    def call(*args):
+        started = clock()
+        result = function(*args)
+        add(clock() - started)
+        return result
+    return call
@@ -0,0 +1,151 @@
+#!/usr/bin/env python
+import queue
+import threading
+from io import RawIOBase, UnsupportedOperation
+from typing import Any, Union
+
+# bytes lidos da origem em cada chamada de read
+DEFAULT_CHUNK_SIZE = 262144
+
+# bytes lidos da origem antes de serem consumidos, no máximo, 16 chunks de DEFAULT_CHUNK_SIZE
+DEFAULT_READ_AHEAD = 4194304
+
+# intervalo, em segundos, em que a thread de leitura verifica se o stream foi fechado enquanto a fila está cheia
+CLOSE_POLL_SECONDS = 0.1
+
+# fim da origem na fila da thread de leitura
+END_OF_SOURCE = b''
+
+
+class ReadAheadStream(RawIOBase):
+
+    """ Readable, not seekable, buffered stream over any byte source (pipe, socket, HTTP or FTP response, gzip
+        file...), the source is read in chunks of chunk_size up to read_ahead bytes ahead of the consumer, by a
+        background thread, so waiting for the network or the disk overlaps with decoding the records
+
+    Every read returns exactly size bytes, less only at the end of the source, even when the source returns less
+    than it was asked for. Errors of the source are raised by the read call that reaches them.
+
+    Args:
+        source (Any): object with a blocking read(size) method that returns b'' at the end
+        read_ahead (int): bytes read from the source before being consumed, default=DEFAULT_READ_AHEAD
+        chunk_size (int): bytes asked to the source in each read call, default=DEFAULT_CHUNK_SIZE
+        thread (bool): read the source in a background thread, False reads it in the caller thread, only when the
+                       buffer is empty, default=True
+
+    Attributes:
+        name (str): name of the source, or its url (HTTP and FTP responses), when available
+    """
+
+    def __init__(self, source: Any, read_ahead: int = DEFAULT_READ_AHEAD, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                 thread: bool = True) -> None:
+        if read_ahead < 1 or chunk_size < 1:
+            raise ValueError(f"read_ahead and chunk_size should be at least 1, but {read_ahead} and {chunk_size} were received.")
+        self.source = source
+        self.name = getattr(source, 'name', None) or getattr(source, 'url', None)
+        self.chunk_size = min(chunk_size, read_ahead)
+        self._position = 0
+        self._buffer = bytearray()
+        self._eof = False
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._filling = False
+        self._orphaned = False
+        self._chunks = None
+        self._thread = None
+        if thread:
+            self._chunks = queue.Queue(max(1, read_ahead // self.chunk_size))
+            self._filling = True
+            self._thread = threading.Thread(target=self._fill, name='ReadAheadStream', daemon=True)
+            self._thread.start()
+
+    def _fill(self) -> None:
+        # roda na thread de leitura, os erros da origem vão para a fila e são levantados por quem consome
+        try:
+            while not self._stop.is_set():
+                chunk = self.source.read(self.chunk_size)
+                if not self._put(chunk or END_OF_SOURCE) or not chunk:
+                    return
+        except Exception as error:
+            self._put(error)
+        finally:
+            with self._lock:
+                self._filling = False
+                orphaned = self._orphaned
+            if orphaned and hasattr(self.source, 'close'):
+                self.source.close()
+
+    def _put(self, item: Union[bytes, Exception]) -> bool:
+        while not self._stop.is_set():
+            try:
+                self._chunks.put(item, timeout=CLOSE_POLL_SECONDS)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def _next_chunk(self) -> bytes:
+        if self._chunks is None:
+            return self.source.read(self.chunk_size) or END_OF_SOURCE
+        chunk = self._chunks.get()
+        if isinstance(chunk, Exception):
+            self._eof = True
+            raise chunk
+        return chunk
+
+    def read(self, size: int = -1) -> bytes:
+        if self.closed:
+            raise ValueError("I/O operation on closed stream.")
+        buffer = self._buffer
+        while not self._eof and (size is None or size < 0 or len(buffer) < size):
+            chunk = self._next_chunk()
+            if not chunk:
+                self._eof = True
+                break
+            buffer += chunk
+        size = len(buffer) if size is None or size < 0 else min(size, len(buffer))
+        result = bytes(buffer[:size])
+        # o bytearray apaga o início sem copiar o restante
+        del buffer[:size]
+        self._position += size
+        return result
+
+    def readinto(self, target: Any) -> int:
+        data = self.read(len(target))
+        target[:len(data)] = data
+        return len(data)
+
+    def readall(self) -> bytes:
+        return self.read(-1)
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return False
+
+    def seek(self, offset: int, whence: int = 0) -> int:
+        raise UnsupportedOperation("ReadAheadStream is not seekable.")
+
+    def tell(self) -> int:
+        return self._position
+
+    def close(self) -> None:
+        """ Stop the background thread and close the source """
+        if self.closed:
+            return
+        self._stop.set()
+        if self._thread is not None:
+            # libera a thread de leitura se ela estiver esperando espaço na fila
+            while not self._chunks.empty():
+                self._chunks.get_nowait()
+            self._thread.join(CLOSE_POLL_SECONDS * 10)
+        self._buffer = bytearray()
+        with self._lock:
+            # a thread ainda está presa num read da origem, como um pipe sem dados, e fecha a origem quando ele voltar
+            self._orphaned = self._filling
+        try:
+            if not self._orphaned and hasattr(self.source, 'close'):
+                self.source.close()
+        finally:
+            super().close()
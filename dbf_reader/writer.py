@@ -0,0 +1,323 @@
+#!/usr/bin/env python
+import struct
+from datetime import date, datetime
+from io import FileIO
+from typing import Any, Callable, Dict, List, Sequence, Union
+from .decoders import CURRENCY, CURRENCY_SCALE, DOUBLE, INT32, JULIAN_ORDINAL, TIMESTAMP, field_cast, is_memo
+from .definitions import (BACKLINK_SIZE, NULL_FLAGS_TYPE, NULLABLE_FIELD, SYSTEM_FIELD, VISUAL_FOXPRO_FORMATS, FieldDefinition,
+                          TableDefinition)
+from .filters import Filter, compile_filters
+from .reader import DbfReader, DEFAULT_BUFFER_RECORDS
+
+# versões que indicam um arquivo de memo, o arquivo escrito nunca tem campos de memo
+MEMO_FORMATS = {0x83: 0x03, 0x8B: 0x03, 0xF5: 0x03}
+
+# nome, tipo, posição no registro, tamanho, decimais e flags
+FIELD_DESCRIPTOR = struct.Struct('<11scLBBB13x')
+
+# flags do _NullFlags escrito, campo de sistema e binário
+NULL_FLAGS_FLAGS = SYSTEM_FIELD | 0x04
+
+
+def number_bytes(field: FieldDefinition, value: Union[int, float], encoding: str) -> bytes:
+    decimals = field.decimals if field.type == 'N' or field.decimals else None
+    if decimals == 0 and isinstance(value, int):
+        # o formato f passa o int por um float, que perde os valores acima de 2 ** 53
+        return str(value).encode('ascii')
+    text = f"{value:.{decimals}f}" if decimals is not None else repr(float(value))
+    return text.encode('ascii')
+
+
+def date_bytes(field: FieldDefinition, value: Union[date, str], encoding: str) -> bytes:
+    return (f"{value.year:04}{value.month:02}{value.day:02}" if isinstance(value, date) else value).encode('ascii')
+
+
+def timestamp_bytes(field: FieldDefinition, value: datetime, encoding: str) -> bytes:
+    milliseconds = ((value.hour * 60 + value.minute) * 60 + value.second) * 1000 + value.microsecond // 1000
+    return TIMESTAMP.pack(value.toordinal() + JULIAN_ORDINAL, milliseconds)
+
+
+# função que transforma o valor python nos bytes do campo, antes do alinhamento no tamanho do campo
+VALUE_ENCODERS = {
+    'C': lambda field, value, encoding: value.encode(encoding),
+    'N': number_bytes,
+    'F': number_bytes,
+    'D': date_bytes,
+    'L': lambda field, value, encoding: b'T' if value else b'F',
+    'I': lambda field, value, encoding: INT32.pack(value),
+    '+': lambda field, value, encoding: INT32.pack(value),
+    'O': lambda field, value, encoding: DOUBLE.pack(value),
+    'B': lambda field, value, encoding: DOUBLE.pack(value),
+    '@': timestamp_bytes,
+    'T': timestamp_bytes,
+    'Y': lambda field, value, encoding: CURRENCY.pack(round(value * CURRENCY_SCALE)),
+}
+
+# valor vazio de cada tipo, os binários não têm valor vazio além do zero
+EMPTY_VALUES = {'I': b'\x00' * 4, '+': b'\x00' * 4, 'O': b'\x00' * 8, 'B': b'\x00' * 8, '@': b'\x00' * 8, 'T': b'\x00' * 8,
+                'Y': b'\x00' * 8}
+
+
+def value_bytes(field: FieldDefinition, value: Any, encoding: str) -> bytes:
+    """ Bytes of a python value in the field, blanks (or zeros for binary fields) for None
+
+    Args:
+        field (FieldDefinition): field definition
+        value (Any): str for C, number for N, F, I, +, O, date or 'YYYYMMDD' for D, bool for L and datetime for @
+        encoding (str): encoding of the character fields
+
+    Returns:
+        bytes: exactly field.size bytes, C values are left aligned and numbers right aligned
+    """
+    if value is None:
+        return EMPTY_VALUES.get(field.type, b' ' * field.size)
+    raw = VALUE_ENCODERS[field.type](field, value, encoding)
+    if len(raw) > field.size:
+        raise ValueError(f"Value {value!r} doesn't fit in field {field}.")
+    return raw.rjust(field.size) if field.type in ['N', 'F'] else raw.ljust(field.size, b' ')
+
+
+class DbfWriter:
+
+    """ DBF writer with the fields of a table definition, or a projection of them, the records are written in
+        blocks of buffer_records and the records count of the header is written on close
+
+    Args:
+        file_object (Union[str, FileIO]): path or seekable file object opened in binary writable mode
+        definition (TableDefinition): definition of the source table
+        columns (list[str]): names of the fields written, in this order, default=None, all fields
+        encoding (str): encoding of the character fields, default=None, the encoding of the definition
+        buffer_records (int): records kept in memory before each write call, default=DEFAULT_BUFFER_RECORDS
+
+    Visual FoxPro tables are written with the 263 bytes after the header terminator and, when some written fields
+    accept nulls, with a _NullFlags field after the fields.
+
+    Attributes:
+        fields (list[FieldDefinition]): fields of the source table that are written
+        null_indexes (list[int]): positions in fields of the fields that accept nulls, in the order of their bits
+        record_size (int): size of each written record
+        headerlen (int): size of the written header
+        records (int): records written so far
+    """
+
+    def __init__(self, file_object: Union[str, FileIO], definition: TableDefinition, columns: List[str] = None,
+                 encoding: str = None, buffer_records: int = DEFAULT_BUFFER_RECORDS) -> None:
+        if buffer_records < 1:
+            raise ValueError(f"buffer_records should be at least 1, but {buffer_records} was received.")
+        self.definition = definition
+        self.fields = definition.select(columns)
+        memo = [field.name for field in self.fields if is_memo(field)]
+        if memo:
+            raise ValueError(f"Memo fields {memo} can't be written, leave them out of the columns.")
+        _file_object = open(file_object, 'wb') if isinstance(file_object, str) else file_object
+        if hasattr(_file_object, 'mode') and 'b' not in _file_object.mode:
+            raise IOError("File object need to be in binary writable mode ('wb')")
+        if not _file_object.seekable():
+            raise IOError("File object need to be seekable, the records count is written on close.")
+        self.file_object = _file_object
+        self.encoding = definition.encoding if encoding is None else encoding
+        self.buffer_records = buffer_records
+        self.version = MEMO_FORMATS.get(definition.dbf_format & 0xFF, definition.dbf_format & 0xFF)
+        self.null_indexes = [index for index, field in enumerate(self.fields) if field.null_position is not None]
+        self.null_size = (len(self.null_indexes) + 7) // 8
+        self.record_size = 1 + sum([field.size for field in self.fields]) + self.null_size
+        self.headerlen = (32 + 32 * (len(self.fields) + (1 if self.null_size else 0)) + 1 +
+                          (BACKLINK_SIZE if self.version in VISUAL_FOXPRO_FORMATS else 0))
+        self.records = 0
+        self.buffer = []
+        self.project = self.compile_projection()
+        self.write_header()
+
+    def compile_projection(self) -> Callable[[bytes, int], bytes]:
+        # fatias dos campos escritos no registro de origem, fatias vizinhas viram uma só, sem projeção o registro
+        # inteiro é copiado de uma vez
+        slices = []
+        for field in self.fields:
+            if slices and slices[-1][1] == field.offset:
+                slices[-1][1] += field.size
+            else:
+                slices.append([field.offset, field.offset + field.size])
+        if len(slices) == 1:
+            start, end = slices[0]
+
+            def project(buffer: bytes, offset: int) -> bytes:
+                return b' ' + buffer[offset + start:offset + end]
+        else:
+            def project(buffer: bytes, offset: int) -> bytes:
+                return b' ' + b''.join([buffer[offset + start:offset + end] for start, end in slices])
+        if not self.null_indexes:
+            return project
+        source = self.definition.null_flags
+        if [self.fields[index].null_bit for index in self.null_indexes] == list(range(len(self.null_indexes))) and self.null_size == source.size:
+            # os campos que aceitam nulo são os mesmos da origem, na mesma ordem, então o _NullFlags é copiado como está
+            start_null, end_null = source.offset, source.offset + source.size
+            return lambda buffer, offset: project(buffer, offset) + buffer[offset + start_null:offset + end_null]
+        positions = [self.fields[index].null_position for index in self.null_indexes]
+        size = self.null_size
+
+        def project_nulls(buffer: bytes, offset: int) -> bytes:
+            flags = 0
+            for bit, (position, mask) in enumerate(positions):
+                if buffer[offset + position] & mask:
+                    flags |= 1 << bit
+            return project(buffer, offset) + flags.to_bytes(size, 'little')
+        return project_nulls
+
+    def write_header(self) -> None:
+        today = date.today()
+        header = struct.pack('<BBBBLHH20x', self.version, today.year - 1900, today.month, today.day, 0, self.headerlen, self.record_size)
+        offset = 1
+        for index, field in enumerate(self.fields):
+            # só os campos com um bit no _NullFlags escrito continuam aceitando nulo
+            flags = field.flags if index in self.null_indexes else field.flags & ~NULLABLE_FIELD
+            header += FIELD_DESCRIPTOR.pack(field.name.encode(self.encoding), field.type.encode('ascii'), offset, field.size, field.decimals, flags)
+            offset += field.size
+        if self.null_size:
+            header += FIELD_DESCRIPTOR.pack(b'_NullFlags', NULL_FLAGS_TYPE.encode('ascii'), offset, self.null_size, 0, NULL_FLAGS_FLAGS)
+        header += b'\r'
+        if self.version in VISUAL_FOXPRO_FORMATS:
+            header += b'\x00' * BACKLINK_SIZE
+        self.file_object.write(header)
+
+    def write_record(self, buffer: bytes, offset: int = 0) -> None:
+        """ Write the fields of the raw record of the source table starting at offset, without decoding them, the
+            record is written as not deleted
+        """
+        self.buffer.append(self.project(buffer, offset))
+        self.records += 1
+        if len(self.buffer) >= self.buffer_records:
+            self.flush()
+
+    def write_row(self, row: Union[Dict[str, Any], Sequence[Any]]) -> None:
+        """ Write a record from python values, see value_bytes
+
+        Args:
+            row (Union[dict[str, Any], Sequence[Any]]): values by field name, missing names are empty, or the values
+                                                        in the order of the fields
+        """
+        if isinstance(row, dict):
+            values = [row.get(field.name) for field in self.fields]
+        else:
+            values = list(row)
+            if len(values) != len(self.fields):
+                raise ValueError(f"The row has {len(values)} values, but there are {len(self.fields)} fields.")
+        record = b' ' + b''.join([value_bytes(field, value, self.encoding) for field, value in zip(self.fields, values)])
+        if self.null_indexes:
+            flags = sum([1 << bit for bit, index in enumerate(self.null_indexes) if values[index] is None])
+            record += flags.to_bytes(self.null_size, 'little')
+        self.buffer.append(record)
+        self.records += 1
+        if len(self.buffer) >= self.buffer_records:
+            self.flush()
+
+    def flush(self) -> None:
+        if self.buffer:
+            self.file_object.write(b''.join(self.buffer))
+            self.buffer = []
+
+    @property
+    def closed(self) -> bool:
+        return self.file_object is None
+
+    def close(self) -> None:
+        """ Write the pending records, the end of file mark and the records count """
+        if self.file_object is None:
+            return
+        self.flush()
+        self.file_object.write(b'\x1a')
+        self.file_object.seek(4)
+        self.file_object.write(struct.pack('<L', self.records))
+        self.file_object.close()
+        self.file_object = None
+
+    def __enter__(self) -> 'DbfWriter':
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+
+def open_source(source: Union[str, DbfReader], encoding: str) -> DbfReader:
+    return DbfReader(source, encoding=encoding) if isinstance(source, str) else source
+
+
+def transform(source: Union[str, DbfReader], destination: Union[str, FileIO], columns: List[str] = None,
+              filters: List[Filter] = None, encoding: str = 'iso-8859-1', buffer_records: int = DEFAULT_BUFFER_RECORDS) -> int:
+    """ Copy the non deleted records that match the filters to a new DBF, only with the columns, in one pass and
+        without decoding the records
+
+    Args:
+        source (Union[str, DbfReader]): DBF or DBC path, or a reader, read from its actual record
+        destination (Union[str, FileIO]): path or file object of the new DBF
+        columns (list[str]): names of the fields written, default=None, all fields
+        filters (list[tuple[str, str, Any]]): see DbfReader, default=None
+        encoding (str): encoding of the character fields, default='iso-8859-1'
+        buffer_records (int): records of each read and write call, default=DEFAULT_BUFFER_RECORDS
+
+    Returns:
+        int: records written
+    """
+    reader = open_source(source, encoding)
+    try:
+        with DbfWriter(destination, reader.definition, columns, buffer_records=buffer_records) as writer:
+            record_size = reader.definition.record_size
+            accept = compile_filters(reader.definition, filters)
+            for buffer, start, end in reader.iter_blocks(block_records=buffer_records):
+                for offset in range(start, end, record_size):
+                    reader.actual_record += 1
+                    if buffer[offset] == 0x20 and (accept is None or accept(buffer, offset)):
+                        writer.write_record(buffer, offset)
+            return writer.records
+    finally:
+        if reader is not source:
+            reader.close()
+
+
+def split(source: Union[str, DbfReader], by: str, destination: Union[str, Callable[[Any], str]], columns: List[str] = None,
+          filters: List[Filter] = None, encoding: str = 'iso-8859-1', buffer_records: int = DEFAULT_BUFFER_RECORDS) -> Dict[Any, int]:
+    """ Split the non deleted records that match the filters into one DBF for each value of a field, in one pass,
+        only the field used to split is decoded, see transform
+
+    Args:
+        source (Union[str, DbfReader]): DBF or DBC path, or a reader, read from its actual record
+        by (str): name of the field whose values choose the file of each record
+        destination (Union[str, Callable[[Any], str]]): path with a {} replaced by the value, or a function that
+                                                        returns the path of each value
+        columns (list[str]): names of the fields written, default=None, all fields
+        filters (list[tuple[str, str, Any]]): see DbfReader, default=None
+        encoding (str): encoding of the character fields, default='iso-8859-1'
+        buffer_records (int): records of each read call and of each write call of each file, default=DEFAULT_BUFFER_RECORDS
+
+    Returns:
+        dict[Any, int]: records written for each value
+    """
+    reader = open_source(source, encoding)
+    path = destination.format if isinstance(destination, str) else destination
+    values = {}
+    writers = {}
+    try:
+        field = reader.definition.select([by])[0]
+        cast = field_cast(field, reader.encoding, {})
+        start_by, end_by = field.offset, field.offset + field.size
+        record_size = reader.definition.record_size
+        accept = compile_filters(reader.definition, filters)
+        for buffer, start, end in reader.iter_blocks(block_records=buffer_records):
+            for offset in range(start, end, record_size):
+                reader.actual_record += 1
+                if buffer[offset] != 0x20 or (accept is not None and not accept(buffer, offset)):
+                    continue
+                # os bytes do campo só são decodificados na primeira vez que aparecem, bytes diferentes com o mesmo
+                # valor, como ' 1' e '1 ', vão para o mesmo arquivo
+                raw = buffer[offset + start_by:offset + end_by]
+                if raw not in values:
+                    values[raw] = cast(raw)
+                value = values[raw]
+                if value not in writers:
+                    writers[value] = DbfWriter(path(value), reader.definition, columns, buffer_records=buffer_records)
+                writers[value].write_record(buffer, offset)
+    finally:
+        for writer in writers.values():
+            writer.close()
+        if reader is not source:
+            reader.close()
+    return {value: writer.records for value, writer in writers.items()}
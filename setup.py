@@ -31,6 +31,13 @@ setup(
             "datasus",
         ],
         "python_requires": ">=3.8",
+        "extras_require": {
+            "numpy": ["numpy"],
+            "arrow": ["numpy", "pyarrow"],
+        },
+        "entry_points": {
+            "console_scripts": ["dbf_reader=dbf_reader.cli:main"],
+        },
         "classifiers": [
             "Programming Language :: Python :: 3",
             "License :: OSI Approved :: MIT License",
@@ -1,7 +1,45 @@
+import asyncio
 import os
+import csv
+import gzip
+import threading
+import json
+import shutil
+import pickle
+import tempfile
 import unittest
 import datetime
+import itertools
+from contextlib import redirect_stderr, redirect_stdout
+from io import BytesIO, StringIO
+from concurrent.futures import ThreadPoolExecutor
 from dbf_reader.reader import DbfReader
+from dbf_reader.aio import AsyncDbfReader
+from dbf_reader.decoders import cached_cast, date_cast, number_cast, parse_date
+from dbf_reader.dbc import DbcStream, PKWareExploder
+from dbf_reader.parallel import ParallelDbfReader
+from dbf_reader.dataset import DbfDataset
+from dbf_reader.cache import DefinitionCache
+from dbf_reader.index import DbfIndex, build_index, sortable_integer, sortable_number
+from dbf_reader.memo import MemoFile
+from dbf_reader.writer import DbfWriter, split, transform
+from dbf_reader.cli import csv_value, main
+from dbf_reader.aggregate import DistinctSketch, profile
+from dbf_reader.stream import ReadAheadStream
+from dbf_reader.definitions import TableDefinition
+from dbf_reader.postgres import PostgresCopyStream, copy_sql, copy_value, load, write_copy
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+    from dbf_reader.arrow import arrow_schema, iter_record_batches, to_parquet
+except ImportError:
+    pyarrow = None
 from dbf_reader.renderers import DbfDescriptionText, DbfDescriptionMarkdown, DbfDescriptionPostgresDDL
 
 
@@ -89,6 +127,196 @@ class TestDbfReader(unittest.TestCase):
                 readed_rows += 1
             self.assertEqual(dbf_reader.actual_record, dbf_reader.records)
 
+    def test_iterate_buffered_same_rows(self):
+        for filename in ['another_dbase3', 'dbase3', 'dbase4', 'dbase5', 'dbase3_empty_number', 'dbase3_empty_boolean']:
+            with open(f"tests/data/{filename}.dbf", 'rb') as f:
+                expected = [row for row in DbfReader(f, buffer_records=1)]
+            for buffer_records in [2, 3, 1024]:
+                with open(f"tests/data/{filename}.dbf", 'rb') as f:
+                    dbf_reader = DbfReader(f, buffer_records=buffer_records)
+                    self.assertEqual(expected, [row for row in dbf_reader])
+                    self.assertEqual(dbf_reader.actual_record, dbf_reader.records)
+
+    def test_resume_partial_iteration(self):
+        with DbfReader("tests/data/another_dbase3.dbf") as dbf_reader:
+            expected = [row for row in dbf_reader]
+        for path, options in [("tests/data/another_dbase3.dbf", {}), ("tests/data/another_dbase3.dbf", {'buffer_records': 5}),
+                              ("tests/data/another_dbase3.dbf", {'memory_map': True}), ("tests/data/another_dbase3.dbc", {})]:
+            with DbfReader(path, **options) as dbf_reader:
+                first = list(itertools.islice(dbf_reader, 3))
+                for row in dbf_reader:
+                    first.append(row)
+                    break
+                self.assertEqual(first + list(dbf_reader), expected)
+                self.assertEqual(dbf_reader.stats.rows, 13)
+
+    def test_compile_row_decoder(self):
+        with open("tests/data/dbase5.dbf", 'rb') as f:
+            dbf_reader = DbfReader(f)
+            decoder = dbf_reader.definition.compile()
+            self.assertIs(decoder, dbf_reader.definition.compile())
+            self.assertEqual(decoder.struct.size, dbf_reader.definition.record_size)
+            record = dbf_reader.read(dbf_reader.definition.record_size)
+            self.assertEqual(
+                decoder.decode(record),
+                {'N_ID': 1.0, 'C_CHAR10': 'char', 'N_INT': 1.0, 'N_DECIMAL': 2.3456, 'L_BOOL': True, 'D_DATE': datetime.date(2001, 1, 1)}
+            )
+            self.assertEqual(decoder.values(record), tuple(decoder.decode(record).values()))
+
+    def test_columns(self):
+        with open("tests/data/dbase5.dbf", 'rb') as f:
+            rows = [row for row in DbfReader(f, columns=['D_DATE', 'N_DECIMAL'])]
+            self.assertEqual(rows, [
+                {'D_DATE': datetime.date(2001, 1, 1), 'N_DECIMAL': 2.3456},
+                {'D_DATE': datetime.date(2022, 12, 30), 'N_DECIMAL': 4.5678},
+            ])
+            self.assertEqual(list(rows[0]), ['D_DATE', 'N_DECIMAL'])
+
+    def test_columns_on_iteration(self):
+        with open("tests/data/another_dbase3.dbf", 'rb') as f:
+            dbf_reader = DbfReader(f)
+            rows = [row for row in dbf_reader.iter_rows(columns=['Type', 'GPS_Week'])]
+            self.assertEqual(len(rows), 13)
+            self.assertEqual(rows[0], {'Type': 'CMP', 'GPS_Week': 1331})
+
+    def test_unknown_columns(self):
+        with open("tests/data/dbase3.dbf", 'rb') as f:
+            with self.assertRaisesRegex(ValueError, "Unknown columns.*"):
+                DbfReader(f, columns=['N_ID', 'UNKNOWN'])
+
+    def test_repeated_columns(self):
+        for columns in [['Type', 'Type'], ['Point_ID', 'Type', 'Point_ID']]:
+            with self.assertRaisesRegex(ValueError, "Repeated columns.*"):
+                DbfReader("tests/data/another_dbase3.dbf", row_type='tuple', columns=columns)
+        with DbfReader("tests/data/another_dbase3.dbf") as dbf_reader:
+            with self.assertRaisesRegex(ValueError, "Repeated columns \\['Type'\\].*"):
+                list(dbf_reader.iter_rows(columns=['Type', 'Shape', 'Type']))
+
+    def test_filters(self):
+        def filtered(filename, filters, column):
+            with open(f"tests/data/{filename}.dbf", 'rb') as f:
+                return [row[column] for row in DbfReader(f, columns=[column], filters=filters)]
+
+        self.assertEqual(filtered('another_dbase3', [('Max_HDOP', '>', 2)], 'Point_ID'), [403, 410])
+        self.assertEqual(filtered('another_dbase3', [('Max_HDOP', 'between', (1.6, 1.7)), ('Type', '==', 'CMP')], 'Point_ID'), [424, 425, 429, 431, 432, 436])
+        self.assertEqual(filtered('another_dbase3', [('Point_ID', 'in', {401, 436, 999})], 'Point_ID'), [401, 436])
+        self.assertEqual(filtered('another_dbase3', [('Type', '!=', 'CMP')], 'Point_ID'), [])
+        self.assertEqual(filtered('another_dbase3', [('Shape', 'startswith', ('rect', 'circ'))], 'Point_ID')[:2], [401, 403])
+        self.assertEqual(filtered('dbase5', [('C_CHAR10', '==', 'char')], 'N_ID'), [1.0])
+        self.assertEqual(filtered('dbase5', [('C_CHAR10', 'startswith', 'char')], 'N_ID'), [1.0, 2.0])
+        self.assertEqual(filtered('dbase5', [('C_CHAR10', 'not in', ['char'])], 'N_ID'), [2.0])
+        self.assertEqual(filtered('dbase5', [('D_DATE', '>', datetime.date(2001, 1, 1))], 'N_ID'), [2.0])
+        self.assertEqual(filtered('dbase5', [('D_DATE', 'between', ('20000101', '20011231'))], 'N_ID'), [1.0])
+        self.assertEqual(filtered('dbase5', [('L_BOOL', '==', False)], 'N_ID'), [2.0])
+
+    def test_filters_empty_values(self):
+        with open("tests/data/dbase3_empty_number.dbf", 'rb') as f:
+            self.assertEqual([row['N_ID'] for row in DbfReader(f, filters=[('N_DECIMAL', '<', 1)])], [2000000])
+        with open("tests/data/dbase3_empty_number.dbf", 'rb') as f:
+            self.assertEqual([row['N_ID'] for row in DbfReader(f).iter_rows(filters=[('N_DECIMAL', '!=', 0)])], [1])
+
+    def test_invalid_filters(self):
+        with self.assertRaisesRegex(ValueError, "Operator 'like' not supported.*"):
+            DbfReader("tests/data/dbase3.dbf", filters=[('C_CHAR10', 'like', 'char')])
+        with self.assertRaisesRegex(ValueError, "Operator 'startswith' is only supported on C fields.*"):
+            DbfReader("tests/data/dbase3.dbf", filters=[('N_ID', 'startswith', '1')])
+        with self.assertRaisesRegex(ValueError, "Unknown columns.*"):
+            DbfReader("tests/data/dbase3.dbf", filters=[('UNKNOWN', '==', '1')])
+        # os valores são validados antes de ler os registros, e não no meio da iteração ou sem nunca atender
+        invalid = [
+            (('Max_PDOP', '>', '5'), "The filter value '5' of field .*Max_PDOP.* should be a number."),
+            (('Type', '==', 5), "The filter value 5 of field .*Type.* should be a str."),
+            (('Point_ID', 'in', [401, '436']), "The filter value '436' .* should be a number."),
+            (('Max_HDOP', '==', True), "The filter value True .* should be a number."),
+            (('Date_Visit', '>', '2005-07-12'), "The filter value '2005-07-12' .* should be a date or a 'YYYYMMDD' str."),
+            (('Type', 'in', 'CMP'), "The value of 'in' should be a list of values.*"),
+            (('Max_HDOP', 'between', (1, 2, 3)), "The value of 'between' should be a \\(low, high\\) pair.*"),
+            (('Shape', 'startswith', 5), "The filter value 5 .* should be a str."),
+        ]
+        for item, message in invalid:
+            with self.assertRaisesRegex(ValueError, message):
+                DbfReader("tests/data/another_dbase3.dbf", filters=[item])
+
+    def test_memory_map(self):
+        for filename in ['another_dbase3', 'dbase3', 'dbase5', 'dbase3_empty_number']:
+            with DbfReader(f"tests/data/{filename}.dbf") as dbf_reader:
+                expected = [row for row in dbf_reader]
+            for buffer_records in [1, 1024]:
+                with DbfReader(f"tests/data/{filename}.dbf", buffer_records=buffer_records, memory_map=True) as dbf_reader:
+                    self.assertEqual([row for row in dbf_reader], expected)
+                    self.assertEqual(dbf_reader.actual_record, dbf_reader.records)
+                self.assertIsNone(dbf_reader.memory_map)
+
+    def test_memory_map_not_available(self):
+        with open("tests/data/dbase3.dbf", 'rb') as f:
+            with self.assertRaisesRegex(ValueError, "memory_map is only available for files on disk."):
+                DbfReader(BytesIO(f.read()), memory_map=True)
+        with self.assertRaisesRegex(ValueError, "memory_map is not available for compressed.*"):
+            DbfReader("tests/data/dbase3.dbc", memory_map=True)
+
+    def test_random_access(self):
+        with DbfReader("tests/data/another_dbase3.dbf") as dbf_reader:
+            expected = [row for row in dbf_reader]
+        for memory_map in [False, True]:
+            with DbfReader("tests/data/another_dbase3.dbf", memory_map=memory_map) as dbf_reader:
+                self.assertEqual(dbf_reader[0], expected[0])
+                self.assertEqual(dbf_reader.actual_record, 1)
+                self.assertEqual(dbf_reader[-1], expected[-1])
+                self.assertEqual(dbf_reader[13], expected[-1])
+                self.assertEqual(dbf_reader.actual_record, 14)
+                # o registro 1 está apagado
+                self.assertIsNone(dbf_reader[1])
+                self.assertEqual([row for row in dbf_reader.read_records(1, 5)], expected[1:4])
+                self.assertEqual(dbf_reader.actual_record, 5)
+                self.assertEqual([row for row in dbf_reader.read_records(10)], expected[9:])
+                dbf_reader.seek_record(0)
+                dbf_reader.skip(12)
+                self.assertEqual([row for row in dbf_reader], expected[11:])
+                dbf_reader.seek_record(14)
+                self.assertEqual([row for row in dbf_reader], [])
+
+    def test_random_access_deleted_and_filtered(self):
+        with DbfReader("tests/data/another_dbase3.dbf", columns=['Point_ID'], filters=[('Max_HDOP', '>', 2)]) as dbf_reader:
+            deleted = [number for number in range(dbf_reader.records) if dbf_reader[number] is None]
+            self.assertEqual(len(deleted), 12)
+            self.assertEqual(dbf_reader[2], {'Point_ID': 403})
+
+    def test_random_access_errors(self):
+        with DbfReader("tests/data/dbase3.dbf") as dbf_reader:
+            with self.assertRaises(IndexError):
+                dbf_reader[2]
+            with self.assertRaises(IndexError):
+                dbf_reader[-3]
+            with self.assertRaises(TypeError):
+                dbf_reader['N_ID']
+            with self.assertRaises(IndexError):
+                dbf_reader.seek_record(3)
+            with self.assertRaises(ValueError):
+                dbf_reader.skip(-1)
+        with DbfReader("tests/data/another_dbase3.dbc") as dbf_reader:
+            with self.assertRaises(IOError):
+                dbf_reader[0]
+            dbf_reader.skip(12)
+            self.assertEqual(dbf_reader.actual_record, 12)
+            self.assertEqual(len([row for row in dbf_reader]), 2)
+
+    def test_reuse_table_definition(self):
+        with DbfReader("tests/data/another_dbase3.dbf") as dbf_reader:
+            definition = dbf_reader.definition
+            expected = [row for row in dbf_reader]
+        definition = pickle.loads(pickle.dumps(definition))
+        self.assertIsNone(definition.reader)
+        with DbfReader("tests/data/another_dbase3.dbf", table_definition=definition) as dbf_reader:
+            self.assertEqual(dbf_reader.records, 14)
+            self.assertEqual(dbf_reader.last_update, datetime.date(1905, 7, 13))
+            self.assertEqual(dbf_reader.tell(), definition.headerlen)
+            self.assertEqual([row for row in dbf_reader], expected)
+
+    def test_invalid_buffer_records(self):
+        with open("tests/data/dbase3.dbf", 'rb') as f:
+            with self.assertRaises(ValueError):
+                DbfReader(f, buffer_records=0)
+
     def test_render_txt(self):
         for filename in ['another_dbase3', 'dbase3', 'dbase4', 'dbase5']:
             with open(f"tests/data/{filename}.dbf", 'rb') as f:
@@ -133,6 +361,227 @@ class TestDbfReader(unittest.TestCase):
             with self.assertRaises(ValueError):
                 DbfDescriptionPostgresDDL(DbfReader(f).definition).__str__()
 
+    def test_byte_casts(self):
+        with DbfReader("tests/data/dbase3_empty_number.dbf") as dbf_reader:
+            fields = {field.name: field for field in dbf_reader.definition.fields}
+        integer = number_cast(fields['N_ID'], 'iso-8859-1')
+        self.assertEqual(integer(b'   2000000'), 2000000)
+        self.assertEqual(integer(b'-12'), -12)
+        self.assertEqual(integer(b'  12\x00\x00'), 12)
+        self.assertIsNone(integer(b'          '))
+        self.assertIsNone(integer(b'\x00\x00\x00'))
+        with self.assertRaises(ValueError):
+            integer(b'1.5')
+        decimal = number_cast(fields['N_DECIMAL'], 'iso-8859-1')
+        self.assertEqual(decimal(b'  4.5678'), 4.5678)
+        self.assertIsNone(decimal(b'        '))
+        cast = date_cast(fields['D_DATE'], 'iso-8859-1')
+        self.assertEqual(cast(b'20221230'), datetime.date(2022, 12, 30))
+        self.assertIs(cast(b'20221230'), cast(b'20221230'))
+        self.assertIsNone(cast(b'        '))
+        self.assertIsNone(cast(b'00000000'))
+        self.assertIsNone(cast(b'\x00' * 8))
+        with self.assertRaises(ValueError):
+            parse_date(b'20221330')
+
+    def test_string_cache(self):
+        with DbfReader("tests/data/another_dbase3.dbf") as dbf_reader:
+            expected = [row for row in dbf_reader]
+        with DbfReader("tests/data/another_dbase3.dbf", string_cache=16) as dbf_reader:
+            rows = [row for row in dbf_reader]
+            casts = dict(zip(dbf_reader.definition.compile(None, dbf_reader.string_cache).names,
+                             dbf_reader.definition.compile(None, dbf_reader.string_cache).casts))
+        self.assertEqual(rows, expected)
+        self.assertTrue(all([row['Type'] is rows[0]['Type'] for row in rows]))
+        self.assertEqual(list(casts['Type'].cache.values()), ['CMP'])
+        self.assertFalse(hasattr(casts['Max_PDOP'], 'cache'))
+        # cheio, o dict é esvaziado antes do próximo valor
+        cast = cached_cast(lambda value: value.decode('ascii'), 2)
+        self.assertEqual([cast(value) for value in [b'a', b'b', b'a', b'c']], ['a', 'b', 'a', 'c'])
+        self.assertEqual(cast.cache, {b'c': 'c'})
+
+    def test_string_cache_fields(self):
+        with DbfReader("tests/data/another_dbase3.dbf", columns=['Type', 'Shape'], string_cache={'Type': 1}) as dbf_reader:
+            self.assertEqual(dbf_reader.string_cache, {'Type': 1})
+            rows = [row for row in dbf_reader]
+            casts = dbf_reader.definition.compile(dbf_reader.definition.select(['Type', 'Shape']), dbf_reader.string_cache).casts
+        self.assertEqual(len(rows), 13)
+        self.assertEqual(len(casts[0].cache), 1)
+        self.assertFalse(hasattr(casts[1], 'cache'))
+
+    def test_invalid_string_cache(self):
+        for string_cache in [{'Max_PDOP': 10}, {'Unknown': 10}, {'Type': 0}, 0]:
+            with self.assertRaises(ValueError):
+                DbfReader("tests/data/another_dbase3.dbf", string_cache=string_cache).close()
+
+    def test_row_types(self):
+        with DbfReader("tests/data/dbase5.dbf") as dbf_reader:
+            expected = [row for row in dbf_reader]
+        values = [tuple(row.values()) for row in expected]
+        with DbfReader("tests/data/dbase5.dbf", row_type='tuple') as dbf_reader:
+            self.assertEqual([row for row in dbf_reader], values)
+        for row_type in ['namedtuple', 'slots']:
+            with DbfReader("tests/data/dbase5.dbf", row_type=row_type) as dbf_reader:
+                rows = [row for row in dbf_reader]
+                self.assertEqual(dbf_reader[1], rows[1])
+            self.assertEqual([tuple(row) for row in rows], values)
+            self.assertEqual([row._asdict() for row in rows], expected)
+            self.assertEqual(rows[1].C_CHAR10, 'character')
+            self.assertEqual(rows[0].D_DATE, datetime.date(2001, 1, 1))
+            self.assertEqual(rows[0]._fields, ('N_ID', 'C_CHAR10', 'N_INT', 'N_DECIMAL', 'L_BOOL', 'D_DATE'))
+            self.assertIs(type(rows[0]), type(rows[1]))
+        self.assertFalse(hasattr(rows[0], '__dict__'))
+        self.assertEqual(repr(rows[1]), "Row(N_ID=2.0, C_CHAR10='character', N_INT=3.0, N_DECIMAL=4.5678, L_BOOL=False, D_DATE=datetime.date(2022, 12, 30))")
+
+    def test_row_types_names(self):
+        for row_type in ['namedtuple', 'slots']:
+            with DbfReader("tests/data/another_dbase3.dbf", row_type=row_type) as dbf_reader:
+                row = next(dbf_reader.iter_rows(columns=['Shape', 'Type'], filters=[('Max_HDOP', '<', 2)]))
+            self.assertEqual(tuple(row), ('circular', 'CMP'))
+            self.assertEqual(row.Shape, 'circular')
+        with DbfReader("tests/data/another_dbase3.dbf", row_type='slots') as dbf_reader:
+            row = next(iter(dbf_reader))
+            self.assertEqual((row.Point_ID, row._30), ('0507121', 401))
+            self.assertEqual(dbf_reader.definition.compile().row_classes['slots']._fields[-1], '_30')
+            dbf_reader.seek_record(0)
+            self.assertEqual(next(dbf_reader.iter_rows(columns=['Type'], row_type='dict')), {'Type': 'CMP'})
+
+    def test_invalid_row_type(self):
+        with self.assertRaises(ValueError):
+            DbfReader("tests/data/dbase5.dbf", row_type='list').close()
+        with DbfReader("tests/data/dbase5.dbf") as dbf_reader:
+            with self.assertRaises(ValueError):
+                next(dbf_reader.iter_rows(row_type='list'))
+
+    def test_stats(self):
+        with DbfReader("tests/data/another_dbase3.dbf", buffer_records=5) as dbf_reader:
+            self.assertEqual(len(list(dbf_reader)), 13)
+            stats = dbf_reader.stats
+            self.assertEqual((stats.actual_record, stats.rows, stats.deleted, stats.filtered), (14, 13, 1, 0))
+            self.assertEqual(stats.bytes_read, 14 * dbf_reader.definition.record_size)
+            self.assertEqual((stats.fraction, stats.eta), (1.0, 0.0))
+            self.assertEqual(stats.cast_seconds, {})
+        with DbfReader("tests/data/another_dbase3.dbf", filters=[('Max_HDOP', '>', 2)], memory_map=True) as dbf_reader:
+            self.assertEqual(len(list(dbf_reader)), 2)
+            self.assertEqual((dbf_reader.stats.rows, dbf_reader.stats.deleted, dbf_reader.stats.filtered), (2, 1, 11))
+            self.assertEqual(dbf_reader.stats.as_dict()['bytes_read'], 14 * dbf_reader.definition.record_size)
+
+    def test_stats_progress(self):
+        calls = []
+        progress = lambda stats: calls.append((stats.actual_record, stats.rows))  # noqa: E731
+        with DbfReader("tests/data/another_dbase3.dbf", buffer_records=5, progress=progress, progress_interval=5) as dbf_reader:
+            list(dbf_reader)
+        self.assertEqual(calls, [(5, 4), (10, 9), (14, 13)])
+        calls.clear()
+        with DbfReader("tests/data/another_dbase3.dbf", buffer_records=4, progress=progress, progress_interval=10) as dbf_reader:
+            list(dbf_reader)
+        self.assertEqual(calls, [(12, 11), (14, 13)])
+        with self.assertRaisesRegex(ValueError, "progress_interval should be at least 1.*"):
+            DbfReader("tests/data/dbase3.dbf", progress_interval=0)
+
+    def test_stats_timings(self):
+        with DbfReader("tests/data/another_dbase3.dbf") as expected:
+            rows = list(expected)
+        with DbfReader("tests/data/another_dbase3.dbf", timings=True) as dbf_reader:
+            self.assertEqual(list(dbf_reader), rows)
+            self.assertEqual(set(dbf_reader.stats.cast_seconds), {'C', 'D', 'N'})
+            self.assertGreater(dbf_reader.stats.decode_seconds, 0)
+            self.assertGreaterEqual(dbf_reader.stats.decode_seconds, sum(dbf_reader.stats.cast_seconds.values()))
+
+    def test_field_types(self):
+        expected = [
+            {'C_NAME': 'primeira', 'F_FLOAT': 1234.5, 'I_LONG': -7, 'A_AUTO': 1, 'O_DOUBLE': 3.25,
+             'T_STAMP': datetime.datetime(2023, 1, 31, 13, 45, 10, 250000), 'M_MEMO': 'memória da primeira linha',
+             'B_BIN': b'\x00\x01\x02binary\xff', 'G_OLE': None},
+            {'C_NAME': 'terceira', 'F_FLOAT': None, 'I_LONG': 2147483647, 'A_AUTO': 3, 'O_DOUBLE': -1e100, 'T_STAMP': None,
+             'M_MEMO': 'linha longa ' * 20, 'B_BIN': None, 'G_OLE': b'OLE\x00object'},
+        ]
+        with DbfReader("tests/data/foxpro_types.dbf") as dbf_reader:
+            self.assertEqual(list(dbf_reader), expected)
+            self.assertEqual(dbf_reader.memo.block_size, 64)
+            self.assertEqual(dbf_reader.decoder(['I_LONG', 'O_DOUBLE']).struct.format, '<21xi4xd38x')
+            dbf_reader.seek_record(0)
+            self.assertEqual(list(dbf_reader.iter_rows(columns=['C_NAME'], filters=[('I_LONG', '>', 0)])), [{'C_NAME': 'terceira'}])
+        with DbfReader("tests/data/foxpro_types.dbf", row_type='tuple', memory_map=True, buffer_records=1) as dbf_reader:
+            self.assertEqual(list(dbf_reader), [tuple(row.values()) for row in expected])
+        with self.assertRaisesRegex(ValueError, "Filters are not supported on memo fields.*"):
+            DbfReader("tests/data/foxpro_types.dbf", filters=[('M_MEMO', '==', 'apagada')])
+        with self.assertRaisesRegex(ValueError, "Field N_ID of type '\\+' should have size 4.*"):
+            DbfReader("tests/data/dbase3_invalid_fields_type.dbf")
+
+    def test_visual_foxpro(self):
+        expected = [
+            {'C_NAME': 'primeira', 'N_QTY': 12, 'Y_PRICE': 19.99, 'T_STAMP': datetime.datetime(2023, 1, 31, 13, 45, 10, 250000),
+             'I_ID': 1, 'I_COUNT': 0, 'B_RATE': 0.5, 'D_DAY': datetime.date(2023, 1, 31), 'L_OK': True,
+             'M_NOTE': 'memória da primeira linha', 'G_OLE': None},
+            {'C_NAME': None, 'N_QTY': None, 'Y_PRICE': -1234.5678, 'T_STAMP': None, 'I_ID': 3, 'I_COUNT': None, 'B_RATE': None,
+             'D_DAY': None, 'L_OK': None, 'M_NOTE': 'linha longa ' * 20, 'G_OLE': b'OLE\x00object'},
+        ]
+        with DbfReader("tests/data/vfp_types.dbf") as dbf_reader:
+            definition = dbf_reader.definition
+            self.assertEqual(list(dbf_reader), expected)
+            # 263 bytes do backlink depois do terminador, o campo _NullFlags não aparece nas linhas
+            self.assertEqual((definition.headerlen, definition.numfields, definition.null_flags.name), (680, 11, '_NullFlags'))
+            self.assertEqual([field.null_bit for field in definition.fields if field.null_bit is not None], [0, 1, 2, 3])
+            dbf_reader.seek_record(0)
+            self.assertEqual([row['I_ID'] for row in dbf_reader.iter_rows(filters=[('I_COUNT', '==', 0)])], [1])
+            dbf_reader.seek_record(0)
+            self.assertEqual([row['I_ID'] for row in dbf_reader.iter_rows(filters=[('I_COUNT', '!=', 0)])], [3])
+        with DbfReader("tests/data/vfp_types.dbf", row_type='tuple', memory_map=True, buffer_records=1) as dbf_reader:
+            self.assertEqual(list(dbf_reader), [tuple(row.values()) for row in expected])
+        loaded = TableDefinition.from_dict(json.loads(json.dumps(definition.to_dict())))
+        self.assertEqual(loaded.to_dict(), definition.to_dict())
+        with DbfReader("tests/data/vfp_types.dbf", table_definition=loaded) as dbf_reader:
+            self.assertEqual(list(dbf_reader), expected)
+        result = profile("tests/data/vfp_types.dbf", columns=["Y_PRICE", "I_COUNT"])
+        self.assertEqual((result.fields['I_COUNT'].count, result.fields['I_COUNT'].nulls), (1, 1))
+        self.assertEqual((result.fields['Y_PRICE'].min, result.fields['Y_PRICE'].max), (-1234.5678, 19.99))
+
+    def test_header_layout(self):
+        with DbfReader("tests/data/dbase3.dbf") as dbf_reader:
+            rows = list(dbf_reader)
+        with open("tests/data/dbase3.dbf", 'rb') as file:
+            data = file.read()
+        # bytes depois do terminador, os registros começam em headerlen
+        headerlen = int.from_bytes(data[8:10], 'little')
+        data = data[:8] + (headerlen + 7).to_bytes(2, 'little') + data[10:headerlen] + b'\x00' * 7 + data[headerlen:]
+        with DbfReader(BytesIO(data)) as dbf_reader:
+            self.assertEqual(list(dbf_reader), rows)
+        with DbfReader(ReadAheadStream(BytesIO(data), chunk_size=5)) as dbf_reader:
+            self.assertEqual(list(dbf_reader), rows)
+        with self.assertRaisesRegex(ValueError, "dBase 7 tables.*"):
+            DbfReader("tests/data/dbase7.dbf")
+
+    def test_memo_files(self):
+        with DbfReader("tests/data/dbase3_memo.dbf") as dbf_reader:
+            self.assertEqual([row['M_TEXT'] for row in dbf_reader], ['texto curto', '0123456789' * 70, None])
+            self.assertEqual((dbf_reader.memo.block_size, dbf_reader.memo.misses), (512, 1))
+        # dBase IV, cada valor começa com ff ff 08 00 e o tamanho, os blocos são lidos em páginas de 100 bytes
+        header = b'\x03\x00\x00\x00' + b'\x00' * 16 + b'\x40\x00' + b'\x00' * 42
+        data = header + b'\xff\xff\x08\x00' + (8 + 150).to_bytes(4, 'little') + b'x' * 150
+        with MemoFile(BytesIO(data), page_size=100, cache_pages=3) as memo:
+            self.assertEqual(memo.block_size, 64)
+            self.assertEqual(memo.read_memo(1), b'x' * 150)
+            self.assertEqual(memo.read_memo(1), b'x' * 150)
+            self.assertEqual((len(memo.pages), memo.hits, memo.misses), (3, 6, 3))
+        with MemoFile(BytesIO(data), page_size=100, cache_pages=2) as memo:
+            self.assertEqual(memo.read_memo(1), b'x' * 150)
+            self.assertEqual(len(memo.pages), 2)
+        with self.assertRaises(ValueError):
+            MemoFile(BytesIO(data), cache_pages=0)
+
+    def test_memo_file_missing(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'types.dbf')
+            shutil.copy("tests/data/foxpro_types.dbf", path)
+            with DbfReader(path, columns=['C_NAME', 'I_LONG']) as dbf_reader:
+                self.assertIsNone(dbf_reader.memo)
+                self.assertEqual(list(dbf_reader), [{'C_NAME': 'primeira', 'I_LONG': -7}, {'C_NAME': 'terceira', 'I_LONG': 2147483647}])
+                with self.assertRaisesRegex(ValueError, ".*is a memo field, but there is no memo file.*"):
+                    dbf_reader.iter_rows()
+            with DbfReader(path, memo_file="tests/data/foxpro_types.fpt", columns=['G_OLE']) as dbf_reader:
+                self.assertEqual(list(dbf_reader), [{'G_OLE': None}, {'G_OLE': b'OLE\x00object'}])
+
     def test_io_open_str(self):
         dbf_reader = DbfReader("tests/data/dbase3.dbf")
         self.assertFalse(dbf_reader.closed)
@@ -221,3 +670,974 @@ class TestDbfReader(unittest.TestCase):
         with DbfReader(open("tests/data/dbase3.dbf", 'rb')) as dbf_reader:
             with self.assertRaises(NotImplementedError):
                 dbf_reader.truncate()
+
+
+class TestDbfWriter(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_transform(self):
+        path = os.path.join(self.directory, 'copy.dbf')
+        with DbfReader("tests/data/another_dbase3.dbf") as dbf_reader:
+            rows = list(dbf_reader)
+        self.assertEqual(transform("tests/data/another_dbase3.dbf", path, buffer_records=4), 13)
+        with DbfReader(path) as dbf_reader:
+            self.assertEqual(list(dbf_reader), rows)
+            self.assertEqual(dbf_reader.records, 13)
+            self.assertEqual(os.path.getsize(path), dbf_reader.file_size)
+            self.assertEqual(dbf_reader.definition.terminator, b'\r')
+        columns = ['Point_ID', 'Max_HDOP', 'Type']
+        self.assertEqual(transform("tests/data/another_dbase3.dbc", path, columns, [('Max_HDOP', '>', 1.6)]), 10)
+        with DbfReader(path) as dbf_reader:
+            self.assertEqual([field.name for field in dbf_reader.definition.fields], columns)
+            self.assertEqual(list(dbf_reader), [{name: row[name] for name in columns} for row in rows if row['Max_HDOP'] > 1.6])
+
+    def test_visual_foxpro(self):
+        path = os.path.join(self.directory, 'vfp.dbf')
+        columns = ['C_NAME', 'Y_PRICE', 'T_STAMP', 'I_ID', 'I_COUNT', 'B_RATE']
+        with DbfReader("tests/data/vfp_types.dbf", columns=columns) as dbf_reader:
+            rows = list(dbf_reader)
+        for selected in [columns, ['I_COUNT', 'B_RATE']]:
+            self.assertEqual(transform("tests/data/vfp_types.dbf", path, selected), 2)
+            with DbfReader(path) as dbf_reader:
+                self.assertEqual(dbf_reader.definition.headerlen, 32 + 32 * (len(selected) + 1) + 1 + 263)
+                self.assertEqual(list(dbf_reader), [{name: row[name] for name in selected} for row in rows])
+        with DbfReader("tests/data/vfp_types.dbf", columns=columns) as dbf_reader:
+            with DbfWriter(path, dbf_reader.definition, columns) as writer:
+                for row in rows:
+                    writer.write_row(row)
+                writer.write_row({'I_ID': 4})
+        with DbfReader(path) as dbf_reader:
+            self.assertEqual(list(dbf_reader), rows + [
+                {'C_NAME': None, 'Y_PRICE': 0.0, 'T_STAMP': None, 'I_ID': 4, 'I_COUNT': None, 'B_RATE': None}
+            ])
+
+    def test_split(self):
+        with DbfReader("tests/data/another_dbase3.dbf") as dbf_reader:
+            rows = list(dbf_reader)
+        destination = os.path.join(self.directory, 'points_{}.dbf')
+        self.assertEqual(split("tests/data/another_dbase3.dbf", 'Condition', destination, ['Point_ID', 'Condition']), {'Good': 9, 'Plugged': 4})
+        for condition in ['Good', 'Plugged']:
+            with DbfReader(destination.format(condition)) as dbf_reader:
+                self.assertEqual([row['Point_ID'] for row in dbf_reader], [row['Point_ID'] for row in rows if row['Condition'] == condition])
+        self.assertEqual(split("tests/data/dbase5.dbf", 'L_BOOL', lambda value: os.path.join(self.directory, f'{value}.dbf')), {True: 1, False: 1})
+
+    def test_write_rows(self):
+        path = os.path.join(self.directory, 'types.dbf')
+        columns = ['C_NAME', 'F_FLOAT', 'I_LONG', 'A_AUTO', 'O_DOUBLE', 'T_STAMP']
+        with DbfReader("tests/data/foxpro_types.dbf", columns=columns) as dbf_reader:
+            rows = list(dbf_reader)
+            with DbfWriter(path, dbf_reader.definition, columns, buffer_records=1) as writer:
+                for row in rows:
+                    writer.write_row(row)
+                writer.write_row([None] * len(columns))
+        with DbfReader(path) as dbf_reader:
+            self.assertEqual(list(dbf_reader), rows + [
+                {'C_NAME': '', 'F_FLOAT': None, 'I_LONG': 0, 'A_AUTO': 0, 'O_DOUBLE': 0.0, 'T_STAMP': None}
+            ])
+        with DbfReader("tests/data/dbase5.dbf") as dbf_reader:
+            rows = list(dbf_reader)
+            with DbfWriter(path, dbf_reader.definition) as writer:
+                for row in rows:
+                    writer.write_row(row)
+                with self.assertRaisesRegex(ValueError, "Value 100000000000000000000 doesn't fit.*"):
+                    writer.write_row({'N_ID': 10 ** 20})
+                with self.assertRaisesRegex(ValueError, "The row has 1 values.*"):
+                    writer.write_row(['char'])
+        with DbfReader(path) as dbf_reader:
+            self.assertEqual(list(dbf_reader), rows)
+        # os inteiros de um N sem decimais são gravados sem passar por um float
+        with DbfReader("tests/data/another_dbase3.dbf", columns=['GPS_Week']) as dbf_reader:
+            data = dbf_reader.definition.to_dict()
+        for field in data['fields']:
+            field['size'] = 19 if field['name'] == 'GPS_Week' else field['size']
+        with DbfWriter(path, TableDefinition.from_dict(data), ['GPS_Week']) as writer:
+            writer.write_row([2 ** 53 + 1])
+            writer.write_row([-2 ** 59])
+        with DbfReader(path) as dbf_reader:
+            self.assertEqual([row['GPS_Week'] for row in dbf_reader], [2 ** 53 + 1, -2 ** 59])
+
+    def test_invalid_writer(self):
+        with DbfReader("tests/data/foxpro_types.dbf") as dbf_reader:
+            with self.assertRaisesRegex(ValueError, "Memo fields.*"):
+                DbfWriter(BytesIO(), dbf_reader.definition)
+            with self.assertRaisesRegex(ValueError, "buffer_records should be at least 1.*"):
+                DbfWriter(BytesIO(), dbf_reader.definition, ['C_NAME'], buffer_records=0)
+            with open(os.path.join(self.directory, 'text.dbf'), 'w') as f:
+                with self.assertRaises(IOError):
+                    DbfWriter(f, dbf_reader.definition, ['C_NAME'])
+
+
+class TestCli(unittest.TestCase):
+    def run_main(self, *argv):
+        stdout, stderr = StringIO(), StringIO()
+        with redirect_stdout(stdout), redirect_stderr(stderr):
+            status = main(list(argv))
+        return status, stdout.getvalue(), stderr.getvalue()
+
+    def test_describe(self):
+        status, output, _ = self.run_main('describe', 'tests/data/dbase3.dbf')
+        self.assertEqual(status, 0)
+        with DbfReader("tests/data/dbase3.dbf") as dbf_reader:
+            self.assertEqual(output, str(DbfDescriptionText(dbf_reader.definition)) + '\n')
+        status, output, _ = self.run_main('describe', '--format', 'postgres', '--schema', 'sih', 'tests/data/dbase3.dbf')
+        self.assertIn('CREATE TABLE IF NOT EXISTS sih.dbase3 (', output)
+
+    def test_head_and_count(self):
+        status, output, _ = self.run_main('head', '-n', '1', '--columns', 'N_ID,D_DATE', 'tests/data/dbase5.dbf')
+        self.assertEqual(output, '{"N_ID": 1.0, "D_DATE": "2001-01-01"}\n')
+        status, output, _ = self.run_main('head', '--format', 'csv', '--filter', 'L_BOOL', '==', 'F', 'tests/data/dbase5.dbf')
+        self.assertEqual(output.splitlines(), ['N_ID,C_CHAR10,N_INT,N_DECIMAL,L_BOOL,D_DATE', '2.0,character,3.0,4.5678,False,2022-12-30'])
+        files = ['tests/data/another_dbase3.dbf', 'tests/data/another_dbase3.dbc', 'tests/data/dbase3.dbf']
+        status, output, _ = self.run_main('count', '-j', '2', *files)
+        self.assertEqual(output.splitlines(), [f'{files[0]}\t13\t1\t0', f'{files[1]}\t13\t1\t0', f'{files[2]}\t2\t0\t0'])
+        status, output, _ = self.run_main('count', '--filter', 'Condition', 'in', 'Plugged,Broken', files[0])
+        self.assertEqual(output, f'{files[0]}\t4\t1\t9\n')
+        status, output, _ = self.run_main('count', '--filter', 'T_STAMP', '>=', '2023-01-31T00:00', '--filter', 'Y_PRICE', '>', '0',
+                                          'tests/data/vfp_types.dbf')
+        self.assertEqual(output, 'tests/data/vfp_types.dbf\t1\t1\t1\n')
+
+    def test_convert(self):
+        with tempfile.TemporaryDirectory() as directory:
+            status, output, _ = self.run_main('convert', '--to', 'jsonl', '--output-dir', directory, '-j', '2',
+                                              'tests/data/dbase5.dbf', 'tests/data/foxpro_types.dbf')
+            self.assertEqual(status, 0)
+            self.assertEqual(output.splitlines()[0], f"tests/data/dbase5.dbf\t{os.path.join(directory, 'dbase5.jsonl')}\t2")
+            with open(os.path.join(directory, 'foxpro_types.jsonl'), encoding='utf-8') as f:
+                rows = [json.loads(line) for line in f]
+            self.assertEqual((rows[0]['T_STAMP'], rows[0]['M_MEMO'], rows[1]['G_OLE']),
+                             ('2023-01-31T13:45:10.250000', 'memória da primeira linha', b'OLE\x00object'.hex()))
+            status, output, _ = self.run_main('convert', '--to', 'csv', '--output-dir', directory, 'tests/data/another_dbase3.dbc')
+            with open(os.path.join(directory, 'another_dbase3.csv'), encoding='utf-8') as f:
+                self.assertEqual(len(f.readlines()), 14)
+
+    def test_csv_duplicate_names(self):
+        # another_dbase3 tem dois campos Point_ID, cada valor fica na coluna do seu campo
+        with DbfReader("tests/data/another_dbase3.dbf", row_type='tuple') as dbf_reader:
+            names = [field.name for field in dbf_reader.definition.fields]
+            rows = [[csv_value(value) for value in row] for row in dbf_reader]
+        self.assertEqual((len(names), names.count('Point_ID')), (31, 2))
+        expected = StringIO()
+        csv.writer(expected).writerows([names] + rows)
+        status, output, _ = self.run_main('head', '-n', '20', '--format', 'csv', 'tests/data/another_dbase3.dbf')
+        self.assertEqual(output, expected.getvalue())
+        self.assertEqual(len(list(csv.reader(StringIO(output)))[1]), 31)
+        with tempfile.TemporaryDirectory() as directory:
+            self.run_main('convert', '--to', 'csv', '--output-dir', directory, 'tests/data/another_dbase3.dbc')
+            with open(os.path.join(directory, 'another_dbase3.csv'), encoding='utf-8', newline='') as f:
+                self.assertEqual(f.read(), expected.getvalue())
+
+    def test_errors(self):
+        status, output, error = self.run_main('count', 'tests/data/dbase3_invalid_terminator.dbf', 'tests/data/dbase3.dbf')
+        self.assertEqual((status, output), (1, 'tests/data/dbase3.dbf\t2\t0\t0\n'))
+        self.assertIn('dbf_reader: tests/data/dbase3_invalid_terminator.dbf: The HEADER terminator', error)
+        with tempfile.TemporaryDirectory() as directory:
+            short = os.path.join(directory, 'short.dbf')
+            with open("tests/data/dbase3.dbf", 'rb') as source, open(short, 'wb') as target:
+                target.write(source.read(20))
+            status, output, error = self.run_main('count', short, 'tests/data/dbase3.dbf')
+        self.assertEqual((status, output), (1, 'tests/data/dbase3.dbf\t2\t0\t0\n'))
+        self.assertIn(f'dbf_reader: {short}: The file has only 20 bytes', error)
+        status, output, error = self.run_main('head', '--filter', 'N_ID', 'like', '1', 'tests/data/dbase3.dbf')
+        self.assertEqual(status, 1)
+        self.assertIn("Operator 'like' not supported", error)
+        with self.assertRaises(SystemExit):
+            self.run_main('count', '-j', '0', 'tests/data/dbase3.dbf')
+
+    def test_profile(self):
+        status, output, _ = self.run_main('profile', '--columns', 'N_ID,D_DATE', 'tests/data/dbase5.dbf')
+        result = json.loads(output)
+        self.assertEqual((result['path'], result['rows'], list(result['fields'])), ('tests/data/dbase5.dbf', 2, ['N_ID', 'D_DATE']))
+        self.assertEqual((result['fields']['D_DATE']['min'], result['fields']['N_ID']['distinct']), ('2001-01-01', 2))
+
+
+class TestProfile(unittest.TestCase):
+    def test_profile(self):
+        result = profile("tests/data/another_dbase3.dbf")
+        self.assertEqual((result.rows, result.deleted, result.filtered), (13, 1, 0))
+        fields = result.fields
+        # dos dois campos Point_ID, como nas linhas dict, fica o último
+        self.assertEqual((fields['Point_ID'].count, fields['Point_ID'].min, fields['Point_ID'].max), (13, 401, 436))
+        self.assertEqual(fields['Point_ID'].distinct.count(), 13)
+        self.assertEqual((fields['Condition'].min, fields['Condition'].max, fields['Condition'].distinct.count()), ('Good', 'Plugged', 2))
+        self.assertEqual((fields['Std_Dev'].count, fields['Std_Dev'].nulls), (2, 11))
+        self.assertEqual((fields['Comments'].count, fields['Comments'].min), (0, None))
+        self.assertEqual(fields['Date_Visit'].min, datetime.date(2005, 7, 12))
+        with DbfReader("tests/data/another_dbase3.dbf") as dbf_reader:
+            rows = [row for row in dbf_reader]
+        for name in ['Max_PDOP', 'Northing', 'Feat_Name']:
+            values = [row[name] for row in rows if row[name] not in [None, '']]
+            self.assertEqual((fields[name].min, fields[name].max, fields[name].count), (min(values), max(values), len(values)))
+
+    def test_profile_parallel(self):
+        expected = profile("tests/data/another_dbase3.dbf").as_dict()
+        self.assertEqual(profile("tests/data/another_dbase3.dbc").as_dict(), expected)
+        self.assertEqual(profile("tests/data/another_dbase3.dbf", workers=2, chunk_records=4).as_dict(), expected)
+        with ThreadPoolExecutor(2) as executor:
+            self.assertEqual(profile("tests/data/another_dbase3.dbf", chunk_records=3, executor=executor).as_dict(), expected)
+
+    def test_profile_filters_and_columns(self):
+        result = profile("tests/data/another_dbase3.dbf", columns=['Condition'], filters=[('Condition', '==', 'Good')])
+        self.assertEqual((result.rows, result.deleted, result.filtered, list(result.fields)), (9, 1, 4, ['Condition']))
+        self.assertEqual(result.fields['Condition'].distinct.count(), 1)
+        self.assertEqual(profile("tests/data/another_dbase3.dbf", columns=[]).as_dict()['fields'], {})
+        with self.assertRaisesRegex(ValueError, "Memo fields can't be profiled.*"):
+            profile("tests/data/foxpro_types.dbf")
+        result = profile("tests/data/foxpro_types.dbf", columns=['T_STAMP'])
+        with DbfReader("tests/data/foxpro_types.dbf", columns=['T_STAMP']) as dbf_reader:
+            self.assertEqual(result.fields['T_STAMP'].max, max(row['T_STAMP'] for row in dbf_reader if row['T_STAMP']))
+
+    def test_distinct_sketch(self):
+        sketch = DistinctSketch()
+        sketch.update([str(i).encode() for i in range(1000)])
+        self.assertEqual((sketch.count(), sketch.exact), (1000, True))
+        other = DistinctSketch()
+        other.update([str(i).encode() for i in range(500, 20000)])
+        self.assertFalse(other.exact)
+        self.assertAlmostEqual(other.count() / 19500, 1, delta=0.05)
+        sketch.merge(other)
+        self.assertAlmostEqual(sketch.count() / 20000, 1, delta=0.05)
+        with self.assertRaises(ValueError):
+            sketch.merge(DistinctSketch(10))
+        with self.assertRaises(ValueError):
+            DistinctSketch(20)
+
+
+class TestDbc(unittest.TestCase):
+    def test_explode(self):
+        # exemplo do blast.c
+        self.assertEqual(b''.join(PKWareExploder(BytesIO(bytes.fromhex('00048224258f807f')).read)), b'AIAIAIAIAIAIA')
+
+    def test_explode_invalid(self):
+        with self.assertRaisesRegex(ValueError, "Invalid literal flag.*"):
+            list(PKWareExploder(BytesIO(bytes.fromhex('02048224258f807f')).read))
+        with self.assertRaisesRegex(ValueError, "Invalid dictionary size.*"):
+            list(PKWareExploder(BytesIO(bytes.fromhex('00078224258f807f')).read))
+        with self.assertRaisesRegex(ValueError, ".*ended before the end code.*"):
+            list(PKWareExploder(BytesIO(bytes.fromhex('00048224258f')).read))
+        with self.assertRaisesRegex(ValueError, "Distance .* is too far back.*"):
+            list(PKWareExploder(BytesIO(bytes.fromhex('00041f02fe01')).read))
+
+    def test_decompress(self):
+        for filename in ['another_dbase3', 'dbase3']:
+            with open(f"tests/data/{filename}.dbf", 'rb') as f:
+                expected = f.read()
+            for chunk_size in [16, 65536]:
+                with DbcStream(f"tests/data/{filename}.dbc", chunk_size) as stream:
+                    result = b''
+                    while True:
+                        chunk = stream.read(333)
+                        if not chunk:
+                            break
+                        result += chunk
+                    self.assertEqual(result, expected)
+                    self.assertEqual(stream.tell(), len(expected))
+                    self.assertFalse(stream.seekable())
+
+    def test_read_dbc(self):
+        for filename in ['another_dbase3', 'dbase3']:
+            with DbfReader(f"tests/data/{filename}.dbf") as dbf_reader:
+                expected = [row for row in dbf_reader]
+            with DbfReader(f"tests/data/{filename}.dbc") as dbf_reader:
+                self.assertEqual(dbf_reader.file_object.name, f"tests/data/{filename}.dbc")
+                self.assertEqual([row for row in dbf_reader], expected)
+                self.assertEqual(dbf_reader.actual_record, dbf_reader.records)
+            with open(f"tests/data/{filename}.dbc", 'rb') as f:
+                self.assertEqual([row for row in DbfReader(BytesIO(f.read()), compressed=True)], expected)
+
+
+class TestParallelDbfReader(unittest.TestCase):
+    def test_ordered(self):
+        with DbfReader("tests/data/another_dbase3.dbf") as dbf_reader:
+            expected = [row for row in dbf_reader]
+        parallel_reader = ParallelDbfReader("tests/data/another_dbase3.dbf", workers=2, chunk_records=3)
+        self.assertEqual(parallel_reader.chunks(), [(0, 3), (3, 6), (6, 9), (9, 12), (12, 14)])
+        self.assertEqual([row for row in parallel_reader], expected)
+        self.assertEqual([len(batch) for batch in parallel_reader.iter_batches()], [2, 3, 3, 3, 2])
+
+    def test_unordered(self):
+        parallel_reader = ParallelDbfReader("tests/data/another_dbase3.dbf", workers=3, chunk_records=2, ordered=False,
+                                            columns=['Point_ID'], filters=[('Max_HDOP', '<', 2)], memory_map=True)
+        self.assertEqual(sorted([row['Point_ID'] for row in parallel_reader]), [405, 416, 417, 419, 424, 425, 429, 431, 432, 436])
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            ParallelDbfReader("tests/data/dbase3.dbc")
+        with self.assertRaises(ValueError):
+            ParallelDbfReader("tests/data/dbase3.dbf", chunk_records=0)
+        with self.assertRaises(ValueError):
+            ParallelDbfReader("tests/data/dbase3.dbf", row_type='slots')
+
+    def test_tuple_rows(self):
+        with DbfReader("tests/data/another_dbase3.dbf", row_type='tuple') as dbf_reader:
+            expected = [row for row in dbf_reader]
+        parallel_reader = ParallelDbfReader("tests/data/another_dbase3.dbf", workers=2, chunk_records=5, row_type='tuple')
+        self.assertEqual([row for row in parallel_reader], expected)
+
+
+class TestDbfDataset(unittest.TestCase):
+    def rows(self, filename, **kwargs):
+        with DbfReader(f"tests/data/{filename}", **kwargs) as dbf_reader:
+            return [row for row in dbf_reader]
+
+    def test_strict(self):
+        dataset = DbfDataset(["tests/data/another_dbase3.dbf", "tests/data/another_dbase3.dbc"], workers=2, chunk_records=5)
+        self.assertEqual(dataset.records, 28)
+        self.assertEqual(dataset.parts(), [("tests/data/another_dbase3.dbf", 0, 5), ("tests/data/another_dbase3.dbf", 5, 10),
+                                           ("tests/data/another_dbase3.dbf", 10, 14), ("tests/data/another_dbase3.dbc", None, None)])
+        self.assertEqual([row for row in dataset], self.rows("another_dbase3.dbf") * 2)
+
+    def test_dbc_chunks(self):
+        # cada .dbc é descomprimido por um worker enquanto é lido e chega em lotes de chunk_records registros
+        paths = ["tests/data/another_dbase3.dbc", "tests/data/dbase3.dbc"]
+        with ThreadPoolExecutor(1) as executor:
+            dataset = DbfDataset(paths, schema='union', columns=['Point_ID', 'N_ID'], workers=1, chunk_records=4, executor=executor)
+            batches = list(dataset.iter_batches())
+        self.assertEqual([len(batch) for batch in batches], [4, 4, 4, 1, 2])
+        self.assertEqual([row['Point_ID'] for batch in batches[:4] for row in batch], [row['Point_ID'] for row in self.rows("another_dbase3.dbf")])
+        self.assertEqual([row['N_ID'] for row in batches[4]], [row['N_ID'] for row in self.rows("dbase3.dbf")])
+        dataset = DbfDataset(paths + ["tests/data/another_dbase3.dbf"], schema='union', columns=['Point_ID'], source_column='SOURCE',
+                             workers=2, chunk_records=3, ordered=False)
+        rows = [row for row in dataset]
+        self.assertEqual(sorted([(row['SOURCE'], row['Point_ID'] or 0) for row in rows]),
+                         sorted([(os.path.basename(path), row.get('Point_ID') or 0) for path in dataset.paths for row in self.rows(os.path.basename(path))]))
+        # parar no primeiro lote não deixa o worker preso na fila cheia
+        dataset = DbfDataset(paths, schema='union', workers=1, chunk_records=1)
+        self.assertEqual(len(next(dataset.iter_batches())), 1)
+        for batch in dataset.iter_batches():
+            break
+        # o erro do worker chega pelo future, depois dos lotes já lidos
+        path = os.path.join(tempfile.mkdtemp(), "truncated.dbc")
+        self.addCleanup(shutil.rmtree, os.path.dirname(path))
+        with open("tests/data/another_dbase3.dbc", 'rb') as source, open(path, 'wb') as target:
+            target.write(source.read()[:-200])
+        with self.assertRaisesRegex(ValueError, "The compressed stream ended.*"):
+            list(DbfDataset([path], workers=2, chunk_records=2))
+
+    def test_strict_mismatch(self):
+        with self.assertRaises(ValueError):
+            DbfDataset(["tests/data/dbase3.dbf", "tests/data/another_dbase3.dbf"])
+        with self.assertRaises(ValueError):
+            DbfDataset(["tests/data/dbase3.dbf", "tests/data/dbase5.dbf"])
+
+    def test_union(self):
+        with ThreadPoolExecutor(2) as executor:
+            dataset = DbfDataset("tests/data/dbase3*.dbc", schema='union', source_column='SOURCE', executor=executor)
+            rows = [row for row in dataset]
+        self.assertEqual(dataset.paths, ["tests/data/dbase3.dbc"])
+        self.assertEqual(rows, [dict(row, SOURCE="dbase3.dbc") for row in self.rows("dbase3.dbf")])
+        with ThreadPoolExecutor(2) as executor:
+            dataset = DbfDataset(["tests/data/dbase3.dbf", "tests/data/another_dbase3.dbc"], schema='union', columns=['Type', 'C_CHAR10'],
+                                 source_column='SOURCE', executor=executor, workers=1, chunk_records=1)
+            rows = [row for row in dataset]
+        self.assertEqual(dataset.names, ['Type', 'C_CHAR10'])
+        self.assertEqual(rows[0], {'Type': None, 'C_CHAR10': self.rows("dbase3.dbf")[0]['C_CHAR10'], 'SOURCE': 'dbase3.dbf'})
+        self.assertEqual(rows[-1], {'Type': 'CMP', 'C_CHAR10': None, 'SOURCE': 'another_dbase3.dbc'})
+        self.assertEqual(len(rows), len(self.rows("dbase3.dbf")) + 13)
+
+    def test_union_sizes(self):
+        dataset = DbfDataset(["tests/data/dbase3.dbf", "tests/data/dbase5.dbf"], schema='union')
+        self.assertEqual([(field.name, field.size) for field in dataset.fields],
+                         [(field.name, max(field.size, other.size)) for field, other in zip(dataset.definitions["tests/data/dbase3.dbf"].fields,
+                                                                                            dataset.definitions["tests/data/dbase5.dbf"].fields)])
+
+    def test_unordered_filters(self):
+        dataset = DbfDataset(["tests/data/another_dbase3.dbf", "tests/data/another_dbase3.dbc"], columns=['Max_HDOP'],
+                             filters=[('Max_HDOP', '<', 2)], workers=2, chunk_records=3, ordered=False)
+        self.assertEqual(sorted([row['Max_HDOP'] for row in dataset]),
+                         sorted([row['Max_HDOP'] for row in self.rows("another_dbase3.dbf", filters=[('Max_HDOP', '<', 2)])] * 2))
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            DbfDataset("tests/data/*.unknown")
+        with self.assertRaises(ValueError):
+            DbfDataset("tests/data/dbase3.dbf", schema='loose')
+        with self.assertRaises(ValueError):
+            DbfDataset("tests/data/dbase3.dbf", columns=['Unknown'])
+        with self.assertRaises(ValueError):
+            DbfDataset("tests/data/dbase3.dbf", source_column='N_ID')
+        with self.assertRaises(ValueError):
+            DbfDataset(["tests/data/dbase3.dbf", "tests/data/another_dbase3.dbf"], schema='union', filters=[('Type', '==', 'CMP')])
+
+
+class TestDefinitionCache(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.cache_path = os.path.join(self.directory.name, "cache.json")
+        self.paths = []
+        for filename in ['another_dbase3.dbf', 'dbase3.dbc', 'dbase5.dbf']:
+            self.paths.append(os.path.join(self.directory.name, filename))
+            shutil.copy(f"tests/data/{filename}", self.paths[-1])
+
+    def test_to_dict(self):
+        with DbfReader("tests/data/another_dbase3.dbf") as dbf_reader:
+            definition = dbf_reader.definition
+            rows = [row for row in dbf_reader]
+        data = json.loads(json.dumps(definition.to_dict()))
+        loaded = TableDefinition.from_dict(data)
+        self.assertIsNone(loaded.reader)
+        self.assertEqual(loaded.to_dict(), definition.to_dict())
+        self.assertEqual(str(DbfDescriptionText(loaded)), str(DbfDescriptionText(definition)))
+        self.assertEqual(str(DbfDescriptionMarkdown(loaded)), str(DbfDescriptionMarkdown(definition)))
+        self.assertEqual(str(DbfDescriptionPostgresDDL(loaded)), str(DbfDescriptionPostgresDDL(definition)))
+        with DbfReader("tests/data/another_dbase3.dbf", table_definition=loaded) as dbf_reader:
+            self.assertEqual(dbf_reader.records, 14)
+            self.assertEqual([row for row in dbf_reader], rows)
+
+    def test_render_without_file_name(self):
+        with open("tests/data/dbase3.dbf", 'rb') as f:
+            definition = DbfReader(BytesIO(f.read())).definition
+        self.assertIsNone(definition.filename)
+        self.assertIn("filename: not a file\n", str(DbfDescriptionText(definition)))
+
+    def test_hits_and_misses(self):
+        with DefinitionCache(self.cache_path) as cache:
+            definitions = cache.definitions(self.paths)
+            self.assertEqual((cache.hits, cache.misses), (0, 3))
+        self.assertTrue(os.path.exists(self.cache_path))
+        cache = DefinitionCache(self.cache_path)
+        cached = cache.definitions(self.paths)
+        self.assertEqual((cache.hits, cache.misses), (3, 0))
+        self.assertFalse(cache.changed)
+        self.assertEqual([definition.to_dict() for definition in cached.values()], [definition.to_dict() for definition in definitions.values()])
+        self.assertEqual(cached[self.paths[1]].records, 2)
+        with DbfReader(self.paths[1], table_definition=cached[self.paths[1]]) as dbf_reader:
+            self.assertEqual([row for row in dbf_reader], [row for row in DbfReader("tests/data/dbase3.dbf")])
+
+    def test_changed_file(self):
+        with DefinitionCache(self.cache_path) as cache:
+            cache.get(self.paths[2])
+        stat = os.stat(self.paths[2])
+        os.utime(self.paths[2], ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000000000))
+        with DefinitionCache(self.cache_path) as cache:
+            cache.get(self.paths[2])
+            self.assertEqual((cache.hits, cache.misses), (0, 1))
+        with DefinitionCache(self.cache_path, encoding='utf-8') as cache:
+            cache.get(self.paths[2])
+            self.assertEqual((cache.hits, cache.misses), (0, 1))
+
+    def test_prune(self):
+        with DefinitionCache(self.cache_path) as cache:
+            cache.definitions(self.paths)
+        os.remove(self.paths[0])
+        with DefinitionCache(self.cache_path) as cache:
+            self.assertEqual(cache.prune(), 1)
+        self.assertEqual(len(DefinitionCache(self.cache_path).entries), 2)
+
+    def test_other_version(self):
+        with open(self.cache_path, 'w') as f:
+            json.dump({'version': 0, 'entries': {'x': 1}}, f)
+        self.assertEqual(DefinitionCache(self.cache_path).entries, {})
+
+    def test_dataset(self):
+        with DefinitionCache(self.cache_path) as cache:
+            DbfDataset(self.paths, schema='union', cache=cache)
+        cache = DefinitionCache(self.cache_path)
+        with ThreadPoolExecutor(2) as executor:
+            rows = [row for row in DbfDataset(self.paths[:1], cache=cache, executor=executor, chunk_records=5)]
+        self.assertEqual((cache.hits, cache.misses), (1, 0))
+        self.assertEqual(rows, [row for row in DbfReader("tests/data/another_dbase3.dbf")])
+        with self.assertRaises(ValueError):
+            DbfDataset(self.paths, cache=cache, encoding='utf-8')
+
+
+class TestDbfIndex(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.path = os.path.join(self.directory.name, "another_dbase3.dbf")
+        shutil.copy("tests/data/another_dbase3.dbf", self.path)
+        with DbfReader(self.path) as dbf_reader:
+            self.rows = {}
+            for number in range(dbf_reader.records):
+                self.rows[number] = dbf_reader[number]
+
+    def expected(self, name, value):
+        return [number for number, row in self.rows.items() if row is not None and row[name] == value]
+
+    def test_sortable_number(self):
+        numbers = [-1e300, -2.5, -1, -0.0, 0, 0.5, 1, 2, 10, 1e15, 1e300]
+        self.assertEqual(sorted(numbers, key=sortable_number), numbers)
+        self.assertEqual(sortable_number(0.0), sortable_number(-0.0))
+
+    def test_sortable_integer(self):
+        numbers = [-10 ** 19 + 1, -2 ** 53 - 1, -2 ** 53, -10, -9, -1, 0, 1, 9, 10, 2 ** 53, 2 ** 53 + 1, 10 ** 19 - 1]
+        self.assertEqual(sorted(reversed(numbers), key=lambda number: sortable_integer(number, 19)), numbers)
+        self.assertEqual(len({sortable_integer(number, 19) for number in numbers}), len(numbers))
+        self.assertEqual((sortable_integer(-0, 3), sortable_integer(10 ** 3, 3)), (b'0000', None))
+
+    def test_large_integers(self):
+        # um N(19, 0) com inteiros acima de 2 ** 53, que viram o mesmo double
+        with DbfReader("tests/data/dbase5.dbf", columns=['N_ID']) as dbf_reader:
+            data = dbf_reader.definition.to_dict()
+        data['fields'][0]['decimals'] = 0
+        path = os.path.join(self.directory.name, "large.dbf")
+        numbers = [2 ** 53 + 1, -2 ** 59, 2 ** 53, 7, 2 ** 53 + 1, -2 ** 53 - 1]
+        with DbfWriter(path, TableDefinition.from_dict(data), ['N_ID']) as writer:
+            for number in numbers:
+                writer.write_row([number])
+        with build_index(path, ['N_ID']) as index:
+            for number in set(numbers):
+                self.assertEqual(index.record_numbers('N_ID', number), [i for i, value in enumerate(numbers) if value == number])
+            self.assertEqual(index.record_numbers('N_ID', 7.0), [3])
+            self.assertEqual(index.record_numbers('N_ID', 7.5), [])
+            self.assertEqual(index.record_numbers('N_ID', 10 ** 19), [])
+            self.assertEqual(list(index.lookup('N_ID', 2 ** 53 + 1)), [{'N_ID': 2 ** 53 + 1}] * 2)
+
+    def test_runs(self):
+        # com poucas entradas em memória as chaves são ordenadas em runs de arquivos temporários, o índice é o mesmo
+        fields = ['Type', 'Max_HDOP', 'GPS_Week', 'Date_Visit', 'Time']
+        build_index(self.path, fields).close()
+        with open(self.path + '.idx', 'rb') as f:
+            expected = f.read()
+        for run_entries in [1, 3, 7]:
+            build_index(self.path, fields, run_entries=run_entries).close()
+            with open(self.path + '.idx', 'rb') as f:
+                self.assertEqual(f.read(), expected)
+        with self.assertRaises(ValueError):
+            build_index(self.path, fields, run_entries=0)
+
+    def test_lookup(self):
+        with build_index(self.path, ['Type', 'Max_HDOP', 'GPS_Week', 'Date_Visit', 'Time']) as index:
+            self.assertTrue(os.path.exists(self.path + '.idx'))
+            self.assertEqual(index.record_numbers('Type', 'CMP'), self.expected('Type', 'CMP'))
+            self.assertNotIn(1, index.record_numbers('Type', 'CMP'))
+            for value in [1.7, 1.8, 2, 4.4]:
+                self.assertEqual(index.record_numbers('Max_HDOP', value), self.expected('Max_HDOP', value))
+            self.assertEqual(index.record_numbers('GPS_Week', 1331), self.expected('GPS_Week', 1331))
+            self.assertEqual(index.record_numbers('Date_Visit', datetime.date(2005, 7, 12)), self.expected('Date_Visit', datetime.date(2005, 7, 12)))
+            self.assertEqual(index.record_numbers('Date_Visit', '20050712'), self.expected('Date_Visit', datetime.date(2005, 7, 12)))
+            self.assertEqual(index.record_numbers('Time', '10:56:30am'), [0])
+            self.assertEqual(index.record_numbers('Time', 'missing'), [])
+            self.assertEqual(index.record_numbers('Type', 'x' * 30), [])
+            self.assertEqual(index.record_numbers('Max_HDOP', 3), [])
+            self.assertEqual([row for row in index.lookup('Max_HDOP', 1.7)], [self.rows[number] for number in self.expected('Max_HDOP', 1.7)])
+            self.assertEqual([row for row in index.lookup('Time', '10:56:30am', columns=['Type'])], [{'Type': 'CMP'}])
+
+    def test_reopen(self):
+        build_index(self.path, ['Type'], encoding='iso-8859-1').close()
+        with DbfIndex(self.path) as index:
+            self.assertEqual(index.record_numbers('Type', 'CMP'), self.expected('Type', 'CMP'))
+            with self.assertRaises(ValueError):
+                index.record_numbers('Shape', 'circular')
+        with self.assertRaises(ValueError):
+            DbfIndex(self.path, encoding='utf-8')
+
+    def test_stale(self):
+        index_path = os.path.join(self.directory.name, "index")
+        build_index(self.path, ['Type'], index_path).close()
+        with DbfIndex(self.path, index_path) as index:
+            self.assertFalse(index.is_stale())
+            stat = os.stat(self.path)
+            os.utime(self.path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000000000))
+            self.assertTrue(index.is_stale())
+            with self.assertRaises(ValueError):
+                index.record_numbers('Type', 'CMP')
+
+    def test_compressed(self):
+        with self.assertRaises(ValueError):
+            build_index("tests/data/dbase3.dbc", ['N_ID'], os.path.join(self.directory.name, "index"))
+
+
+class TrickleSource:
+    # origem não seekable que devolve no máximo size bytes por read, como um socket
+    def __init__(self, data, size=7, error=None):
+        self.file = BytesIO(data)
+        self.size = size
+        self.error = error
+        self.closed = False
+
+    def read(self, size=-1):
+        chunk = self.file.read(min(self.size, size))
+        if not chunk and self.error is not None:
+            raise self.error
+        return chunk
+
+    def close(self):
+        self.closed = True
+
+
+class TestReadAheadStream(unittest.TestCase):
+    def setUp(self):
+        with open("tests/data/another_dbase3.dbf", 'rb') as f:
+            self.data = f.read()
+        with DbfReader("tests/data/another_dbase3.dbf") as dbf_reader:
+            self.expected = [row for row in dbf_reader]
+
+    def test_read(self):
+        for thread in [True, False]:
+            with ReadAheadStream(TrickleSource(self.data), read_ahead=64, chunk_size=16, thread=thread) as stream:
+                self.assertEqual((stream.read(10), stream.tell()), (self.data[:10], 10))
+                self.assertEqual(stream.read(1000), self.data[10:1010])
+                self.assertEqual(stream.read(), self.data[1010:])
+                self.assertEqual((stream.read(10), stream.tell()), (b'', len(self.data)))
+                self.assertFalse(stream.seekable())
+                with self.assertRaises(OSError):
+                    stream.seek(0)
+            self.assertTrue(stream.source.closed)
+
+    def test_read_dbf(self):
+        # sem read_ahead as leituras curtas da origem também são completadas
+        with DbfReader(TrickleSource(self.data, 50), buffer_records=3) as dbf_reader:
+            self.assertEqual([row for row in dbf_reader], self.expected)
+        with DbfReader(TrickleSource(self.data), read_ahead=100) as dbf_reader:
+            self.assertIsInstance(dbf_reader.file_object, ReadAheadStream)
+            self.assertEqual([row for row in dbf_reader], self.expected)
+        with open("tests/data/another_dbase3.dbc", 'rb') as f:
+            with DbfReader(TrickleSource(f.read(), 1000), compressed=True, read_ahead=4096, buffer_records=3) as dbf_reader:
+                self.assertEqual([row for row in dbf_reader], self.expected)
+        with open("tests/data/another_dbase3.dbc", 'rb') as f, DbfReader(f, read_ahead=4096) as dbf_reader:
+            self.assertEqual(dbf_reader.file_object.name, "tests/data/another_dbase3.dbc")
+            self.assertEqual([row for row in dbf_reader], self.expected)
+
+    def test_read_pipe_and_gzip(self):
+        read, write = os.pipe()
+
+        def produce():
+            with os.fdopen(write, 'wb', buffering=0) as f:
+                for start in range(0, len(self.data), 100):
+                    f.write(self.data[start:start + 100])
+        producer = threading.Thread(target=produce)
+        producer.start()
+        with os.fdopen(read, 'rb', buffering=0) as f, DbfReader(f, read_ahead=1024) as dbf_reader:
+            self.assertEqual([row for row in dbf_reader], self.expected)
+        producer.join()
+        with gzip.GzipFile(fileobj=BytesIO(gzip.compress(self.data))) as f:
+            self.assertEqual([row for row in DbfReader(f)], self.expected)
+        with gzip.GzipFile(fileobj=TrickleSource(gzip.compress(self.data), 50)) as f:
+            self.assertEqual([row for row in DbfReader(f, read_ahead=512)], self.expected)
+
+    def test_errors(self):
+        with self.assertRaises(ValueError):
+            ReadAheadStream(BytesIO(b''), read_ahead=0)
+        with ReadAheadStream(TrickleSource(b'abc', error=ConnectionResetError("reset"))) as stream:
+            with self.assertRaisesRegex(ConnectionResetError, "reset"):
+                stream.read(10)
+        # fechar antes do fim não espera a origem terminar
+        stream = ReadAheadStream(TrickleSource(self.data, 1), read_ahead=2, chunk_size=1)
+        self.assertEqual(stream.read(3), self.data[:3])
+        stream.close()
+        self.assertTrue(stream.closed)
+        with self.assertRaises(ValueError):
+            stream.read(1)
+
+
+class AsyncFile:
+    def __init__(self, path):
+        self.name = path
+        self.file = open(path, 'rb')
+
+    async def read(self, size=-1):
+        await asyncio.sleep(0)
+        return self.file.read(size)
+
+
+class TestAsyncDbfReader(unittest.TestCase):
+    def rows(self, filename, **kwargs):
+        with DbfReader(f"tests/data/{filename}", **kwargs) as dbf_reader:
+            return [row for row in dbf_reader]
+
+    def test_path(self):
+        async def read():
+            async with AsyncDbfReader("tests/data/another_dbase3.dbf", batch_records=5) as async_reader:
+                self.assertEqual(async_reader.records, 14)
+                return [row async for row in async_reader]
+        self.assertEqual(asyncio.run(read()), self.rows("another_dbase3.dbf"))
+
+    def test_stream_reader(self):
+        async def read():
+            stream = asyncio.StreamReader()
+            with open("tests/data/another_dbase3.dbf", 'rb') as f:
+                data = f.read()
+            for start in range(0, len(data), 100):
+                stream.feed_data(data[start:start + 100])
+            stream.feed_eof()
+            async_reader = AsyncDbfReader(stream, columns=['Type', 'Max_HDOP'], filters=[('Max_HDOP', '<', 2)], row_type='tuple')
+            batches = [batch async for batch in async_reader.iter_batches(4)]
+            await async_reader.close()
+            return batches
+        batches = asyncio.run(read())
+        self.assertEqual([len(batch) for batch in batches], [4, 4, 2])
+        self.assertEqual(sum(batches, []), self.rows("another_dbase3.dbf", columns=['Type', 'Max_HDOP'], filters=[('Max_HDOP', '<', 2)], row_type='tuple'))
+
+    def test_async_file_dbc(self):
+        async def read(filename):
+            async with AsyncDbfReader(AsyncFile(f"tests/data/{filename}")) as async_reader:
+                return [row async for row in async_reader]
+
+        async def read_all():
+            return await asyncio.gather(*[read(filename) for filename in ["dbase3.dbc", "another_dbase3.dbc", "dbase5.dbf"]])
+        self.assertEqual(asyncio.run(read_all()), [self.rows("dbase3.dbf"), self.rows("another_dbase3.dbf"), self.rows("dbase5.dbf")])
+
+    def test_read_batch(self):
+        async def read():
+            async with AsyncDbfReader("tests/data/another_dbase3.dbf") as async_reader:
+                return [len(await async_reader.read_batch(10)), len(await async_reader.read_batch(10)), len(await async_reader.read_batch())]
+        self.assertEqual(asyncio.run(read()), [10, 3, 0])
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            AsyncDbfReader("tests/data/dbase3.dbf", batch_records=0)
+
+        async def read():
+            async with AsyncDbfReader("tests/data/dbase3.dbf", columns=['Unknown']):
+                pass
+        with self.assertRaises(ValueError):
+            asyncio.run(read())
+
+
+@unittest.skipIf(numpy is None, "numpy is not installed")
+class TestColumnar(unittest.TestCase):
+    def assertColumnsEqualRows(self, columns, rows):
+        for name, values in columns.items():
+            values = [None if isinstance(value, float) and value != value else value for value in values.tolist()]
+            self.assertEqual(values, [row[name] for row in rows], name)
+
+    def test_read_columns(self):
+        for filename in ['another_dbase3', 'dbase3', 'dbase5', 'dbase3_empty_number', 'dbase3_empty_boolean']:
+            with DbfReader(f"tests/data/{filename}.dbf") as dbf_reader:
+                rows = [row for row in dbf_reader]
+            for memory_map in [False, True]:
+                with DbfReader(f"tests/data/{filename}.dbf", memory_map=memory_map) as dbf_reader:
+                    columns = dbf_reader.read_columns()
+                    self.assertEqual(dbf_reader.actual_record, dbf_reader.records)
+                    self.assertColumnsEqualRows(columns, rows)
+
+    def test_null_padded_strings(self):
+        with open("tests/data/dbase3.dbf", "rb") as f:
+            data = bytearray(f.read())
+        with DbfReader(BytesIO(data)) as dbf_reader:
+            definition = dbf_reader.definition
+        start = definition.headerlen + definition.fields[1].offset
+        data[start:start + 10] = b'c\x00ar \x00\x00 \x00 '
+        data[start + definition.record_size:start + definition.record_size + 10] = b' \x00' * 5
+        with DbfReader(BytesIO(data)) as dbf_reader:
+            rows = list(dbf_reader)
+        self.assertEqual([row['C_CHAR10'] for row in rows], ['c\x00ar', ''])
+        for encoding, strings in [('latin-1', 'U'), ('utf-8', 'U'), ('latin-1', 'S')]:
+            with DbfReader(BytesIO(data), encoding=encoding) as dbf_reader:
+                columns = dbf_reader.read_columns(columns=['C_CHAR10'], strings=strings)
+            values = columns['C_CHAR10'].tolist()
+            self.assertEqual([value.decode() if strings == 'S' else value for value in values], ['c\x00ar', ''], encoding)
+        for value, expected in [('c\x00ar', [1]), ('', [2])]:
+            with DbfReader(BytesIO(data), filters=[('C_CHAR10', '==', value)]) as dbf_reader:
+                self.assertEqual([row['N_ID'] for row in dbf_reader], expected)
+
+    def test_field_types(self):
+        columns = ['C_NAME', 'F_FLOAT', 'I_LONG', 'A_AUTO', 'O_DOUBLE', 'T_STAMP']
+        with DbfReader("tests/data/foxpro_types.dbf", columns=columns) as dbf_reader:
+            rows = list(dbf_reader)
+            dbf_reader.seek_record(0)
+            values = dbf_reader.read_columns()
+            with self.assertRaisesRegex(ValueError, "Memo fields.*"):
+                dbf_reader.read_columns(columns=['M_MEMO'])
+        self.assertEqual(values['I_LONG'].dtype, numpy.int32)
+        self.assertEqual(values['O_DOUBLE'].dtype, numpy.float64)
+        self.assertEqual(values['T_STAMP'].dtype, numpy.dtype('datetime64[ms]'))
+        self.assertEqual(values['T_STAMP'].astype(object).tolist(), [row['T_STAMP'] for row in rows])
+        del values['T_STAMP']
+        self.assertColumnsEqualRows(values, rows)
+
+    def test_visual_foxpro(self):
+        columns = ['C_NAME', 'N_QTY', 'Y_PRICE', 'T_STAMP', 'I_COUNT', 'B_RATE']
+        with DbfReader("tests/data/vfp_types.dbf", columns=columns) as dbf_reader:
+            rows = list(dbf_reader)
+            dbf_reader.seek_record(0)
+            values = dbf_reader.read_columns()
+        # os inteiros que aceitam nulo são masked, os textos nulos ficam vazios como nos arrays de texto
+        self.assertEqual(values['I_COUNT'].dtype, numpy.int32)
+        self.assertEqual(values['I_COUNT'].tolist(), [0, None])
+        self.assertEqual(values.pop('C_NAME').tolist(), ['primeira', ''])
+        self.assertEqual(values.pop('T_STAMP').astype(object).tolist(), [row['T_STAMP'] for row in rows])
+        self.assertColumnsEqualRows(values, rows)
+
+    def test_dtypes(self):
+        with DbfReader("tests/data/dbase3_empty_number.dbf") as dbf_reader:
+            columns = dbf_reader.read_columns()
+        self.assertEqual(columns['N_ID'].dtype, numpy.int64)
+        self.assertEqual(columns['N_DECIMAL'].dtype, numpy.float64)
+        self.assertTrue(numpy.isnan(columns['N_DECIMAL'][0]))
+        self.assertEqual(columns['C_CHAR10'].dtype.kind, 'U')
+        self.assertEqual(columns['D_DATE'].dtype, numpy.dtype('datetime64[D]'))
+        self.assertEqual(columns['L_BOOL'].dtype, numpy.bool_)
+        with DbfReader("tests/data/dbase3_empty_boolean.dbf") as dbf_reader:
+            columns = dbf_reader.read_columns(strings='S')
+        self.assertTrue(columns['L_BOOL'].mask[0])
+        self.assertEqual(columns['C_CHAR10'].dtype.kind, 'S')
+        with DbfReader("tests/data/another_dbase3.dbf") as dbf_reader:
+            columns = dbf_reader.read_columns(columns=['GPS_Week'])
+        self.assertEqual(columns['GPS_Week'].dtype, numpy.int64)
+        self.assertFalse(columns['GPS_Week'].mask.any())
+
+    def test_iter_column_batches(self):
+        with DbfReader("tests/data/another_dbase3.dbf") as dbf_reader:
+            rows = [row for row in dbf_reader.iter_rows(filters=[('Max_HDOP', '<', 2)])]
+        with DbfReader("tests/data/another_dbase3.dbf", filters=[('Max_HDOP', '<', 2)]) as dbf_reader:
+            batches = [batch for batch in dbf_reader.iter_column_batches(4, columns=['Point_ID', 'Max_HDOP'])]
+        self.assertEqual([len(batch['Point_ID']) for batch in batches], [1, 3, 4, 2])
+        self.assertEqual(list(batches[0]), ['Point_ID', 'Max_HDOP'])
+        self.assertEqual(sum([batch['Point_ID'].tolist() for batch in batches], []), [row['Point_ID'] for row in rows])
+
+    def test_empty(self):
+        with DbfReader("tests/data/dbase3.dbf", filters=[('N_ID', '>', 10)]) as dbf_reader:
+            columns = dbf_reader.read_columns()
+        self.assertEqual(list(columns), ['N_ID', 'C_CHAR10', 'N_INT', 'N_DECIMAL', 'L_BOOL', 'D_DATE'])
+        self.assertEqual(len(columns['D_DATE']), 0)
+
+
+@unittest.skipIf(pyarrow is None or numpy is None, "pyarrow is not installed")
+class TestArrow(unittest.TestCase):
+    def test_schema(self):
+        with DbfReader("tests/data/dbase3_empty_number.dbf") as dbf_reader:
+            schema = arrow_schema(dbf_reader.definition)
+        self.assertEqual(schema.names, ['N_ID', 'C_CHAR10', 'N_INT', 'N_DECIMAL', 'L_BOOL', 'D_DATE'])
+        self.assertEqual(schema.types, [pyarrow.decimal128(19, 0), pyarrow.string(), pyarrow.float64(), pyarrow.float64(), pyarrow.bool_(), pyarrow.date32()])
+        self.assertEqual(schema.field('N_INT').metadata, {b'dbf_type': b'N', b'dbf_size': b'19', b'dbf_decimals': b'5'})
+        with DbfReader("tests/data/another_dbase3.dbf") as dbf_reader:
+            schema = arrow_schema(dbf_reader.definition, ['Max_PDOP', 'GPS_Week', 'Filt_Pos', 'Point_ID'])
+        self.assertEqual(schema.types, [pyarrow.float64(), pyarrow.int32(), pyarrow.int64(), pyarrow.int32()])
+
+    def test_record_batches(self):
+        with DbfReader("tests/data/another_dbase3.dbf") as dbf_reader:
+            rows = [row for row in dbf_reader]
+        with DbfReader("tests/data/another_dbase3.dbf") as dbf_reader:
+            batches = [batch for batch in iter_record_batches(dbf_reader, 5)]
+        self.assertEqual([batch.num_rows for batch in batches], [4, 5, 4])
+        self.assertEqual(sum([batch.to_pylist() for batch in batches], []), rows)
+
+    def test_to_parquet(self):
+        for filename in ['another_dbase3', 'dbase3', 'dbase5', 'dbase3_empty_number', 'dbase3_empty_boolean']:
+            with DbfReader(f"tests/data/{filename}.dbf") as dbf_reader:
+                rows = [row for row in dbf_reader]
+            with tempfile.TemporaryDirectory() as directory:
+                path = os.path.join(directory, f"{filename}.parquet")
+                with DbfReader(f"tests/data/{filename}.dbf") as dbf_reader:
+                    self.assertEqual(to_parquet(dbf_reader, path, batch_size=4), len(rows))
+                self.assertEqual(pyarrow.parquet.read_table(path).to_pylist(), rows)
+
+    def test_to_parquet_row_groups(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "another_dbase3.parquet")
+            with DbfReader("tests/data/another_dbase3.dbf", columns=['Point_ID'], filters=[('Max_HDOP', '<', 2)]) as dbf_reader:
+                self.assertEqual(to_parquet(dbf_reader, path, batch_size=5), 10)
+            self.assertEqual(pyarrow.parquet.ParquetFile(path).num_row_groups, 3)
+            self.assertEqual(pyarrow.parquet.read_table(path).column_names, ['Point_ID'])
+
+
+class FakeCursor:
+    def __init__(self, connection):
+        self.connection = connection
+
+    def execute(self, sql):
+        self.connection.executed.append(sql)
+
+    def copy_expert(self, sql, file, size=8192):
+        self.connection.executed.append(sql)
+        while True:
+            chunk = file.read(size)
+            if not chunk:
+                break
+            self.connection.chunks.append(chunk)
+
+    def close(self):
+        self.connection.closed_cursors += 1
+
+
+class FakeCopy:
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def write(self, data):
+        self.connection.chunks.append(data)
+
+
+class FakeCopyCursor(FakeCursor):
+    def copy(self, sql):
+        self.connection.executed.append(sql)
+        return FakeCopy(self.connection)
+
+
+class FakeConnection:
+    def __init__(self, cursor_class):
+        self.cursor_class = cursor_class
+        self.executed = []
+        self.chunks = []
+        self.closed_cursors = 0
+
+    def cursor(self):
+        return self.cursor_class(self)
+
+
+class TestPostgres(unittest.TestCase):
+    def test_copy_value(self):
+        self.assertEqual(copy_value(None), '\\N')
+        self.assertEqual(copy_value(True), 't')
+        self.assertEqual(copy_value(False), 'f')
+        self.assertEqual(copy_value(2), '2')
+        self.assertEqual(copy_value(2.5), '2.5')
+        self.assertEqual(copy_value(datetime.date(2022, 12, 30)), '2022-12-30')
+        self.assertEqual(copy_value('a\\b\tc\nd\re\x00'), 'a\\\\b\\tc\\nd\\re')
+
+    def test_copy_sql(self):
+        with DbfReader("tests/data/dbase5.dbf", columns=['N_ID', 'D_DATE']) as dbf_reader:
+            self.assertEqual(copy_sql(dbf_reader, 'public', 'dbase5'),
+                             "COPY public.dbase5 (n_id, d_date) FROM STDIN WITH (FORMAT text, ENCODING 'UTF8')")
+            self.assertEqual(copy_sql(dbf_reader, 'public', 'dbase5', ['C_CHAR10']),
+                             "COPY public.dbase5 (c_char10) FROM STDIN WITH (FORMAT text, ENCODING 'UTF8')")
+
+    def test_write_copy(self):
+        output = BytesIO()
+        with DbfReader("tests/data/dbase5.dbf") as dbf_reader:
+            write_copy(dbf_reader, output)
+        self.assertEqual(output.getvalue(), b'1.0\tchar\t1.0\t2.3456\tt\t2001-01-01\n2.0\tcharacter\t3.0\t4.5678\tf\t2022-12-30\n')
+        output = BytesIO()
+        with DbfReader("tests/data/dbase3_empty_boolean.dbf") as dbf_reader:
+            write_copy(dbf_reader, output)
+        self.assertEqual(output.getvalue(), b'2000000\t\t0.0\t0.0\t\\N\t2022-12-30\n')
+
+    def test_copy_stream_chunks(self):
+        with DbfReader("tests/data/another_dbase3.dbf") as dbf_reader:
+            expected = PostgresCopyStream(dbf_reader).read()
+        self.assertEqual(expected.count(b'\n'), 13)
+        with DbfReader("tests/data/another_dbase3.dbf") as dbf_reader:
+            chunks = [chunk for chunk in PostgresCopyStream(dbf_reader, chunk_size=100).iter_chunks()]
+        self.assertTrue(all([len(chunk) == 100 for chunk in chunks[:-1]]))
+        self.assertEqual(b''.join(chunks), expected)
+
+    def test_copy_stream_columns_filters(self):
+        with DbfReader("tests/data/dbase5.dbf") as dbf_reader:
+            stream = PostgresCopyStream(dbf_reader, ['C_CHAR10', 'L_BOOL'], [('N_ID', '>', 1)])
+            self.assertEqual(stream.read(), b'character\tf\n')
+            self.assertEqual(stream.read(), b'')
+
+    def test_render_postgres_ddl_names(self):
+        with DbfReader("tests/data/dbase5.dbf") as dbf_reader:
+            ddl = str(DbfDescriptionPostgresDDL(dbf_reader.definition, 'public', 'dbase5'))
+        self.assertTrue(ddl.startswith("CREATE SCHEMA IF NOT EXISTS public;\n\nCREATE TABLE IF NOT EXISTS public.dbase5 (\n"))
+
+    def test_load(self):
+        for cursor_class in [FakeCursor, FakeCopyCursor]:
+            connection = FakeConnection(cursor_class)
+            with DbfReader("tests/data/dbase5.dbf") as dbf_reader:
+                sql = load(dbf_reader, connection, 'public', 'dbase5', chunk_size=16)
+            self.assertEqual(connection.executed, [str(DbfDescriptionPostgresDDL(dbf_reader.definition, 'public', 'dbase5')), sql])
+            self.assertEqual(b''.join(connection.chunks), b'1.0\tchar\t1.0\t2.3456\tt\t2001-01-01\n2.0\tcharacter\t3.0\t4.5678\tf\t2022-12-30\n')
+            self.assertTrue(all([len(chunk) <= 16 for chunk in connection.chunks]))
+            self.assertEqual(connection.closed_cursors, 1)
+
+    def test_load_without_create(self):
+        connection = FakeConnection(FakeCursor)
+        with DbfReader("tests/data/dbase5.dbf") as dbf_reader:
+            sql = load(dbf_reader, connection, 'public', 'dbase5', columns=['N_ID'], create=False)
+        self.assertEqual(connection.executed, [sql])
+        self.assertEqual(b''.join(connection.chunks), b'1.0\n2.0\n')